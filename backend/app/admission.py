@@ -0,0 +1,236 @@
+import asyncio
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
+# --- Configuration ---
+# All limits are read from the environment (backend/.env) when the controller is created:
+#   RATE_LIMIT_PER_MINUTE / RATE_LIMIT_BURST  per-client token bucket
+#   RATE_LIMIT_DB                             optional SQLite file shared by all workers
+#   RATE_LIMIT_MAX_CLIENTS                    buckets kept; the least recently seen are evicted
+#   TRUSTED_PROXIES                           proxy addresses whose X-Forwarded-For is believed
+#   OPENAI_RPM_LIMIT / EXPECTED_CHAT_LATENCY_S size the global concurrency cap
+#                                             (Little's law: in-flight = rate x latency)
+#   MAX_CONCURRENT_CHATS                      explicit override of that cap
+#   MAX_QUEUED_CHATS / QUEUE_DEADLINE_S       bounded wait queue in front of the cap
+
+# Buckets for clients idle this long are dropped (they would be full anyway)
+BUCKET_IDLE_EXPIRY_S = 3600
+MAX_TRACKED_CLIENTS = 100_000
+# The SQLite store prunes once every this many takes per worker
+SQLITE_PRUNE_EVERY = 1000
+
+
+def client_address(peer: str, forwarded_for: str = None, trusted_proxies: set = frozenset()):
+    """
+    The address a request is rate limited on. Headers the client sets (X-Client-Id) are not
+    trusted; X-Forwarded-For only when the peer is a configured proxy, and then only the
+    right-most hop that is not itself a trusted proxy.
+    """
+    if not peer or peer not in trusted_proxies or not forwarded_for:
+        return peer or "unknown"
+    for hop in reversed([hop.strip() for hop in forwarded_for.split(",") if hop.strip()]):
+        if hop not in trusted_proxies:
+            return hop
+    return peer
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is refused. Carries the HTTP status and Retry-After seconds."""
+
+    def __init__(self, status_code: int, retry_after: float, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.retry_after = max(1, math.ceil(retry_after))
+        self.detail = detail
+
+
+class MemoryBucketStore:
+    """Token buckets held in this process only, LRU-capped at max_clients."""
+
+    # take() never waits on I/O, so admission calls it on the event loop
+    blocking = False
+
+    def __init__(self, rate_per_s: float, burst: float, max_clients: int = MAX_TRACKED_CLIENTS):
+        self.rate_per_s = rate_per_s
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()  # client_id -> (tokens, updated_at), least recently seen first
+        self._lock = threading.Lock()
+
+    def take(self, client_id: str, now: float):
+        """Takes one token. Returns (allowed, seconds until a token is available)."""
+        with self._lock:
+            tokens, updated = self._buckets.pop(client_id, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate_per_s)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[client_id] = (tokens, now)
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        return allowed, 0 if allowed else (1 - tokens) / self.rate_per_s
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class SQLiteBucketStore:
+    """
+    Token buckets in a local SQLite file, shared by all workers on the host.
+    Each take() is a single IMMEDIATE transaction, so workers never double-spend.
+    """
+
+    # take() can wait up to the busy timeout for another worker's lock: admission runs it in a thread
+    blocking = True
+
+    def __init__(self, path: str, rate_per_s: float, burst: float, max_clients: int = MAX_TRACKED_CLIENTS):
+        self.path = path
+        self.rate_per_s = rate_per_s
+        self.burst = burst
+        self.max_clients = max_clients
+        self._local = threading.local()
+        self._takes = 0
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            "client_id TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS buckets_updated_at ON buckets (updated_at)")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def take(self, client_id: str, now: float):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT tokens, updated_at FROM buckets WHERE client_id = ?", (client_id,)
+            ).fetchone()
+            tokens, updated = row if row else (self.burst, now)
+            tokens = min(self.burst, tokens + (now - updated) * self.rate_per_s)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets (client_id, tokens, updated_at) VALUES (?, ?, ?)",
+                (client_id, tokens, now)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._takes += 1
+        if self._takes % SQLITE_PRUNE_EVERY == 0:
+            self.prune(now)
+        return allowed, 0 if allowed else (1 - tokens) / self.rate_per_s
+
+    def prune(self, now: float):
+        """Drops idle buckets, then the least recently seen ones beyond max_clients."""
+        conn = self._connect()
+        conn.execute("DELETE FROM buckets WHERE updated_at < ?", (now - BUCKET_IDLE_EXPIRY_S,))
+        conn.execute(
+            "DELETE FROM buckets WHERE client_id IN (SELECT client_id FROM buckets ORDER BY updated_at DESC "
+            "LIMIT -1 OFFSET ?)", (self.max_clients,)
+        )
+
+
+class AdmissionController:
+    """
+    Server-side admission control for /chat.
+
+    1. Per-client token bucket  -> 429 + Retry-After when a client is over its rate.
+    2. Bounded wait queue       -> 503 + Retry-After when too many requests are waiting.
+    3. Global concurrency cap   -> requests wait for a slot, but only until QUEUE_DEADLINE_S;
+                                   past the deadline they are shed with 503 instead of
+                                   piling up and inflating tail latency for everyone.
+    """
+
+    def __init__(self, bucket_store=None, max_concurrent: int = None,
+                 max_queued: int = None, queue_deadline_s: float = None):
+        if bucket_store is None:
+            rate_per_s = float(os.getenv("RATE_LIMIT_PER_MINUTE", "10")) / 60
+            burst = float(os.getenv("RATE_LIMIT_BURST", "5"))
+            max_clients = int(os.getenv("RATE_LIMIT_MAX_CLIENTS", str(MAX_TRACKED_CLIENTS)))
+            db_path = os.getenv("RATE_LIMIT_DB")
+            if db_path:
+                bucket_store = SQLiteBucketStore(db_path, rate_per_s, burst, max_clients)
+            else:
+                bucket_store = MemoryBucketStore(rate_per_s, burst, max_clients)
+        self.trusted_proxies = {address.strip() for address in os.getenv("TRUSTED_PROXIES", "").split(",")
+                                if address.strip()}
+        if max_concurrent is None:
+            rpm = float(os.getenv("OPENAI_RPM_LIMIT", "500"))
+            latency_s = float(os.getenv("EXPECTED_CHAT_LATENCY_S", "4"))
+            default_cap = max(1, math.ceil(rpm * latency_s / 60))
+            max_concurrent = int(os.getenv("MAX_CONCURRENT_CHATS", str(default_cap)))
+        if max_queued is None:
+            max_queued = int(os.getenv("MAX_QUEUED_CHATS", str(max_concurrent * 2)))
+        if queue_deadline_s is None:
+            queue_deadline_s = float(os.getenv("QUEUE_DEADLINE_S", "5"))
+        self.bucket_store = bucket_store
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.queue_deadline_s = queue_deadline_s
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self.active = 0
+        self.queued = 0
+        self.admitted_count = 0
+        self.rate_limited_count = 0
+        self.shed_count = 0
+
+    @asynccontextmanager
+    async def admit(self, client_id: str):
+        """Holds a concurrency slot for the duration of the block, or raises AdmissionRejected."""
+        if self.bucket_store.blocking:
+            allowed, retry_after = await asyncio.to_thread(self.bucket_store.take, client_id, time.time())
+        else:
+            allowed, retry_after = self.bucket_store.take(client_id, time.time())
+        if not allowed:
+            self.rate_limited_count += 1
+            raise AdmissionRejected(429, retry_after, "Too many questions. Please slow down.")
+
+        if self._slots.locked():
+            if self.queued >= self.max_queued:
+                self.shed_count += 1
+                raise AdmissionRejected(503, self.queue_deadline_s, "Server is busy. Please try again shortly.")
+
+            self.queued += 1
+            try:
+                await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_deadline_s)
+            except asyncio.TimeoutError:
+                self.shed_count += 1
+                raise AdmissionRejected(503, self.queue_deadline_s, "Server is busy. Please try again shortly.")
+            finally:
+                self.queued -= 1
+        else:
+            await self._slots.acquire()
+
+        self.active += 1
+        self.admitted_count += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._slots.release()
+
+    def stats(self):
+        return {
+            "active": self.active,
+            "queued": self.queued,
+            "max_concurrent": self.max_concurrent,
+            "max_queued": self.max_queued,
+            "admitted": self.admitted_count,
+            "rate_limited": self.rate_limited_count,
+            "shed": self.shed_count,
+        }
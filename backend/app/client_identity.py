@@ -0,0 +1,68 @@
+import hashlib
+import hmac
+import os
+import secrets
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+# Used when CLIENT_ID_SECRET is not set: generated once and shared by all workers on the host
+CLIENT_ID_SECRET_PATH = os.path.join(PROJECT_ROOT, 'backend', 'data', 'client_id_secret')
+CLIENT_ID_COOKIE = "dealzen_client"
+CLIENT_ID_MAX_AGE_S = 365 * 24 * 3600
+
+
+def _load_or_create_secret(path: str):
+    try:
+        with open(path, 'r') as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        pass
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    secret = secrets.token_hex(32)
+    try:
+        # O_EXCL: when workers race, the first one's secret wins and the others read it
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        with open(path, 'r') as f:
+            return f.read().strip()
+    with os.fdopen(fd, 'w') as f:
+        f.write(secret)
+    return secret
+
+
+class ClientIdentity:
+    """
+    Server-issued client ids for per-user state (saved searches, notifications).
+
+    The id is random and travels in an HMAC-signed, HttpOnly cookie, so a client
+    can neither pick another user's id nor share one by sitting behind the same
+    address.
+    """
+
+    def __init__(self, secret: str = None, secure: bool = None):
+        secret = secret or os.getenv("CLIENT_ID_SECRET") or _load_or_create_secret(CLIENT_ID_SECRET_PATH)
+        self._key = secret.encode("utf-8")
+        self.secure = os.getenv("CLIENT_COOKIE_SECURE", "0") == "1" if secure is None else secure
+
+    def _sign(self, client_id: str):
+        return hmac.new(self._key, client_id.encode("utf-8"), hashlib.sha256).hexdigest()[:32]
+
+    def issue(self):
+        """A new (client_id, cookie value)."""
+        client_id = secrets.token_hex(16)
+        return client_id, f"{client_id}.{self._sign(client_id)}"
+
+    def verify(self, token: str):
+        """The client id of a cookie value, or None if it is missing or not signed by us."""
+        client_id, _, signature = (token or "").partition(".")
+        if not client_id or not hmac.compare_digest(signature, self._sign(client_id)):
+            return None
+        return client_id
+
+    def resolve(self, request, response):
+        """The caller's client id; a new one is issued (set on `response`) when the cookie is missing or invalid."""
+        client_id = self.verify(request.cookies.get(CLIENT_ID_COOKIE))
+        if client_id is None:
+            client_id, token = self.issue()
+            response.set_cookie(CLIENT_ID_COOKIE, token, max_age=CLIENT_ID_MAX_AGE_S, httponly=True,
+                                samesite="lax", secure=self.secure)
+        return client_id
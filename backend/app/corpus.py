@@ -0,0 +1,39 @@
+import os
+import time
+import uuid
+
+# The ingestion script writes a new token to this file every time the deal
+# corpus is reloaded. Anything keyed on "the current deals" (in-flight
+# coalescing, caches) includes this token so stale entries never match.
+CORPUS_VERSION_FILE = os.getenv(
+    "CORPUS_VERSION_FILE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '../.corpus_version')
+)
+
+_cached_version = None
+_cached_mtime = None
+
+
+def get_corpus_version():
+    """Returns the current corpus version token (re-read only when the file changes)."""
+    global _cached_version, _cached_mtime
+    try:
+        mtime = os.stat(CORPUS_VERSION_FILE).st_mtime_ns
+    except FileNotFoundError:
+        return "unversioned"
+
+    if mtime != _cached_mtime:
+        with open(CORPUS_VERSION_FILE, 'r') as f:
+            _cached_version = f.read().strip() or "unversioned"
+        _cached_mtime = mtime
+    return _cached_version
+
+
+def bump_corpus_version():
+    """Writes a fresh corpus version token. Called after every successful ingestion."""
+    version = f"{int(time.time())}-{uuid.uuid4().hex[:8]}"
+    tmp_path = CORPUS_VERSION_FILE + ".tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(version)
+    os.replace(tmp_path, CORPUS_VERSION_FILE)
+    return version
@@ -0,0 +1,184 @@
+"""
+Typed deal record shared by the extraction scripts, ingestion and the backend.
+
+Extraction output is untidy ("$1,299.99", "Nov 6" dates without a time,
+null lists), so every entry point decodes deals through this model instead of
+re-implementing field access and date fixes:
+
+- prices are coerced to floats ("$1,299.99" -> 1299.99, unreadable -> None)
+- dates are normalized to RFC3339 (date-only valid_to means end of that day)
+- lists and booleans are never null
+- unknown keys are dropped
+
+Deal is a pydantic dataclass with slots, and list decode/encode goes through
+a TypeAdapter, so a whole deals.json is validated in pydantic-core from bytes
+(see scripts/benchmark_deals.py). JSON files, full_json and API payloads stay
+plain dicts - use deals_to_dicts() at those boundaries.
+"""
+
+import re
+from dataclasses import field
+from typing import Annotated, Optional, Union
+
+from pydantic import BeforeValidator, ConfigDict, Field, StringConstraints, TypeAdapter, ValidationError
+from pydantic.dataclasses import dataclass
+
+# Bookkeeping keys added by the extraction scripts; stored as properties, kept out of
+# full_json (which is what the LLM reads)
+PROVENANCE_FIELDS = ("source_image",)
+
+_MONEY_RE = re.compile(r"-?\d+(?:\.\d+)?")
+
+
+def ensure_rfc3339(date_str):
+    """Normalizes flyer dates to RFC3339 (required by Weaviate). Returns None for missing dates."""
+    if not date_str or not isinstance(date_str, str):
+        return None
+
+    date_str = date_str.strip()
+
+    # If date only (no time), add default time
+    if 'T' not in date_str:
+        date_str = date_str + 'T00:00:00'
+
+    # If no timezone, add UTC
+    if not date_str.endswith('Z') and '+' not in date_str[-6:] and '-' not in date_str[-6:]:
+        date_str = date_str + 'Z'
+
+    return date_str
+
+
+def _money(value):
+    if value is None or isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        match = _MONEY_RE.search(value.replace(",", ""))
+        return float(match.group()) if match else None
+    return None
+
+
+def _start_date(value):
+    return ensure_rfc3339(value)
+
+
+def _end_date(value):
+    # A deal that ends "2025-11-28" runs through that whole day
+    if isinstance(value, str) and value.strip() and 'T' not in value:
+        return ensure_rfc3339(value).replace('T00:00:00Z', 'T23:59:59Z')
+    return ensure_rfc3339(value)
+
+
+def _string_list(value):
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [value]
+    return [str(item) for item in value if item is not None] if isinstance(value, (list, tuple)) else value
+
+
+def _flag(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ("true", "yes", "y", "1")
+    return bool(value)
+
+
+def _text(value):
+    # Models occasionally return SKUs / model numbers as bare numbers
+    return str(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else value
+
+
+def _fast_path(fast, fallback):
+    """
+    Tries `fast` (validated in pydantic-core) before the Python `fallback`, so values
+    that are already clean - e.g. a deals.json this model wrote - never call Python.
+    """
+    return Annotated[Union[fast, fallback], Field(union_mode="left_to_right")]
+
+
+RFC3339 = Annotated[str, StringConstraints(pattern=r"^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(\.\d+)?(Z|[+-]\d{2}:\d{2})$")]
+
+Money = _fast_path(Optional[float], Annotated[Optional[float], BeforeValidator(_money)])
+Text = _fast_path(Optional[str], Annotated[Optional[str], BeforeValidator(_text)])
+StartDate = _fast_path(Optional[RFC3339], Annotated[Optional[str], BeforeValidator(_start_date)])
+EndDate = _fast_path(Optional[RFC3339], Annotated[Optional[str], BeforeValidator(_end_date)])
+StringList = _fast_path(list[str], Annotated[list[str], BeforeValidator(_string_list)])
+Flag = _fast_path(bool, Annotated[bool, BeforeValidator(_flag)])
+
+
+@dataclass(slots=True, config=ConfigDict(extra="ignore"))
+class Deal:
+    product_name: Text = None
+    sku: Text = None
+    product_category: Text = None
+    price: Money = None
+    original_price: Money = None
+    store: Text = None
+    valid_from: StartDate = None
+    valid_to: EndDate = None
+    deal_type: Text = None
+    in_store_only: Flag = False
+    deal_conditions: StringList = field(default_factory=list)
+    attributes: StringList = field(default_factory=list)
+    bundle_deal: Flag = False
+    required_purchase: Text = None
+    free_item: Text = None
+    # Flyer page the deal was extracted from (provenance, not shown to the LLM)
+    source_image: Optional[str] = None
+
+
+DEAL_ADAPTER = TypeAdapter(Deal)
+DEAL_LIST_ADAPTER = TypeAdapter(list[Deal])
+
+
+def as_deal(deal):
+    """A Deal for a Deal or a deal dict."""
+    return deal if isinstance(deal, Deal) else DEAL_ADAPTER.validate_python(deal)
+
+
+def coerce_deals(items):
+    """
+    Validates a list of deal dicts (e.g. one extracted page). Non-objects and deals
+    that can't be coerced are skipped rather than failing the whole list.
+    """
+    items = [item for item in items or [] if isinstance(item, (dict, Deal))]
+    try:
+        return DEAL_LIST_ADAPTER.validate_python(items)
+    except ValidationError:
+        deals = []
+        for item in items:
+            try:
+                deals.append(as_deal(item))
+            except ValidationError:
+                continue
+        return deals
+
+
+def decode_deals(data):
+    """Decodes and validates a JSON deal list (bytes or str) in one pass."""
+    return DEAL_LIST_ADAPTER.validate_json(data)
+
+
+def read_deals_file(path):
+    with open(path, 'rb') as f:
+        return decode_deals(f.read())
+
+
+def decode_deal_json(text, provenance=False):
+    """One deal's JSON (e.g. a Weaviate full_json property) as a normalized dict."""
+    return DEAL_ADAPTER.dump_python(DEAL_ADAPTER.validate_json(text),
+                                    exclude=None if provenance else set(PROVENANCE_FIELDS))
+
+
+def deals_to_dicts(deals, provenance=True):
+    exclude = None if provenance else {"__all__": set(PROVENANCE_FIELDS)}
+    return DEAL_LIST_ADAPTER.dump_python(deals, exclude=exclude)
+
+
+def encode_deals(deals, indent=None):
+    """JSON bytes for a list of Deals."""
+    return DEAL_LIST_ADAPTER.dump_json(deals, indent=indent)
+
+
+def encode_deal(deal, provenance=False):
+    """Compact JSON for one deal (full_json leaves provenance out)."""
+    return DEAL_ADAPTER.dump_json(deal, exclude=None if provenance else set(PROVENANCE_FIELDS)).decode('utf-8')
@@ -0,0 +1,45 @@
+from .deal_model import Deal, as_deal, encode_deal
+
+
+def create_vector_text(deal: Deal):
+    """
+    Creates a rich text string for vectorization from the deal's JSON.
+    This is our 'intelligent chunking' for semantic search.
+    """
+    deal = as_deal(deal)
+    attrs = ", ".join(deal.attributes)
+    conditions = ", ".join(deal.deal_conditions)
+    
+    return (
+        f"Product: {deal.product_name or ''}. "
+        f"Category: {deal.product_category or ''}. "
+        f"Store: {deal.store or ''}. "
+        f"Type of Deal: {deal.deal_type or ''}. "
+        f"Features: {attrs}. "
+        f"Conditions: {conditions}."
+    )
+
+
+def build_deal_properties(deal: Deal):
+    """Maps one extracted deal (Deal or dict) to the 'Deal' collection properties (see get_deal_schema)."""
+    # The model normalizes prices, lists and RFC3339 dates (required by Weaviate)
+    deal = as_deal(deal)
+    return {
+        "product_name": deal.product_name,
+        "sku": deal.sku,
+        "product_category": deal.product_category,
+        "vector_text": create_vector_text(deal),
+        "price": deal.price,
+        "store": deal.store,
+        "original_price": deal.original_price,
+        "deal_type": deal.deal_type,
+        "in_store_only": deal.in_store_only,
+        "deal_conditions": deal.deal_conditions,
+        "valid_from": deal.valid_from,  # RFC3339 format with timezone
+        "valid_to": deal.valid_to,      # RFC3339, date-only end dates run to 23:59:59
+        "bundle_deal": deal.bundle_deal,  # Bundle deals
+        "required_purchase": deal.required_purchase,  # What to buy
+        "free_item": deal.free_item,  # What comes free
+        "source_image": deal.source_image,
+        "full_json": encode_deal(deal),
+    }
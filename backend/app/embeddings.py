@@ -0,0 +1,125 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from .query_utils import normalize_query
+
+# Must match the model the Deal collection was vectorized with (see ingest_data.py)
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+WARM_EMBEDDINGS_PATH = os.getenv(
+    "WARM_EMBEDDINGS_PATH", os.path.join(PROJECT_ROOT, 'backend', 'data', 'warm_query_embeddings.npz')
+)
+
+
+def save_warm_embeddings(path: str, queries: list[str], matrix, model: str = EMBEDDING_MODEL):
+    """Writes precomputed query embeddings (normalized queries + float32 matrix)."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    np.savez(path, queries=np.array(queries), embeddings=np.asarray(matrix, dtype=np.float32),
+             model=np.array(model))
+
+
+class QueryEmbedder:
+    """
+    Embeds search queries in the backend instead of letting Weaviate call OpenAI.
+
+    Lookup order for a normalized query:
+    1. warm set   - precomputed embeddings for popular queries, loaded at startup
+    2. LRU        - recently embedded queries in this process
+    3. shared     - the cross-worker cache ("embedding" namespace), if configured
+    4. OpenAI     - embeddings API call; the result fills the LRU and shared cache
+
+    Tracks hit counts per tier and the average API latency, so the latency saved by
+    cache hits can be reported.
+    """
+
+    def __init__(self, model: str = EMBEDDING_MODEL, shared_cache=None, lru_size: int = 2048,
+                 warm_path: str = WARM_EMBEDDINGS_PATH, openai_client=None):
+        self.model = model
+        self.shared_cache = shared_cache
+        self.lru_size = lru_size
+        self._openai_client = openai_client
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self.warm = self._load_warm_set(warm_path)
+        self.hits = {"warm": 0, "lru": 0, "shared": 0}
+        self.misses = 0
+        self.api_ms_total = 0.0
+
+    def _load_warm_set(self, path: str):
+        if not path or not os.path.exists(path):
+            return {}
+        data = np.load(path)
+        if str(data["model"]) != self.model:
+            print(f"⚠️  Ignoring warm query embeddings built with {data['model']} (backend uses {self.model})")
+            return {}
+        return {str(q): vector for q, vector in zip(data["queries"], data["embeddings"])}
+
+    @property
+    def openai_client(self):
+        if self._openai_client is None:
+            from openai import OpenAI
+            self._openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        return self._openai_client
+
+    def embed(self, query: str):
+        """Returns the query embedding as a float32 vector (blocking; call from a worker thread)."""
+        key = normalize_query(query)
+
+        vector = self.warm.get(key)
+        if vector is not None:
+            self.hits["warm"] += 1
+            return vector
+
+        with self._lock:
+            vector = self._lru.get(key)
+            if vector is not None:
+                self._lru.move_to_end(key)
+        if vector is not None:
+            self.hits["lru"] += 1
+            return vector
+
+        cache_key = f"{self.model}:{key}"
+        if self.shared_cache is not None:
+            data = self.shared_cache.get("embedding", cache_key)
+            if data is not None:
+                self.hits["shared"] += 1
+                vector = np.frombuffer(data, dtype=np.float32)
+                self._remember(key, vector)
+                return vector
+
+        start = time.perf_counter()
+        response = self.openai_client.embeddings.create(model=self.model, input=key)
+        self.api_ms_total += (time.perf_counter() - start) * 1000
+        self.misses += 1
+
+        vector = np.asarray(response.data[0].embedding, dtype=np.float32)
+        self._remember(key, vector)
+        if self.shared_cache is not None:
+            # Raw float32 bytes: 6 KB for 1536 dimensions, no JSON/float text overhead
+            self.shared_cache.set("embedding", cache_key, vector.tobytes())
+        return vector
+
+    def _remember(self, key: str, vector):
+        with self._lock:
+            self._lru[key] = vector
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.lru_size:
+                self._lru.popitem(last=False)
+
+    def stats(self):
+        hits = sum(self.hits.values())
+        lookups = hits + self.misses
+        avg_api_ms = self.api_ms_total / self.misses if self.misses else None
+        return {
+            "model": self.model,
+            "warm_queries": len(self.warm),
+            "hits": dict(self.hits),
+            "misses": self.misses,
+            "hit_rate": round(hits / lookups, 3) if lookups else None,
+            "avg_embedding_ms": round(avg_api_ms, 1) if avg_api_ms is not None else None,
+            # Every hit skipped one embeddings round-trip of average length
+            "latency_saved_ms": round(hits * avg_api_ms, 1) if avg_api_ms is not None else None,
+        }
@@ -0,0 +1,82 @@
+import re
+from .deal_model import decode_deal_json
+from .query_utils import extract_price_ceiling
+
+# Words that carry no product meaning when ranking deals without the LLM
+_STOPWORDS = {
+    "a", "an", "the", "and", "or", "for", "of", "on", "in", "at", "to", "me", "my", "i",
+    "any", "some", "show", "find", "what", "whats", "which", "are", "is", "there", "deals",
+    "deal", "sale", "best", "good", "cheap", "under", "below", "less", "than", "with", "from",
+}
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def _tokens(text: str):
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in _STOPWORDS]
+
+
+def rank_deals_locally(query: str, deals: list[dict], limit: int = 5):
+    """
+    Ranks hybrid-search results without calling the LLM.
+
+    Score = query-term overlap with name/category/store (name counts double)
+    plus a small bonus for the original hybrid rank. Deals above a price
+    ceiling in the query ("under $300") are dropped.
+    """
+    query_terms = set(_tokens(query))
+    price_ceiling = extract_price_ceiling(query)
+
+    scored = []
+    for rank, deal in enumerate(deals):
+        price = deal.get("price")
+        if price_ceiling is not None and isinstance(price, (int, float)) and price > price_ceiling:
+            continue
+
+        name_terms = set(_tokens(deal.get("product_name") or ""))
+        other_terms = set(_tokens(f"{deal.get('product_category') or ''} {deal.get('store') or ''}"))
+        overlap = 2 * len(query_terms & name_terms) + len(query_terms & other_terms)
+        if query_terms and overlap == 0:
+            continue
+
+        rank_bonus = 1 - rank / max(len(deals), 1)
+        scored.append((overlap + rank_bonus, deal))
+
+    scored.sort(key=lambda pair: pair[0], reverse=True)
+    return [deal for _, deal in scored[:limit]]
+
+
+def lexical_matches(query: str, deals: list[dict], limit: int = 3):
+    """
+    Indices of the deals rank_deals_locally() puts first. Empty when the query has
+    no content terms, since the ranking then only echoes the hybrid order.
+    """
+    if not _tokens(query):
+        return []
+    positions = {id(deal): i for i, deal in enumerate(deals)}
+    return [positions[id(deal)] for deal in rank_deals_locally(query, deals, limit)]
+
+
+def build_fallback_answer(deals: list[dict]):
+    """Templated summary used when the LLM is unavailable."""
+    if not deals:
+        return ("Our AI assistant is temporarily unavailable and I couldn't find a close match "
+                "with basic search. Please try again in a moment.")
+
+    lines = ["Our AI assistant is temporarily unavailable, so here are the closest matches from our deal search:"]
+    for deal in deals:
+        price = deal.get("price")
+        price_str = f"${price:.2f}" if isinstance(price, (int, float)) else "see flyer"
+        line = f"- {deal.get('product_name') or 'Unknown product'} at {deal.get('store') or 'unknown store'}: {price_str}"
+        original_price = deal.get("original_price")
+        if isinstance(original_price, (int, float)) and isinstance(price, (int, float)) and original_price > price:
+            line += f" (was ${original_price:.2f})"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def degraded_response(query: str, search_results: list[dict]):
+    """Builds a complete /chat response from search results alone."""
+    all_deals = [decode_deal_json(item['full_json']) for item in search_results]
+    source_deals = rank_deals_locally(query, all_deals)
+    return {"answer": build_fallback_answer(source_deals), "source_deals": source_deals, "mode": "degraded",
+            "candidates": all_deals}
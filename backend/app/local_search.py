@@ -0,0 +1,408 @@
+"""
+Embeddable hybrid search over the deal corpus (pure Python + NumPy).
+
+A drop-in alternative to Weaviate for dev, tests and small deployments
+(SEARCH_BACKEND=local). It mirrors perform_hybrid_search:
+- BM25 over the same weighted query properties (vector_text^2, product_name, sku, product_category)
+- brute-force cosine search over a memory-mapped float32 embedding matrix
+- relative-score fusion weighted by alpha, plus the valid_to date filter
+"""
+
+import asyncio
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+import numpy as np
+from .deal_properties import build_deal_properties
+from .corpus import get_corpus_version
+from .snapshot import DealSnapshot, SNAPSHOT_PATH
+from .embeddings import EMBEDDING_MODEL
+from .weaviate_client import HYBRID_QUERY_PROPERTIES, HYBRID_ALPHA, HYBRID_LIMIT
+from .search_params import search_params_for
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", os.path.join(PROJECT_ROOT, 'backend', 'data', 'local_index'))
+# How often (seconds) the serving index checks the corpus version for a re-ingestion
+LOCAL_INDEX_RELOAD_S = float(os.getenv("LOCAL_INDEX_RELOAD_S", "2"))
+
+# Standard BM25 parameters (same defaults as Weaviate)
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Properties tokenized as a single value in get_deal_schema (Tokenization.FIELD)
+FIELD_TOKENIZED = {"sku", "store", "deal_type"}
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def default_deals_file():
+    """Same lookup as ingestion: scripts/deals.json, else the example file."""
+    deals_file = os.path.join(PROJECT_ROOT, 'scripts', 'deals.json')
+    if not os.path.exists(deals_file):
+        deals_file = os.path.join(PROJECT_ROOT, 'scripts', 'deals.example.json')
+    return deals_file
+
+
+def file_sha256(path: str):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _tokenize(prop: str, value):
+    if value is None:
+        return []
+    if prop in FIELD_TOKENIZED:
+        value = str(value).strip().lower()
+        return [value] if value else []
+    return _WORD_RE.findall(str(value).lower())
+
+
+def _parse_weighted_properties(query_properties):
+    """["vector_text^2", "sku"] -> [("vector_text", 2.0), ("sku", 1.0)]"""
+    weighted = []
+    for prop in query_properties:
+        name, _, boost = prop.partition("^")
+        weighted.append((name, float(boost) if boost else 1.0))
+    return weighted
+
+
+def _to_epoch(date_str):
+    if not date_str:
+        return math.nan
+    try:
+        return datetime.fromisoformat(date_str.replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return math.nan
+
+
+def _relative_scores(scores: dict):
+    """Min-max normalizes a {doc: score} dict to [0, 1] (Weaviate's relativeScoreFusion)."""
+    if not scores:
+        return {}
+    low, high = min(scores.values()), max(scores.values())
+    if high == low:
+        return {doc: 1.0 for doc in scores}
+    return {doc: (score - low) / (high - low) for doc, score in scores.items()}
+
+
+class SnapshotDocuments:
+    """Sequence of Weaviate-style property dicts built on demand from a DealSnapshot."""
+
+    def __init__(self, snapshot: DealSnapshot):
+        self.snapshot = snapshot
+
+    def __len__(self):
+        return len(self.snapshot)
+
+    def __getitem__(self, i: int):
+        return build_deal_properties(self.snapshot.deal(i))
+
+    def __iter__(self):
+        for i in range(len(self.snapshot)):
+            yield self[i]
+
+
+class LocalHybridIndex:
+    """In-process hybrid index. Search results are property dicts, like Weaviate's."""
+
+    def __init__(self, deals: list[dict] = None, embeddings=None, embed_fn=None,
+                 query_properties=HYBRID_QUERY_PROPERTIES, snapshot: DealSnapshot = None):
+        if snapshot is not None:
+            # Zero-copy: dates and embeddings stay in the mapped file
+            self.documents = SnapshotDocuments(snapshot)
+            self.valid_to = snapshot.valid_to_ts
+            if embeddings is None:
+                embeddings = snapshot.embeddings
+        else:
+            self.documents = [build_deal_properties(deal) for deal in deals]
+            self.valid_to = np.array([_to_epoch(doc["valid_to"]) for doc in self.documents], dtype=np.float64)
+        self.snapshot = snapshot
+        self.weighted_properties = _parse_weighted_properties(query_properties)
+        self.embed_fn = embed_fn
+        self.embeddings = None
+        if embeddings is not None:
+            if len(embeddings) != len(self.documents):
+                raise ValueError(f"Embedding matrix has {len(embeddings)} rows for {len(self.documents)} deals")
+            self.embeddings = embeddings
+        self._build_bm25()
+
+    def _build_bm25(self):
+        # prop -> term -> {doc: term frequency}
+        self.postings = {prop: defaultdict(dict) for prop, _ in self.weighted_properties}
+        self.field_lengths = {prop: np.zeros(len(self.documents)) for prop, _ in self.weighted_properties}
+        document_frequency = Counter()
+
+        for doc_id, doc in enumerate(self.documents):
+            doc_terms = set()
+            for prop, _ in self.weighted_properties:
+                tokens = _tokenize(prop, doc.get(prop))
+                self.field_lengths[prop][doc_id] = len(tokens)
+                for term, count in Counter(tokens).items():
+                    self.postings[prop][term][doc_id] = count
+                doc_terms.update(tokens)
+            document_frequency.update(doc_terms)
+
+        n = max(len(self.documents), 1)
+        self.idf = {term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in document_frequency.items()}
+        self.avg_field_length = {prop: max(lengths.mean(), 1e-9) if len(lengths) else 1.0
+                                 for prop, lengths in self.field_lengths.items()}
+
+    def bm25_scores(self, query: str, weights: dict = None):
+        """`weights` overrides per-property boosts for this query, e.g. {"vector_text": 3.0}."""
+        scores = defaultdict(float)
+        for prop, weight in self.weighted_properties:
+            weight = (weights or {}).get(prop, weight)
+            query_terms = _tokenize(prop, query)
+            if prop in FIELD_TOKENIZED:
+                # Also let a single word of the query hit a field value (e.g. a SKU inside a sentence)
+                query_terms = query_terms + _WORD_RE.findall(query.lower())
+            avg_length = self.avg_field_length[prop]
+            for term in set(query_terms):
+                postings = self.postings[prop].get(term)
+                if not postings:
+                    continue
+                idf = self.idf.get(term, 0.0)
+                for doc_id, tf in postings.items():
+                    length_norm = 1 - BM25_B + BM25_B * self.field_lengths[prop][doc_id] / avg_length
+                    scores[doc_id] += weight * idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * length_norm)
+        return scores
+
+    def vector_scores(self, query_vector, candidate_ids, top_k: int):
+        query_vector = np.asarray(query_vector, dtype=np.float32)
+        query_vector = query_vector / (np.linalg.norm(query_vector) or 1.0)
+        similarities = self.embeddings[candidate_ids] @ query_vector
+        if len(candidate_ids) > top_k:
+            top = np.argpartition(-similarities, top_k)[:top_k]
+        else:
+            top = np.arange(len(candidate_ids))
+        return {int(candidate_ids[i]): float(similarities[i]) for i in top}
+
+    def hybrid_search(self, query: str, alpha: float = HYBRID_ALPHA, limit: int = HYBRID_LIMIT,
+                      query_vector=None, apply_date_filter: bool = True, now: float = None,
+                      weights: dict = None):
+        """Fuses BM25 and vector scores: alpha * vector + (1 - alpha) * keyword."""
+        if apply_date_filter:
+            now = now if now is not None else datetime.now(timezone.utc).timestamp()
+            # NaN (no valid_to) compares False, matching Weaviate's filter behaviour
+            allowed = np.nonzero(self.valid_to >= now)[0]
+        else:
+            allowed = np.arange(len(self.documents))
+        if len(allowed) == 0:
+            return []
+        allowed_set = set(allowed.tolist())
+
+        # Like Weaviate, each side contributes its own top candidates before fusion
+        candidate_pool = max(limit * 5, 100)
+        keyword = {doc: s for doc, s in self.bm25_scores(query, weights).items() if doc in allowed_set}
+        keyword = dict(sorted(keyword.items(), key=lambda kv: kv[1], reverse=True)[:candidate_pool])
+
+        vector = {}
+        if alpha > 0 and self.embeddings is not None:
+            if query_vector is None and self.embed_fn is not None:
+                query_vector = self.embed_fn(query)
+            if query_vector is not None:
+                vector = self.vector_scores(query_vector, allowed, candidate_pool)
+        if not vector:
+            alpha = 0.0
+
+        fused = defaultdict(float)
+        for doc, score in _relative_scores(keyword).items():
+            fused[doc] += (1 - alpha) * score
+        for doc, score in _relative_scores(vector).items():
+            fused[doc] += alpha * score
+
+        ranked = sorted(fused.items(), key=lambda kv: kv[1], reverse=True)[:limit]
+        return [self.documents[doc] for doc, _ in ranked]
+
+    def close(self):
+        """Releases the snapshot mapping; present so callers can treat it like a Weaviate client."""
+        if self.snapshot is not None:
+            self.documents = []
+            self.embeddings = None
+            self.valid_to = np.zeros(0)
+            self.snapshot.close()
+
+
+class ReloadingLocalIndex:
+    """
+    The serving index for SEARCH_BACKEND=local: a LocalHybridIndex that is rebuilt in a
+    background thread when the corpus version changes (re-ingestion) and then swapped in,
+    so searches keep running on the previous corpus until the new one is ready.
+    """
+
+    def __init__(self, **load_kwargs):
+        self._load_kwargs = load_kwargs
+        self._embed_fn_override = False
+        self.corpus_version = get_corpus_version()
+        self.index = load_local_index(**load_kwargs)
+        if self.index.snapshot is not None and self.index.snapshot.corpus_version:
+            # A snapshot older than the version file is replaced once ingestion writes the new one
+            self.corpus_version = self.index.snapshot.corpus_version
+        self._checked_at = time.monotonic()
+        self._reloading = False
+        self.reloads = 0
+
+    @property
+    def embeddings(self):
+        return self.index.embeddings
+
+    @property
+    def embed_fn(self):
+        return self.index.embed_fn
+
+    @embed_fn.setter
+    def embed_fn(self, embed_fn):
+        # Kept for indexes loaded later too (e.g. keyword-only replays)
+        self._embed_fn_override, self._embed_fn = True, embed_fn
+        self.index.embed_fn = embed_fn
+
+    def maybe_reload(self):
+        """Starts a background rebuild if the corpus version moved (checked every LOCAL_INDEX_RELOAD_S)."""
+        now = time.monotonic()
+        if self._reloading or now - self._checked_at < LOCAL_INDEX_RELOAD_S:
+            return
+        self._checked_at = now
+        if get_corpus_version() != self.corpus_version:
+            self._reloading = True
+            threading.Thread(target=self.reload, daemon=True).start()
+
+    def reload(self):
+        """Builds the index for the current corpus next to the serving one and swaps it in."""
+        try:
+            version = get_corpus_version()
+            snapshot_path = self._load_kwargs.get("snapshot_path", SNAPSHOT_PATH)
+            if self._load_kwargs.get("deals_file") is None and os.path.exists(snapshot_path):
+                # Ingestion bumps the version before writing the snapshot: wait for the new one
+                snapshot = DealSnapshot(snapshot_path)
+                written_for = snapshot.corpus_version
+                snapshot.close()
+                if written_for is not None and written_for != version:
+                    return False
+            index = load_local_index(**self._load_kwargs)
+            if self._embed_fn_override:
+                index.embed_fn = self._embed_fn
+            # The previous index is left to the garbage collector: in-flight searches may still use it
+            self.index = index
+            self.corpus_version = version
+            self.reloads += 1
+            return True
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Could not reload the local search index: {e}")
+            return False
+        finally:
+            self._reloading = False
+
+    def hybrid_search(self, *args, **kwargs):
+        self.maybe_reload()
+        return self.index.hybrid_search(*args, **kwargs)
+
+    def stats(self):
+        return {"corpus_version": self.corpus_version, "deals": len(self.index.documents), "reloads": self.reloads}
+
+    def close(self):
+        self.index.close()
+
+
+async def perform_local_hybrid_search(index: LocalHybridIndex, query: str, vector=None, params: dict = None):
+    """Same contract as weaviate_client.perform_hybrid_search."""
+    params = params or search_params_for(query)
+    return await asyncio.to_thread(index.hybrid_search, query, params["alpha"], params["limit"], vector,
+                                   weights={"vector_text": params["vector_text_boost"]})
+
+
+def openai_embed_fn(model: str = EMBEDDING_MODEL):
+    """Returns a function that embeds one query string with OpenAI."""
+    from openai import OpenAI
+    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+    def embed(text: str):
+        response = client.embeddings.create(model=model, input=text)
+        return response.data[0].embedding
+    return embed
+
+
+def build_local_embeddings(deals_file: str = None, index_dir: str = LOCAL_INDEX_DIR,
+                           model: str = EMBEDDING_MODEL, batch_size: int = 256):
+    """
+    Embeds every deal's vector_text with OpenAI and writes index_dir/embeddings.npy
+    (float32, L2-normalized, one row per deal in file order) plus meta.json.
+    """
+    from openai import OpenAI
+    deals_file = deals_file or default_deals_file()
+    with open(deals_file, 'r') as f:
+        deals = json.load(f)
+    texts = [build_deal_properties(deal)["vector_text"] for deal in deals]
+
+    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    vectors = []
+    for start in range(0, len(texts), batch_size):
+        response = client.embeddings.create(model=model, input=texts[start:start + batch_size])
+        vectors.extend(item.embedding for item in response.data)
+
+    matrix = np.asarray(vectors, dtype=np.float32)
+    matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+
+    os.makedirs(index_dir, exist_ok=True)
+    np.save(os.path.join(index_dir, 'embeddings.npy'), matrix)
+    with open(os.path.join(index_dir, 'meta.json'), 'w') as f:
+        json.dump({"deals_file": os.path.abspath(deals_file), "deals_sha256": file_sha256(deals_file),
+                   "model": model, "count": len(deals), "dimensions": int(matrix.shape[1])}, f, indent=2)
+    return matrix.shape
+
+
+def load_local_index(deals_file: str = None, index_dir: str = LOCAL_INDEX_DIR, embed_fn=None,
+                     snapshot_path: str = SNAPSHOT_PATH, embed_model: str = None):
+    """
+    Loads the deal corpus and, if present and up to date, the memory-mapped embeddings.
+    The binary snapshot written by ingestion is preferred (no JSON parsing, shared pages);
+    otherwise the deals JSON is used. Without embeddings the index is keyword-only.
+    `embed_model` names the model embed_fn embeds with: if the stored vectors were built
+    with another (or an unrecorded) model, they are not used and the index is keyword-only.
+    """
+    if deals_file is None and os.path.exists(snapshot_path):
+        snapshot = DealSnapshot(snapshot_path)
+        if embed_fn is None and snapshot.embeddings is not None:
+            embed_fn = openai_embed_fn(snapshot.embedding_model or EMBEDDING_MODEL)
+        index = LocalHybridIndex(snapshot=snapshot, embed_fn=embed_fn)
+        return _drop_foreign_embeddings(index, snapshot.embedding_model, embed_model)
+
+    deals_file = deals_file or default_deals_file()
+    with open(deals_file, 'r') as f:
+        deals = json.load(f)
+
+    embeddings, model = load_matching_embeddings(deals_file, index_dir)
+    if embeddings is not None and embed_fn is None:
+        embed_fn = openai_embed_fn(model)
+    index = LocalHybridIndex(deals, embeddings=embeddings, embed_fn=embed_fn)
+    return _drop_foreign_embeddings(index, model, embed_model)
+
+
+def _drop_foreign_embeddings(index: LocalHybridIndex, index_model: str, embed_model: str):
+    # Query vectors from another model live in a different space: cosine scores against them are noise
+    if embed_model is not None and index.embeddings is not None and index_model != embed_model:
+        print(f"⚠️  Local embeddings were built with {index_model or 'an unknown model'}, not {embed_model}: "
+              f"using keyword search only (re-ingest to use vectors)")
+        index.embeddings = None
+    return index
+
+
+def load_matching_embeddings(deals_file: str, index_dir: str = LOCAL_INDEX_DIR):
+    """
+    Returns (memory-mapped embeddings, model) built for exactly this deals file,
+    or (None, None) if there are none or the deals file changed since.
+    """
+    meta_path = os.path.join(index_dir, 'meta.json')
+    if not os.path.exists(meta_path):
+        return None, None
+    with open(meta_path, 'r') as f:
+        meta = json.load(f)
+    if meta.get("deals_sha256") != file_sha256(deals_file):
+        print(f"⚠️  Local embeddings in {index_dir} are stale (deals file changed); using keyword search only")
+        return None, None
+    # mmap_mode='r': pages are shared between worker processes instead of copied
+    return np.load(os.path.join(index_dir, 'embeddings.npy'), mmap_mode='r'), meta.get("model", EMBEDDING_MODEL)
@@ -1,7 +1,16 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from .schemas import QueryRequest, ChatResponse
+from fastapi.responses import JSONResponse
+from typing import List
+from .schemas import QueryRequest, ChatResponse, SavedSearchRequest, SavedSearch, Notification, SuggestResponse
 from .rag_pipeline import RAGPipeline
+from .admission import AdmissionController, AdmissionRejected, client_address
+from .startup import PipelineGate
+from .saved_searches import SavedSearchStore
+from .client_identity import ClientIdentity
+from .suggest import SuggestIndex, SUGGEST_LIMIT
+import asyncio
 import os
 from dotenv import load_dotenv
 
@@ -9,8 +18,28 @@ from dotenv import load_dotenv
 env_path = os.path.join(os.path.dirname(__file__), '../.env')
 load_dotenv(dotenv_path=env_path)
 
-app = FastAPI(title="DealZen API")
-rag_pipeline = RAGPipeline()
+# How long a request waits for a pipeline that is still starting before getting a 503
+READINESS_WAIT_S = float(os.getenv("READINESS_WAIT_S", "2"))
+
+# The pipeline (OpenAI/Weaviate clients) is built in the background once the server is up
+pipeline_gate = PipelineGate(RAGPipeline)
+admission = AdmissionController()
+# Saved searches + notification outbox (filled by ingestion, see scripts/ingest_data.py).
+# Its SQLite calls run in a thread: ingestion write-locks the file while it percolates
+saved_searches = SavedSearchStore()
+# Owner of saved searches / notifications: a server-issued id in a signed cookie
+client_identity = ClientIdentity()
+# Typeahead prefix index (table written by ingestion); independent of the pipeline, so it works during startup
+suggest_index = SuggestIndex()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    pipeline_gate.start()
+    suggest_index.maybe_refresh()
+    yield
+    await pipeline_gate.close()
+
+app = FastAPI(title="DealZen API", lifespan=lifespan)
 
 # Setup CORS
 app.add_middleware(
@@ -19,13 +48,93 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Retry-After"],
 )
 
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request: Request, exc: AdmissionRejected):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": exc.detail},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+def get_client_id(http_request: Request, response: Response):
+    """Identifies the owner of saved searches and notifications (signed cookie, issued on first use)."""
+    return client_identity.resolve(http_request, response)
+
+def get_rate_limit_key(http_request: Request):
+    """Rate limits apply per network address (behind TRUSTED_PROXIES: the forwarded client address)."""
+    peer = http_request.client.host if http_request.client else None
+    return client_address(peer, http_request.headers.get("X-Forwarded-For"), admission.trusted_proxies)
+
 @app.post("/chat", response_model=ChatResponse)
-async def chat_endpoint(request: QueryRequest):
+async def chat_endpoint(request: QueryRequest, http_request: Request):
     """
     Main chat endpoint to receive user queries and return RAG answers.
+    Requests pass server-side admission control first (rate limit, concurrency cap, load shedding).
     """
-    response_data = await rag_pipeline.answer_query(request.query)
+    rag_pipeline = await pipeline_gate.get(READINESS_WAIT_S)
+    async with admission.admit(get_rate_limit_key(http_request)):
+        response_data = await rag_pipeline.answer_query(request.query, request.session_id)
     return ChatResponse(**response_data)
 
+
+@app.get("/suggest", response_model=SuggestResponse)
+async def suggest_endpoint(q: str = "", limit: int = SUGGEST_LIMIT):
+    """
+    Typeahead suggestions (products, categories, stores, brands) for a partial query,
+    ranked by popularity and discount. Served from memory - no search or LLM call.
+    """
+    suggest_index.maybe_refresh()
+    return {"query": q, "suggestions": suggest_index.suggest(q[:100], min(max(limit, 1), 20))}
+
+
+@app.post("/saved-searches", response_model=SavedSearch)
+async def create_saved_search(request: SavedSearchRequest, http_request: Request, response: Response):
+    """
+    Saves a search ("PS5 under $400"); matching deals from later ingestions show up in /notifications.
+    """
+    try:
+        return await asyncio.to_thread(saved_searches.add, get_client_id(http_request, response), request.query)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/saved-searches", response_model=List[SavedSearch])
+async def list_saved_searches(http_request: Request, response: Response):
+    return await asyncio.to_thread(saved_searches.list_searches, get_client_id(http_request, response))
+
+
+@app.delete("/saved-searches/{search_id}")
+async def delete_saved_search(search_id: str, http_request: Request, response: Response):
+    if not await asyncio.to_thread(saved_searches.remove, get_client_id(http_request, response), search_id):
+        raise HTTPException(status_code=404, detail="Saved search not found")
+    return {"deleted": search_id}
+
+
+@app.get("/notifications", response_model=List[Notification])
+async def notifications_endpoint(http_request: Request, response: Response, limit: int = 50):
+    """
+    New deals matching the caller's saved searches, oldest first. Returned notifications are marked delivered.
+    """
+    return await asyncio.to_thread(saved_searches.pending, get_client_id(http_request, response),
+                                   min(max(limit, 1), 200))
+
+
+@app.get("/stats")
+async def stats_endpoint():
+    """
+    Runtime counters for the pipeline (e.g. how many requests were coalesced).
+    """
+    pipeline_stats = pipeline_gate.pipeline.get_stats() if pipeline_gate.is_ready else {}
+    return {**pipeline_stats, "admission": admission.stats(), "startup": pipeline_gate.status(),
+            "saved_searches": await asyncio.to_thread(saved_searches.stats), "suggest": suggest_index.stats()}
+
+@app.get("/ready")
+async def ready_endpoint():
+    """
+    Readiness probe: 200 once the pipeline is connected, 503 while it is still starting.
+    """
+    status = pipeline_gate.status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
@@ -0,0 +1,179 @@
+import os
+import re
+import threading
+import time
+from .fallback import lexical_matches
+from .usage import USAGE_FIELDS, estimate_cost
+
+# Chat model cascade: answer with the small model first and escalate to the large
+# one only when the small answer looks unreliable (see answer_confidence()).
+CHAT_SMALL_MODEL = os.getenv("CHAT_SMALL_MODEL", "gpt-4o-mini")
+CHAT_LARGE_MODEL = os.getenv("CHAT_LARGE_MODEL", "gpt-4o")
+# "cascade" (default), "small", "large" or a model name - used by every class without an override
+CHAT_ROUTE = os.getenv("CHAT_ROUTE", "cascade")
+# Per query class routes, e.g. "compound=large,follow_up=small"
+CHAT_ROUTE_OVERRIDES = os.getenv("CHAT_ROUTE_OVERRIDES", "")
+# Small-model answers scoring below this are re-asked of the large model
+CHAT_CASCADE_MIN_CONFIDENCE = float(os.getenv("CHAT_CASCADE_MIN_CONFIDENCE", "0.7"))
+
+_HEDGE_RE = re.compile(r"\b(not sure|unsure|unclear|can(?:no|')t (?:tell|determine|confirm)|"
+                       r"might be|may or may not|hard to say|i think)\b", re.IGNORECASE)
+
+
+def parse_route_overrides(spec: str):
+    """ "compound=large, sku=small" -> {"compound": "large", "sku": "small"} """
+    overrides = {}
+    for part in spec.split(","):
+        if "=" in part:
+            query_class, route = part.split("=", 1)
+            if query_class.strip() and route.strip():
+                overrides[query_class.strip()] = route.strip()
+    return overrides
+
+
+def answer_confidence(query: str, answer: str, relevant_indices: list[int], no_match: bool, deals: list[dict]):
+    """
+    Heuristic confidence (0-1) in a small-model answer, with the reasons it was lowered.
+
+    - the answer should agree with the local lexical ranker: a "no match" while
+      deals clearly share the query's terms, or a selection that skips every
+      strong lexical match, is suspicious
+    - an answer that selects nothing, or every one of many candidates, did not filter
+    - very short, very long or hedging answers
+    """
+    score, reasons = 1.0, []
+    strong = lexical_matches(query, deals)
+    if no_match:
+        if strong:
+            score -= 0.5
+            reasons.append("no_match despite lexical matches")
+    else:
+        if not relevant_indices:
+            score -= 0.4
+            reasons.append("no deals selected")
+        elif strong and not set(strong) & set(relevant_indices):
+            score -= 0.3
+            reasons.append("disagrees with lexical ranking")
+        if len(deals) > 5 and len(set(relevant_indices)) >= len(deals):
+            score -= 0.2
+            reasons.append("selected every candidate")
+
+    words = len((answer or "").split())
+    if words < 8 and not no_match:
+        score -= 0.3
+        reasons.append("answer too short")
+    elif words > 250:
+        score -= 0.2
+        reasons.append("answer too long")
+    if _HEDGE_RE.search(answer or ""):
+        score -= 0.2
+        reasons.append("hedging")
+    return max(0.0, round(score, 2)), reasons
+
+
+def _add_usage(total: dict, usage: dict):
+    for field in USAGE_FIELDS:
+        if usage.get(field):
+            total[field] = total.get(field, 0) + usage[field]
+    return total
+
+
+class ModelRouter:
+    """
+    Picks the chat model per query class and runs the cascade.
+
+    generate(model) must return (answer, relevant_indices, no_match, usage). route()
+    returns the same tuple with usage summed over every call, plus a route dict
+    (route, model, escalated, confidence, reasons, cost_usd) for the response and query log.
+    With a deadline (time.monotonic()), an escalation that would start past it raises
+    TimeoutError instead: the caller has already given up on the answer.
+    Per-route latency, cost and escalation rate are kept for GET /stats.
+    """
+
+    def __init__(self, default_route: str = CHAT_ROUTE, overrides: dict = None,
+                 small_model: str = CHAT_SMALL_MODEL, large_model: str = CHAT_LARGE_MODEL,
+                 min_confidence: float = CHAT_CASCADE_MIN_CONFIDENCE):
+        self.default_route = default_route
+        self.overrides = parse_route_overrides(CHAT_ROUTE_OVERRIDES) if overrides is None else overrides
+        self.small_model = small_model
+        self.large_model = large_model
+        self.min_confidence = min_confidence
+        self._lock = threading.Lock()
+        self._routes = {}
+
+    def route_for(self, query_class: str):
+        return self.overrides.get(query_class, self.default_route)
+
+    def _model(self, route: str):
+        return {"small": self.small_model, "large": self.large_model}.get(route, route)
+
+    def route(self, query_class: str, query: str, deals: list[dict], generate, deadline: float = None):
+        route = self.route_for(query_class)
+        start = time.perf_counter()
+        usage, cost = {}, 0.0
+        confidence, reasons = None, []
+        escalated = False
+
+        if route == "cascade":
+            try:
+                answer, relevant_indices, no_match, call_usage = generate(self.small_model)
+                _add_usage(usage, call_usage)
+                cost += estimate_cost(self.small_model, call_usage)
+                confidence, reasons = answer_confidence(query, answer, relevant_indices, no_match, deals)
+            except Exception as e:
+                # A failing small model is escalated, not surfaced; only the large model's failures count
+                reasons = [f"small model error: {type(e).__name__}"]
+            if confidence is not None and confidence >= self.min_confidence:
+                model = self.small_model
+            else:
+                model, escalated = self.large_model, True
+                if deadline is not None and time.monotonic() >= deadline:
+                    # Don't pay for the large model on an answer nobody is waiting for
+                    self._record(route, model, escalated, start, cost, error=True)
+                    raise TimeoutError(f"deadline passed before escalating to {model}")
+        else:
+            model = self._model(route)
+
+        if route != "cascade" or escalated:
+            try:
+                answer, relevant_indices, no_match, call_usage = generate(model)
+            except Exception:
+                self._record(route, model, escalated, start, cost, error=True)
+                raise
+            _add_usage(usage, call_usage)
+            cost += estimate_cost(model, call_usage)
+        self._record(route, model, escalated, start, cost)
+
+        info = {"route": route, "model": model, "escalated": escalated, "confidence": confidence,
+                "reasons": reasons, "cost_usd": round(cost, 6)}
+        return answer, relevant_indices, no_match, usage, info
+
+    def _record(self, route: str, model: str, escalated: bool, start: float, cost: float, error: bool = False):
+        with self._lock:
+            stats = self._routes.setdefault(route, {"requests": 0, "escalations": 0, "errors": 0,
+                                                    "latency_ms": 0.0, "cost_usd": 0.0, "models": {}})
+            stats["requests"] += 1
+            stats["escalations"] += escalated
+            stats["errors"] += error
+            stats["latency_ms"] += (time.perf_counter() - start) * 1000
+            stats["cost_usd"] += cost
+            if not error:
+                stats["models"][model] = stats["models"].get(model, 0) + 1
+
+    def stats(self):
+        with self._lock:
+            routes = {
+                route: {
+                    "requests": stats["requests"],
+                    "escalations": stats["escalations"],
+                    "escalation_rate": round(stats["escalations"] / stats["requests"], 3),
+                    "errors": stats["errors"],
+                    "avg_latency_ms": round(stats["latency_ms"] / stats["requests"], 1),
+                    "cost_usd": round(stats["cost_usd"], 6),
+                    "avg_cost_usd": round(stats["cost_usd"] / stats["requests"], 6),
+                    "answered_by": dict(stats["models"]),
+                }
+                for route, stats in self._routes.items()
+            }
+        return {"default_route": self.default_route, "overrides": self.overrides, "small_model": self.small_model,
+                "large_model": self.large_model, "min_confidence": self.min_confidence, "routes": routes}
@@ -0,0 +1,312 @@
+"""
+Cross-store product matching for price-comparison questions.
+
+Ingestion (finalize_ingestion) groups deals that are the same product at
+different stores (or extracted twice) and writes the group table next to the
+snapshot:
+
+- deals sharing a model number (from the name, or a SKU that mixes letters and
+  digits; store-internal numeric SKUs are not comparable) are the same product
+- otherwise deals of the same brand match on name similarity: every token with a
+  digit (sizes, pack counts, voltages) must agree, and the remaining words must
+  overlap by PRODUCT_MATCH_MIN_SIMILARITY (Jaccard)
+
+Each group has a stable product_group_id and precomputed min / max price and
+spread. "Where is the RYOBI kit cheapest?" is then answered by
+ProductGroupIndex.compare() with one lookup, instead of hoping every store's
+deal lands in the hybrid top-k and letting the LLM do the arithmetic.
+"""
+
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+import msgpack
+from .deal_model import PROVENANCE_FIELDS, as_deal
+from .query_log import deal_key
+from .saved_searches import STOPWORDS, normalize_term, parse_saved_search
+from .suggest import product_brand
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+PRODUCT_GROUPS_PATH = os.getenv("PRODUCT_GROUPS_PATH",
+                                os.path.join(PROJECT_ROOT, 'backend', 'data', 'product_groups.msgpack'))
+
+PRODUCT_MATCH_MIN_SIMILARITY = float(os.getenv("PRODUCT_MATCH_MIN_SIMILARITY", "0.75"))
+# Blocks (same brand and size / count tokens) larger than this are matched on model numbers only,
+# since fuzzy matching compares every pair
+PRODUCT_MATCH_MAX_BLOCK = int(os.getenv("PRODUCT_MATCH_MAX_BLOCK", "3000"))
+# A comparison question matching more groups than this is left to retrieval + LLM
+COMPARISON_MAX_GROUPS = int(os.getenv("COMPARISON_MAX_GROUPS", "3"))
+# How often lookups check whether ingestion replaced the table
+PRODUCT_GROUPS_REFRESH_S = float(os.getenv("PRODUCT_GROUPS_REFRESH_S", "2"))
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_MODEL_RE = re.compile(r"[A-Za-z0-9]+(?:-[A-Za-z0-9]+)*")
+# Measurements and counts, not model numbers: "18V", "30-pack", "6-tool", "268pc"
+_UNIT_RE = re.compile(r"\d+[a-z]*")
+# Flyer words that say nothing about which product it is
+NAME_NOISE = {"exclusive", "new", "pc", "piece", "the", "with", "and", "for", "of", "in", "ft", "kit"}
+# Question words of comparison queries (normalized like the terms they are removed from)
+COMPARISON_STOPWORDS = {normalize_term(word) for word in STOPWORDS | {
+    "where", "which", "what", "who", "store", "stores", "compare", "comparison", "lowest", "cheaper", "cost",
+    "costs", "buy", "get", "sell", "sells", "has", "have", "does", "do", "it", "at", "or", "vs", "versus",
+    "between", "across", "difference"}}
+
+
+def model_numbers(deal: dict):
+    """Normalized model numbers of a deal: tokens mixing letters and digits, e.g. QN55Q80C, AF-101 -> AF101."""
+    text = f"{deal.get('product_name') or ''} {deal.get('sku') or ''}"
+    models = set()
+    for token in _MODEL_RE.findall(text):
+        model = token.replace("-", "").upper()
+        if (len(model) >= 5 and any(c.isalpha() for c in model) and any(c.isdigit() for c in model)
+                and not _UNIT_RE.fullmatch(model.lower())):
+            models.add(model)
+    return models
+
+
+def name_tokens(deal: dict):
+    """(words, tokens with digits) of the product name, brand and flyer noise removed."""
+    brand = (product_brand(deal.get("product_name")) or "").lower()
+    words, specs = set(), set()
+    for token in _TOKEN_RE.findall((deal.get("product_name") or "").lower()):
+        if token == brand or token in NAME_NOISE:
+            continue
+        (specs if any(c.isdigit() for c in token) else words).add(normalize_term(token))
+    return words, specs
+
+
+def _same_product(a: dict, b: dict):
+    if a["models"] and b["models"] and not a["models"] & b["models"]:
+        return False
+    if a["category"] and b["category"] and a["category"] != b["category"]:
+        return False
+    if a["specs"] != b["specs"] or not a["words"] or not b["words"]:
+        return False
+    return len(a["words"] & b["words"]) / len(a["words"] | b["words"]) >= PRODUCT_MATCH_MIN_SIMILARITY
+
+
+def valid_to_ts(deal: dict):
+    """End of the deal as epoch seconds (date-only valid_to runs to the end of that day), None if unknown."""
+    valid_to = as_deal(deal).valid_to
+    if not valid_to:
+        return None
+    try:
+        return datetime.fromisoformat(valid_to.replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return None
+
+
+def _find(parent: list, i: int):
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def group_products(deals: list[dict]):
+    """
+    Groups the same product across stores. Returns {product_group_id: group} where a
+    group holds its name, model numbers, deals (cheapest first) with their end times,
+    min / max price, spread and the cheapest store. The prices cover every member;
+    live_offers() narrows them to the deals still valid at lookup time.
+    """
+    features = []
+    for deal in deals:
+        words, specs = name_tokens(deal)
+        features.append({"models": model_numbers(deal), "words": words, "specs": specs,
+                         "category": (deal.get("product_category") or "").split(">")[0].strip().lower(),
+                         "brand": (product_brand(deal.get("product_name")) or "").lower()})
+
+    parent = list(range(len(deals)))
+    # Model numbers are only unique within a brand ("M18", "X2" are whole product lines elsewhere)
+    by_model = defaultdict(list)
+    for i, feature in enumerate(features):
+        for model in feature["models"]:
+            by_model[(feature["brand"], model)].append(i)
+    for members in by_model.values():
+        for i in members[1:]:
+            parent[_find(parent, i)] = _find(parent, members[0])
+
+    # Only deals of the same brand with the same digit tokens can match, so only those are compared
+    blocks = defaultdict(list)
+    for i, feature in enumerate(features):
+        blocks[(feature["brand"], frozenset(feature["specs"]))].append(i)
+    for members in blocks.values():
+        if len(members) > PRODUCT_MATCH_MAX_BLOCK:
+            continue
+        for n, i in enumerate(members):
+            for j in members[n + 1:]:
+                if _find(parent, i) != _find(parent, j) and _same_product(features[i], features[j]):
+                    parent[_find(parent, j)] = _find(parent, i)
+
+    clusters = defaultdict(list)
+    for i in range(len(deals)):
+        clusters[_find(parent, i)].append(i)
+
+    groups = {}
+    for members in clusters.values():
+        group_deals = sorted((deals[i] for i in members),
+                             key=lambda deal: deal.get("price") if deal.get("price") is not None else float("inf"))
+        # Derived from the smallest member, so the id survives re-ingestion while that deal is live
+        # (with the name: flyers reuse numeric SKUs, so deal keys alone collide)
+        anchor = min(f"{deal_key(deal)}|{deal.get('product_name')}" for deal in group_deals)
+        group_id = "pg-" + hashlib.sha1(anchor.encode("utf-8")).hexdigest()[:12]
+        prices = [deal["price"] for deal in group_deals if isinstance(deal.get("price"), (int, float))]
+        groups[group_id] = {
+            "name": group_deals[0].get("product_name"),
+            "models": sorted(set().union(*(features[i]["models"] for i in members))),
+            "deals": [{k: v for k, v in deal.items() if k not in PROVENANCE_FIELDS} for deal in group_deals],
+            "valid_to_ts": [valid_to_ts(deal) for deal in group_deals],
+            "stores": sorted({deal.get("store") for deal in group_deals if deal.get("store")}),
+            "min_price": min(prices) if prices else None,
+            "max_price": max(prices) if prices else None,
+            "spread": round(max(prices) - min(prices), 2) if prices else None,
+            "cheapest_store": group_deals[0].get("store") if prices else None,
+        }
+    return groups
+
+
+def write_product_groups(path: str, deals: list[dict], corpus_version: str = None):
+    """Groups `deals` and writes the table atomically. Returns the groups."""
+    groups = group_products(deals)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(msgpack.packb({"corpus_version": corpus_version, "groups": groups}, use_bin_type=True))
+    os.replace(tmp_path, path)
+    return groups
+
+
+def live_offers(group: dict, now: float):
+    """The group's priced deals (cheapest first) that haven't expired, like search's valid_to >= now filter."""
+    return [deal for deal, ends in zip(group["deals"], group.get("valid_to_ts", []))
+            if ends is not None and ends >= now and deal.get("price") is not None]
+
+
+def format_comparison(groups: list[dict], now: float):
+    """Templated answer for the matched groups, over the offers still valid at `now`."""
+    lines = []
+    for group in groups:
+        offers = live_offers(group, now)
+        if not offers:
+            continue
+        best = offers[0]
+        line = f"{group['name']} is cheapest at {best.get('store') or 'an unknown store'} for ${best['price']:.2f}"
+        others = [deal for deal in offers[1:] if deal.get("store") != best.get("store")]
+        if others:
+            line += " (" + ", ".join(f"{deal.get('store')}: ${deal['price']:.2f}" for deal in others)
+            line += f"; you save up to ${offers[-1]['price'] - best['price']:.2f})"
+        else:
+            line += " - it's the only store with this deal right now"
+        lines.append(line + ".")
+    if not lines:
+        return None
+    return lines[0] if len(lines) == 1 else "Here's where each match is cheapest:\n" + "\n".join(
+        f"- {line}" for line in lines)
+
+
+class ProductGroupIndex:
+    """
+    Lookup side of the group table: model number -> groups and name term -> groups.
+    The table is re-read in a background thread when ingestion replaces it, so lookups
+    on the event loop never wait on the file.
+    """
+
+    def __init__(self, path: str = PRODUCT_GROUPS_PATH):
+        self.path = path
+        self.corpus_version = None
+        self.lookups = 0
+        self.answered = 0
+        self._mtime = None
+        self._checked_at = 0.0
+        self._refreshing = False
+        # (groups, by_model, by_term), swapped as one reference
+        self._table = ({}, {}, {})
+
+    @property
+    def groups(self):
+        return self._table[0]
+
+    def maybe_refresh(self):
+        """Re-reads the table in the background if ingestion replaced it (checked every PRODUCT_GROUPS_REFRESH_S)."""
+        now = time.monotonic()
+        if self._refreshing or now - self._checked_at < PRODUCT_GROUPS_REFRESH_S:
+            return
+        self._checked_at = now
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime != self._mtime:
+            self._refreshing = True
+            threading.Thread(target=self.refresh, daemon=True).start()
+
+    def refresh(self):
+        """Loads the table and builds the lookup maps next to the current ones."""
+        try:
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+                with open(self.path, 'rb') as f:
+                    table = msgpack.unpackb(f.read(), raw=False)
+            except FileNotFoundError:
+                return False
+            except (OSError, ValueError) as e:
+                print(f"⚠️  Could not read product groups {self.path}: {e}")
+                return False
+            groups = table.get("groups", {})
+            by_model, by_term = defaultdict(set), defaultdict(set)
+            for group_id, group in groups.items():
+                for model in group["models"]:
+                    by_model[model].add(group_id)
+                for deal in group["deals"]:
+                    for token in _TOKEN_RE.findall((deal.get("product_name") or "").lower()):
+                        by_term[normalize_term(token)].add(group_id)
+            self._table = (groups, by_model, by_term)
+            self.corpus_version = table.get("corpus_version")
+            self._mtime = mtime
+            return True
+        finally:
+            self._refreshing = False
+
+    def match(self, query: str):
+        """Groups whose products match every product term (or a model number) of the query."""
+        groups, by_model, by_term = self._table
+        # The store of "is the RYOBI kit cheaper at Lowe's?" is parsed out of the terms; the comparison spans all stores
+        parsed = parse_saved_search(query)
+        models = {model for model in model_numbers({"product_name": query}) if model in by_model}
+        if models:
+            ids = set().union(*(by_model[model] for model in models))
+        else:
+            terms = [term for term in parsed["terms"] if term not in COMPARISON_STOPWORDS]
+            if not terms:
+                return []
+            ids = set.intersection(*(by_term.get(term, set()) for term in terms))
+        matched = [groups[group_id] for group_id in ids]
+        # Products sold at several stores first, then the biggest price spread
+        matched.sort(key=lambda group: (-len(group["stores"]), -(group["spread"] or 0)))
+        return matched
+
+    def compare(self, query: str, now: float = None):
+        """(answer, deals) for a comparison question, or None if it should go through retrieval + LLM."""
+        self.maybe_refresh()
+        self.lookups += 1
+        now = now if now is not None else datetime.now(timezone.utc).timestamp()
+        # Expired deals drop out here, not only at ingest: the table lives until the next ingestion
+        groups = [group for group in self.match(query) if live_offers(group, now)]
+        if not groups or len(groups) > COMPARISON_MAX_GROUPS:
+            return None
+        answer = format_comparison(groups, now)
+        if answer is None:
+            return None
+        self.answered += 1
+        return answer, [deal for group in groups for deal in live_offers(group, now)]
+
+    def stats(self):
+        groups = self.groups
+        return {"groups": len(groups),
+                "multi_store_groups": sum(1 for group in groups.values() if len(group["stores"]) > 1),
+                "corpus_version": self.corpus_version, "lookups": self.lookups, "answered": self.answered}
@@ -0,0 +1,146 @@
+import glob
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+QUERY_LOG_DIR = os.getenv("QUERY_LOG_DIR", os.path.join(PROJECT_ROOT, 'backend', 'data', 'query_logs'))
+QUERY_LOG_PREFIX = "queries"
+
+
+def deal_key(deal: dict):
+    """Stable identifier for a deal in logs ("store:sku", else the product name)."""
+    if deal.get("sku") and deal.get("store"):
+        return f"{deal['store']}:{deal['sku']}"
+    return f"{deal.get('store', '')}:{deal.get('product_name', '')}"
+
+
+def query_log_files(log_dir: str = QUERY_LOG_DIR):
+    """Log files oldest first (rotated files carry a timestamp, the active file comes last)."""
+    rotated = sorted(glob.glob(os.path.join(log_dir, f"{QUERY_LOG_PREFIX}-*.jsonl")))
+    active = os.path.join(log_dir, f"{QUERY_LOG_PREFIX}.jsonl")
+    return rotated + ([active] if os.path.exists(active) else [])
+
+
+def read_query_log(paths):
+    """Yields log records from the given files, skipping malformed lines."""
+    for path in paths:
+        with open(path, 'r') as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+
+class QueryLogWriter:
+    """
+    Appends one JSON line per answered /chat query to rotating files.
+
+    record() never blocks the request path: it only puts the record on a
+    bounded queue. A background thread serializes, writes and rotates
+    (QUERY_LOG_MAX_BYTES per file, QUERY_LOG_BACKUPS rotated files kept).
+    If the writer falls behind, new records are dropped and counted rather
+    than slowing requests down.
+    """
+
+    def __init__(self, log_dir: str = QUERY_LOG_DIR, max_bytes: int = 50 * 1024 * 1024, backups: int = 20,
+                 max_pending: int = 10000):
+        self.log_dir = log_dir
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.path = os.path.join(log_dir, f"{QUERY_LOG_PREFIX}.jsonl")
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = None
+        self._file = None
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+
+    def record(self, entry: dict):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="query-log-writer", daemon=True)
+            self._thread.start()
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            entry = self._queue.get()
+            if entry is None:
+                break
+            batch = [entry]
+            # Drain whatever else is waiting so bursts become one write
+            while len(batch) < 500:
+                try:
+                    entry = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if entry is None:
+                    self._write(batch)
+                    return self._close_file()
+                batch.append(entry)
+            self._write(batch)
+        self._close_file()
+
+    def _write(self, batch: list[dict]):
+        try:
+            if self._file is None:
+                os.makedirs(self.log_dir, exist_ok=True)
+                self._file = open(self.path, 'a')
+            self._file.write("".join(json.dumps(e, default=str) + "\n" for e in batch))
+            self._file.flush()
+            self.written += len(batch)
+            if self._file.tell() >= self.max_bytes:
+                self._rotate()
+        except OSError as e:
+            self.errors += 1
+            print(f"⚠️  Query log write failed: {e}")
+
+    def _rotate(self):
+        self._close_file()
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+        os.replace(self.path, os.path.join(self.log_dir, f"{QUERY_LOG_PREFIX}-{stamp}.jsonl"))
+        rotated = sorted(glob.glob(os.path.join(self.log_dir, f"{QUERY_LOG_PREFIX}-*.jsonl")))
+        for old in rotated[:max(0, len(rotated) - self.backups)]:
+            os.remove(old)
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def close(self, timeout_s: float = 5.0):
+        """Flushes pending records and stops the writer thread."""
+        if self._thread is None:
+            return
+        deadline = time.monotonic() + timeout_s
+        while True:
+            try:
+                self._queue.put(None, timeout=max(0.01, deadline - time.monotonic()))
+                break
+            except queue.Full:
+                if time.monotonic() >= deadline:
+                    break
+        self._thread.join(timeout=max(0.0, deadline - time.monotonic()))
+        self._thread = None
+
+    def stats(self):
+        return {"written": self.written, "pending": self._queue.qsize(), "dropped": self.dropped,
+                "errors": self.errors}
+
+
+def create_query_log():
+    """Builds the writer from QUERY_LOG_* settings, or None when logging is disabled."""
+    if os.getenv("QUERY_LOG_ENABLED", "1").lower() in ("0", "false", "no"):
+        return None
+    return QueryLogWriter(
+        log_dir=QUERY_LOG_DIR,
+        max_bytes=int(os.getenv("QUERY_LOG_MAX_BYTES", str(50 * 1024 * 1024))),
+        backups=int(os.getenv("QUERY_LOG_BACKUPS", "20")),
+    )
@@ -0,0 +1,61 @@
+import re
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_TRAILING_PUNCT_RE = re.compile(r"[\s?!.,;:]+$")
+
+
+def normalize_query(query: str):
+    """
+    Normalizes a user query so trivially different spellings share one key.
+    "What TVs are on sale?" and "what tvs are on sale" normalize identically.
+    """
+    normalized = _WHITESPACE_RE.sub(" ", query.strip().lower())
+    return _TRAILING_PUNCT_RE.sub("", normalized)
+
+
+_PRICE_CEILING_RE = re.compile(
+    r"(?:under|below|less than|cheaper than|max(?:imum)?|up to|<)\s*\$?\s*(\d+(?:\.\d+)?)"
+)
+
+
+def extract_price_ceiling(query: str):
+    """Returns the price ceiling in queries like "TVs under $300", or None."""
+    match = _PRICE_CEILING_RE.search(query.lower())
+    return float(match.group(1)) if match else None
+
+
+# Query classes used to break down cost and latency (see usage.py / query logs)
+QUERY_CLASSES = ("sku", "compound", "price", "store", "browse")
+# Long digit runs, or model numbers mixing letters with 3+ digits ("p1817", "xr-65a80j")
+_SKU_RE = re.compile(r"\b(?:\d{5,}|(?=[a-z0-9-]*[a-z])(?=(?:[a-z-]*\d){3})[a-z0-9-]{4,})\b")
+_COMPOUND_RE = re.compile(r"\b(?:and|or|vs|versus|compare)\b|,|&")
+_PRICE_WORDS_RE = re.compile(r"\b(?:cheap|cheapest|cheaper|price|prices|\$\d+|budget|discount|off)\b|\$")
+_STORE_RE = re.compile(r"\b(?:at|from)\s+\w+")
+# Cross-store price questions, answered from the product group table (product_groups.py)
+_COMPARISON_RE = re.compile(
+    r"\b(?:cheapest|lowest price|best price|compare|price difference|which stores?|"
+    r"where\b.*\b(?:cheap|cheaper|lowest|best price))\b"
+)
+
+
+def classify_query(query: str):
+    """
+    Buckets a query into a coarse class: "sku" (model / SKU lookup), "compound"
+    (several products or stores), "price" (price-constrained), "store"
+    (store-specific) or "browse" (everything else).
+    """
+    text = normalize_query(query)
+    if _SKU_RE.search(text):
+        return "sku"
+    if _COMPOUND_RE.search(text):
+        return "compound"
+    if extract_price_ceiling(text) is not None or _PRICE_WORDS_RE.search(text):
+        return "price"
+    if _STORE_RE.search(text):
+        return "store"
+    return "browse"
+
+
+def is_comparison_query(query: str):
+    """True for "Where is the RYOBI kit cheapest?", "compare AirPods prices", "which store has ..." """
+    return bool(_COMPARISON_RE.search(normalize_query(query)))
@@ -1,55 +1,371 @@
+import asyncio
 import json
-from openai import OpenAI
-from .weaviate_client import get_weaviate_client, perform_hybrid_search
+import time
+from .weaviate_client import get_weaviate_client, perform_hybrid_search, collection_embedding_model
+from .retrieval import multi_query_search
+from .single_flight import SingleFlight
+from .query_utils import normalize_query, classify_query, is_comparison_query
+from .corpus import get_corpus_version
+from .resilience import CircuitBreaker
+from .sessions import SessionStore, detect_follow_up
+from .fallback import degraded_response
+from .shared_cache import create_shared_cache
+from .query_log import create_query_log, deal_key
+from .usage import token_usage, UsageMeter
+from .model_router import ModelRouter, CHAT_LARGE_MODEL
+from .deal_model import decode_deal_json
+from .product_groups import ProductGroupIndex
+from .structured_output import (
+    RELEVANCE_RESPONSE_FORMAT, deal_id, parse_structured_response, parse_legacy_response
+)
 import os
 
+# Large model of the chat cascade; generate_answer_with_relevance() defaults to it
+CHAT_MODEL = CHAT_LARGE_MODEL
+
 class RAGPipeline:
     def __init__(self):
-        self.weaviate_client = get_weaviate_client()
-        self.openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        # Answers and retrieval results shared by all workers (invalidated on re-ingestion)
+        self.cache = create_shared_cache()
+        # Query embeddings are computed here (cached + warm set) rather than by Weaviate
+        self.embedder = None
+        if os.getenv("QUERY_EMBEDDING", "backend") == "backend":
+            from .embeddings import QueryEmbedder
+            self.embedder = QueryEmbedder(shared_cache=self.cache, lru_size=int(os.getenv("EMBEDDING_LRU_SIZE", "2048")))
+
+        # "weaviate" (default) or "local" (in-process BM25 + NumPy vectors, see local_search.py)
+        self.search_backend = os.getenv("SEARCH_BACKEND", "weaviate")
+        if self.search_backend == "local":
+            from .local_search import ReloadingLocalIndex, perform_local_hybrid_search
+            # Query vectors must come from the model the stored vectors were built with
+            self.search_client = ReloadingLocalIndex(embed_fn=self.embedder.embed if self.embedder else None,
+                                                     embed_model=self.embedder.model if self.embedder else None)
+            self.search_fn = perform_local_hybrid_search
+        else:
+            self.search_client = get_weaviate_client()
+            if self.embedder is not None:
+                # Vectors from another model than the collection's would be silently wrong, so
+                # only embed here when the collection is known to use the same model
+                collection_model = collection_embedding_model(self.search_client)
+                if collection_model != self.embedder.model:
+                    print(f"⚠️  Deal collection vectorizer model is {collection_model or 'unknown'}, not "
+                          f"{self.embedder.model}: Weaviate embeds queries (re-ingest to use backend embeddings)")
+                    self.embedder = None
+            self.search_fn = self._weaviate_search if self.embedder else perform_hybrid_search
+        # Per-stage deadlines (seconds). Past the budget we serve a degraded answer instead of hanging.
+        self.search_deadline_s = float(os.getenv("SEARCH_DEADLINE_S", "3"))
+        self.llm_deadline_s = float(os.getenv("LLM_DEADLINE_S", "12"))
+        from openai import OpenAI  # deferred: heavy import, only needed once the pipeline is built
+        # The client-side timeout makes sure an abandoned call does not keep a worker thread busy
+        self.openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), timeout=self.llm_deadline_s, max_retries=1)
+        self.openai_breaker = CircuitBreaker(
+            "openai",
+            failure_threshold=int(os.getenv("OPENAI_BREAKER_FAILURES", "5")),
+            reset_timeout_s=float(os.getenv("OPENAI_BREAKER_RESET_S", "30")),
+        )
+        # "structured" (JSON schema, default) or "legacy" (free text + RELEVANT_DEALS line)
+        self.relevance_mode = os.getenv("RELEVANCE_OUTPUT_MODE", "structured")
+        # Identical queries that arrive while one is already being answered share its result
+        self.single_flight = SingleFlight()
+        self.sessions = SessionStore(
+            ttl_s=float(os.getenv("SESSION_TTL_S", "1800")),
+            max_sessions=int(os.getenv("SESSION_MAX_COUNT", "10000")),
+        )
+        self.follow_up_count = 0
+        # Captured traffic for capacity planning and replay (scripts/replay_queries.py)
+        self.query_log = create_query_log()
+        # Chat token/cost totals per query class (see GET /stats and scripts/usage_report.py)
+        self.usage_meter = UsageMeter()
+        # Small model first, large model on low confidence (per query class, see model_router.py)
+        self.router = ModelRouter()
+        # Same product across stores with precomputed price spread (written at ingest, see product_groups.py)
+        self.product_groups = ProductGroupIndex()
+        self.product_groups.refresh()
+
+    async def answer_query(self, query: str, session_id: str = None):
+        start = time.perf_counter()
+        session = self.sessions.get_or_create(session_id)
+
+        follow_up_deals = detect_follow_up(query, session)
+        query_class = "follow_up" if follow_up_deals is not None else classify_query(query)
+        if follow_up_deals is not None:
+            # Answer from the previous turn's candidates: no retrieval, small context
+            self.follow_up_count += 1
+            response = await self._answer_follow_up(query, session, follow_up_deals, query_class)
+        else:
+            # Fresh questions don't depend on the conversation, so they can be cached and coalesced
+            normalized = normalize_query(query)
+            cached = await self.cache.aget("answer", normalized) if self.cache is not None else None
+            if cached is not None:
+                response = {**cached, "mode": "cached", "timings": None, "usage": None}
+            else:
+                key = (normalized, get_corpus_version())
+                led = []  # filled only when this request computes the answer itself
+
+                def compute():
+                    led.append(True)
+                    return self._answer_and_cache(query, normalized, query_class)
+
+                response = await self.single_flight.do(key, compute)
+                if not led:
+                    # Coalesced onto another request: no tokens of its own
+                    response = {**response, "usage": None}
+
+        session.record_turn(query, response["answer"], response.get("candidates", []), response.get("selected_ids", []))
+        cost = None
+        if response.get("usage"):
+            route = response.get("route") or {}
+            cost = self.usage_meter.record(query_class, route.get("model", CHAT_MODEL), response["usage"],
+                                           (response.get("timings") or {}).get("generation_ms"),
+                                           cost=route.get("cost_usd"))
+        if self.query_log is not None:
+            self.query_log.record(self._log_entry(query, session.session_id, response, start, query_class, cost))
+        # The response dict may be shared with coalesced callers - build a new one
+        public = {k: v for k, v in response.items() if k not in ("candidates", "selected_ids", "usage")}
+        public["session_id"] = session.session_id
+        return public
+
+    def _log_entry(self, query: str, session_id: str, response: dict, start: float, query_class: str, cost: float):
+        return {
+            "ts": time.time(),
+            "session_id": session_id,
+            "query": query,
+            "normalized": normalize_query(query),
+            "query_class": query_class,
+            "mode": response.get("mode"),
+            "corpus_version": get_corpus_version(),
+            "total_ms": round((time.perf_counter() - start) * 1000, 1),
+            "timings": response.get("timings"),
+            "tokens": response.get("usage"),
+            "cost_usd": round(cost, 6) if cost is not None else None,
+            "route": self._route_summary(response),
+            "candidates": len(response.get("candidates", [])),
+            "selected": [deal_key(deal) for deal in response.get("source_deals", [])],
+        }
+
+    @staticmethod
+    def _route_summary(response: dict):
+        route = response.get("route")
+        if not route or response.get("mode") == "cached":
+            return None
+        return {key: route[key] for key in ("route", "model", "escalated", "confidence")}
+
+    async def _weaviate_search(self, client, query: str):
+        """Hybrid search with a backend-computed (usually cached) query vector."""
+        vector = await asyncio.to_thread(self.embedder.embed, query)
+        return await perform_hybrid_search(client, query, vector=vector)
 
-    async def answer_query(self, query: str):
-        search_results = await perform_hybrid_search(self.weaviate_client, query)
+    async def _answer_and_cache(self, query: str, normalized: str, query_class: str, ttl_s: float = None):
+        response = await self._answer_query(query, query_class)
+        # Degraded / unavailable answers are never cached - they should recover on the next request
+        if self.cache is not None and response.get("mode") == "full":
+            await self.cache.aset("answer", normalized, response, ttl_s=ttl_s)
+        return response
+
+    async def warm_answer(self, query: str, ttl_s: float = None):
+        """
+        Computes and caches the answer to `query` ahead of user traffic (post-ingest warm-up,
+        see scripts/warm_answer_cache.py). Returns the response, or None if it was already cached.
+        """
+        normalized = normalize_query(query)
+        if self.cache is None or await self.cache.aget("answer", normalized) is not None:
+            return None
+        query_class = classify_query(query)
+        response = await self.single_flight.do(
+            (normalized, get_corpus_version()), lambda: self._answer_and_cache(query, normalized, query_class, ttl_s)
+        )
+        if response.get("usage"):
+            route = response.get("route") or {}
+            self.usage_meter.record(f"warm:{query_class}", route.get("model", CHAT_MODEL), response["usage"],
+                                    (response.get("timings") or {}).get("generation_ms"), cost=route.get("cost_usd"))
+        return response
+
+    def close(self):
+        self.search_client.close()
+        if self.query_log is not None:
+            self.query_log.close()
+
+    def get_stats(self):
+        return {
+            "single_flight": self.single_flight.stats(),
+            "openai_breaker": self.openai_breaker.stats(),
+            "sessions": {"active": len(self.sessions), "follow_ups": self.follow_up_count},
+            "cache": self.cache.stats.as_dict() if self.cache is not None else None,
+            "embeddings": self.embedder.stats() if self.embedder is not None else None,
+            "query_log": self.query_log.stats() if self.query_log is not None else None,
+            "usage": self.usage_meter.snapshot(),
+            "routing": self.router.stats(),
+            "product_groups": self.product_groups.stats(),
+            "local_index": self.search_client.stats() if self.search_backend == "local" else None,
+        }
+
+    async def _answer_follow_up(self, query: str, session, deals: list[dict], query_class: str = "follow_up"):
+        start = time.perf_counter()
+        if not deals:
+            return {"answer": "None of the deals we just looked at match that. Try asking a new question!",
+                    "source_deals": [], "mode": "follow_up", "candidates": session.candidates}
+
+        search_results = [{"full_json": json.dumps(deal)} for deal in deals]
+        context = self.format_context(search_results)
+        history = session.history_messages()
+        if not self.openai_breaker.allow_request():
+            return degraded_response(query, search_results)
+
+        try:
+            # The router gets the deadline too: wait_for can't stop the thread, so it skips the escalation itself
+            answer, relevant_indices, no_match, usage, route = await asyncio.wait_for(
+                asyncio.to_thread(self.router.route, query_class, query, deals,
+                                  lambda model: self.generate_answer_with_relevance(context, query, len(deals),
+                                                                                    history, model=model),
+                                  time.monotonic() + self.llm_deadline_s),
+                timeout=self.llm_deadline_s
+            )
+        except asyncio.CancelledError:
+            # Every waiter went away: no verdict on OpenAI, but a half-open trial must not stay taken
+            self.openai_breaker.abandon_trial()
+            raise
+        except Exception:
+            self.openai_breaker.record_failure()
+            return degraded_response(query, search_results)
+        self.openai_breaker.record_success()
+
+        # Legacy replies can name ids past the end of the list
+        relevant_indices = [i for i in relevant_indices if 0 <= i < len(deals)]
+        source_deals = [] if no_match else [deals[i] for i in relevant_indices]
+        return {"answer": answer, "source_deals": source_deals, "mode": "follow_up",
+                "timings": {"generation_ms": round((time.perf_counter() - start) * 1000, 1)}, "usage": usage,
+                "route": route,
+                # Keep the narrowed set so a further follow-up narrows again
+                "candidates": deals, "selected_ids": [] if no_match else relevant_indices}
+
+    async def _answer_query(self, query: str, query_class: str = None):
+        if is_comparison_query(query):
+            response = self._answer_comparison(query)
+            if response is not None:
+                return response
+        try:
+            # Compound questions fan out into concurrent sub-queries merged with RRF
+            # Sub-queries past the deadline are dropped; only a search with none finished fails
+            search_results, timings = await multi_query_search(self.search_client, query, self.search_fn, self.cache,
+                                                               deadline_s=self.search_deadline_s)
+        except Exception:
+            # Search timed out or Weaviate is down - there is nothing to fall back on
+            return {"answer": "Deal search is taking longer than usual. Please try again in a moment.",
+                    "source_deals": [], "mode": "unavailable"}
         
         if not search_results:
-            return {"answer": "I'm sorry, I couldn't find any specific deals matching your query.", "source_deals": []}
+            return {"answer": "I'm sorry, I couldn't find any specific deals matching your query.", "source_deals": [],
+                    "mode": "full", "timings": timings}
 
         context = self.format_context(search_results)
-        answer, relevant_indices = self.generate_answer_with_relevance(context, query, len(search_results))
-        
-        all_deals = [json.loads(item['full_json']) for item in search_results]
-        
-        # Check if GPT-4o explicitly said "no deals found"
-        no_deals_phrases = ["couldn't find any deals", "couldn't find any specific deals", 
-                           "no deals", "not find any deals", "don't have any deals"]
-        answer_lower = answer.lower()
-        gpt_found_no_deals = any(phrase in answer_lower for phrase in no_deals_phrases)
+        all_deals = [decode_deal_json(item['full_json']) for item in search_results]
+        # Skip the LLM entirely while the provider is known to be failing
+        if not self.openai_breaker.allow_request():
+            return {**degraded_response(query, search_results), "timings": timings}
+
+        generation_start = time.perf_counter()
+        try:
+            answer, relevant_indices, no_match, usage, route = await asyncio.wait_for(
+                asyncio.to_thread(self.router.route, query_class or classify_query(query), query, all_deals,
+                                  lambda model: self.generate_answer_with_relevance(context, query, len(search_results),
+                                                                                    model=model),
+                                  time.monotonic() + self.llm_deadline_s),
+                timeout=self.llm_deadline_s
+            )
+        except asyncio.CancelledError:
+            self.openai_breaker.abandon_trial()
+            raise
+        except Exception:
+            # Timeouts, rate limits and API errors all count against the breaker
+            self.openai_breaker.record_failure()
+            return {**degraded_response(query, search_results), "timings": timings}
+        self.openai_breaker.record_success()
+        timings["generation_ms"] = round((time.perf_counter() - generation_start) * 1000, 1)
         
         # If GPT-4o says no deals found, return empty list (don't show random deals!)
-        if gpt_found_no_deals:
-            return {"answer": answer, "source_deals": []}
+        if no_match:
+            return {"answer": answer, "source_deals": [], "mode": "full", "timings": timings, "usage": usage,
+                    "route": route, "candidates": all_deals}
         
         # Trust GPT-4o's relevance filtering
         # Only show deals that GPT-4o identifies as truly relevant
         if relevant_indices:
-            source_deals = [all_deals[i] for i in relevant_indices if i < len(all_deals)]
+            source_deals = [all_deals[i] for i in relevant_indices if 0 <= i < len(all_deals)]
         else:
             # If no indices but GPT has an answer, show no deals (trust GPT)
             source_deals = []
         
         # Sort deals by price (low to high) to ensure best deals appear first
-        source_deals.sort(key=lambda deal: deal.get('price', float('inf')))
+        source_deals.sort(key=lambda deal: deal['price'] if deal['price'] is not None else float('inf'))
         
-        return {"answer": answer, "source_deals": source_deals}
+        return {"answer": answer, "source_deals": source_deals, "mode": "full", "timings": timings, "usage": usage,
+                "route": route, "candidates": all_deals, "selected_ids": [i for i in relevant_indices if 0 <= i < len(all_deals)]}
+
+    def _answer_comparison(self, query: str):
+        """
+        "Where is the RYOBI kit cheapest?" from the product group table: one lookup, prices
+        computed at ingest. None if the question doesn't pin down a few products.
+        """
+        start = time.perf_counter()
+        match = self.product_groups.compare(query)
+        if match is None:
+            return None
+        answer, deals = match
+        return {"answer": answer, "source_deals": deals, "mode": "comparison",
+                "timings": {"lookup_ms": round((time.perf_counter() - start) * 1000, 2)},
+                # Follow-ups ("which of those has free shipping?") work on the compared deals
+                "candidates": deals, "selected_ids": list(range(len(deals)))}
 
     def format_context(self, search_results: list[dict]):
         context_str = "Available deals (Context):\n"
         for i, item in enumerate(search_results):
-            context_str += f"--- Deal {i+1} ---\n{item['full_json']}\n\n"
+            label = deal_id(i) if self.relevance_mode == "structured" else i + 1
+            context_str += f"--- Deal {label} ---\n{item['full_json']}\n\n"
         return context_str
 
-    def generate_answer_with_relevance(self, context: str, query: str, num_deals: int):
-        """Generate answer and identify which deals are actually relevant to the query."""
+    def generate_answer_with_relevance(self, context: str, query: str, num_deals: int, history: list[dict] = None,
+                                       model: str = CHAT_MODEL):
+        """
+        Generate answer and identify which deals are actually relevant to the query.
+        `history` holds compacted conversation messages for follow-up questions; `model` is
+        picked by the router (small or large model of the cascade).
+        Returns (answer, relevant_indices, no_match, usage) - usage holds the token counts.
+        """
+        if self.relevance_mode == "legacy":
+            return self._generate_legacy_answer(context, query, num_deals, history, model)
+
+        system_prompt = f"""
+        You are a helpful Black Friday shopping assistant. 
+        Your goal is to answer the user's question based *only* on the deals provided in the context.
+        Do not use any outside knowledge.
+        Be friendly, concise, and helpful. Summarize the deals that match the query.
+        
+        Respond with JSON:
+        - no_match: true if none of the deals answer the question (then say "I'm sorry, I couldn't find any deals for that.")
+        - relevant_deal_ids: the IDs (e.g. "D1", "D3") of ALL deals that match the user's intent, even if you
+          don't mention every single one in your answer. Be generous in determining relevance.
+        - answer: your friendly answer about the deals
+        
+        Context:
+        {context}
+        """
+        
+        response = self.openai_client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                *(history or []),
+                {"role": "user", "content": query}
+            ],
+            temperature=0.3,
+            response_format=RELEVANCE_RESPONSE_FORMAT
+        )
+        
+        return (*parse_structured_response(response.choices[0].message.content, num_deals), token_usage(response))
+
+    def _generate_legacy_answer(self, context: str, query: str, num_deals: int, history: list[dict] = None,
+                                model: str = CHAT_MODEL):
+        """Free-text prompt with a trailing RELEVANT_DEALS line (RELEVANCE_OUTPUT_MODE=legacy)."""
         system_prompt = f"""
         You are a helpful Black Friday shopping assistant. 
         Your goal is to answer the user's question based *only* on the deals provided in the context.
@@ -69,36 +385,16 @@ class RAGPipeline:
         """
         
         response = self.openai_client.chat.completions.create(
-            model="gpt-4o",
+            model=model,
             messages=[
                 {"role": "system", "content": system_prompt},
+                *(history or []),
                 {"role": "user", "content": query}
             ],
             temperature=0.3
         )
         
-        full_response = response.choices[0].message.content
-        
-        # Parse out the relevant deals
-        relevant_indices = []
-        if "RELEVANT_DEALS:" in full_response:
-            parts = full_response.split("RELEVANT_DEALS:")
-            answer = parts[0].strip()
-            
-            # Extract deal numbers and convert to 0-indexed
-            try:
-                deals_str = parts[1].strip()
-                deal_numbers = [int(x.strip()) for x in deals_str.split(",") if x.strip().isdigit()]
-                relevant_indices = [num - 1 for num in deal_numbers if num > 0]  # Convert to 0-indexed
-            except:
-                # If parsing fails, return all deals
-                relevant_indices = list(range(num_deals))
-        else:
-            # If no RELEVANT_DEALS marker found, return answer as-is and all deals
-            answer = full_response
-            relevant_indices = list(range(num_deals))
-        
-        return answer, relevant_indices
+        return (*parse_legacy_response(response.choices[0].message.content, num_deals), token_usage(response))
     
     def generate_answer(self, context: str, query: str):
         """Legacy method for backward compatibility."""
@@ -114,7 +410,7 @@ class RAGPipeline:
         """
         
         response = self.openai_client.chat.completions.create(
-            model="gpt-4o",
+            model=CHAT_MODEL,
             messages=[
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": query}
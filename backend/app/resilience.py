@@ -0,0 +1,80 @@
+import threading
+import time
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Classic three-state circuit breaker around an unreliable dependency (OpenAI).
+
+    - closed:    calls go through; consecutive failures are counted.
+    - open:      after `failure_threshold` consecutive failures, calls are refused
+                 immediately for `reset_timeout_s` so we stop waiting on a sick provider.
+    - half_open: after the timeout one trial call is let through. Success closes the
+                 breaker again, failure re-opens it. A trial that never reports back
+                 (cancelled, see abandon_trial()) stops blocking others after `trial_timeout_s`.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout_s: float = 30,
+                 trial_timeout_s: float = None):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_s = reset_timeout_s
+        self.trial_timeout_s = reset_timeout_s if trial_timeout_s is None else trial_timeout_s
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.total_failures = 0
+        self.total_rejections = 0
+        self._trial_in_flight = False
+        self._trial_started_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow_request(self):
+        """Returns True if a call may be attempted right now."""
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout_s:
+                self.state = "half_open"
+                self._trial_in_flight = False
+
+            if self.state == "closed":
+                return True
+            if self.state == "half_open" and (not self._trial_in_flight or
+                                              time.monotonic() - self._trial_started_at >= self.trial_timeout_s):
+                self._trial_in_flight = True
+                self._trial_started_at = time.monotonic()
+                return True
+
+            self.total_rejections += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.consecutive_failures = 0
+            self._trial_in_flight = False
+
+    def abandon_trial(self):
+        """The admitted call ended without a result (e.g. cancelled): let the next one be the trial."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.total_failures += 1
+            self.consecutive_failures += 1
+            if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+                self.state = "open"
+                self.opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+    def stats(self):
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "total_failures": self.total_failures,
+            "rejected_calls": self.total_rejections,
+        }
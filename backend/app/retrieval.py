@@ -0,0 +1,171 @@
+import asyncio
+import re
+import time
+from .weaviate_client import perform_hybrid_search
+from .query_utils import normalize_query
+
+# Fan-out limits: never run more than this many sub-queries for one question
+MAX_SUBQUERIES = 4
+# Reciprocal-rank fusion constant (standard value from the RRF paper)
+RRF_K = 60
+# Number of merged results handed to generation (same as the single-query window)
+MERGED_LIMIT = 20
+
+# Multi-word names that contain a conjunction and must not be split
+_PROTECTED_PHRASES = ["black and decker", "black & decker", "mac and cheese", "salt and pepper",
+                      "bed bath and beyond", "barnes and noble", "tools and home"]
+_PRICE_CLAUSE_RE = re.compile(
+    r"\b(?:under|below|less than|cheaper than|over|above|between|up to)\s*\$?\s*\d+(?:\.\d+)?"
+    r"(?:\s*(?:and|-|to)\s*\$?\s*\d+(?:\.\d+)?)?",
+    re.IGNORECASE,
+)
+_STORE_CLAUSE_RE = re.compile(r"\s+(?:at|from)\s+(.+)$", re.IGNORECASE)
+_CONJUNCTION_RE = re.compile(r"\s*(?:,|\band\b|\bor\b|&|/|\bplus\b)\s*", re.IGNORECASE)
+
+
+def _split_terms(text: str):
+    """Splits "TVs and soundbars" into ["TVs", "soundbars"], keeping protected names intact."""
+    placeholders = {}
+    for i, phrase in enumerate(_PROTECTED_PHRASES):
+        pattern = re.compile(re.escape(phrase), re.IGNORECASE)
+        if pattern.search(text):
+            token = f"__protected{i}__"
+            placeholders[token] = pattern.search(text).group(0)
+            text = pattern.sub(token, text)
+
+    terms = []
+    for term in _CONJUNCTION_RE.split(text):
+        for token, original in placeholders.items():
+            term = term.replace(token, original)
+        if term.strip():
+            terms.append(term.strip())
+    return terms
+
+
+def _complete_phrase(term: str, last: str):
+    """
+    False for a lone word before a multi-word last term: in "mens and womens shoes" or
+    "rock and roll games" it modifies the last term's noun rather than naming a product.
+    "TVs and soundbars" and "gaming laptops and monitors" still split.
+    """
+    return len(term.split()) > 1 or len(last.split()) == 1
+
+
+def decompose_query(query: str):
+    """
+    Splits a compound question into independent sub-queries.
+
+    "TVs and soundbars under $300 at Best Buy or Walmart" becomes
+    ["TVs under $300 Best Buy", "soundbars under $300 Best Buy",
+     "TVs under $300 Walmart", "soundbars under $300 Walmart"].
+
+    Price clauses are copied to every sub-query; product terms and stores are
+    crossed. Simple questions come back unchanged as a single sub-query.
+    """
+    text = query.strip().rstrip("?!.")
+
+    price_match = _PRICE_CLAUSE_RE.search(text)
+    price_clause = price_match.group(0) if price_match else ""
+    if price_match:
+        text = (text[:price_match.start()] + " " + text[price_match.end():]).strip()
+
+    stores = [""]
+    store_match = _STORE_CLAUSE_RE.search(text)
+    if store_match:
+        stores = _split_terms(store_match.group(1)) or [""]
+        text = text[:store_match.start()].strip()
+
+    products = _split_terms(text) or [text]
+    if len(products) > 1 and not all(_complete_phrase(term, products[-1]) for term in products[:-1]):
+        # "mens and womens shoes", "rock and roll games": one product, not a list of them
+        products = [text]
+    if len(products) == 1 and len(stores) == 1:
+        return [query]
+
+    subqueries = []
+    for store in stores:
+        for product in products:
+            subquery = " ".join(part for part in (product, price_clause, store) if part)
+            if subquery not in subqueries:
+                subqueries.append(subquery)
+    return subqueries[:MAX_SUBQUERIES]
+
+
+def _dedup_key(item: dict):
+    """Identity of a deal across sub-query result lists."""
+    if item.get("sku") and item.get("store"):
+        return ("sku", str(item["store"]), item["sku"])
+    return ("json", item.get("full_json"))
+
+
+def reciprocal_rank_fusion(result_lists: list[list[dict]], limit: int = MERGED_LIMIT, k: int = RRF_K):
+    """
+    Merges ranked lists with RRF: score(d) = sum over lists of 1 / (k + rank).
+    Deals found by several sub-queries rise to the top; duplicates collapse into one entry.
+    """
+    scores = {}
+    items = {}
+    for results in result_lists:
+        for rank, item in enumerate(results, 1):
+            key = _dedup_key(item)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+            items.setdefault(key, item)
+
+    ranked = sorted(scores, key=scores.get, reverse=True)
+    return [items[key] for key in ranked[:limit]]
+
+
+async def _timed_search(client, subquery: str, search_fn, cache):
+    start = time.perf_counter()
+    cache_key = normalize_query(subquery)
+    results = await cache.aget("retrieval", cache_key) if cache is not None else None
+    cache_hit, error = results is not None, None
+    if not cache_hit:
+        try:
+            results = await search_fn(client, subquery)
+            if cache is not None:
+                await cache.aset("retrieval", cache_key, results)
+        except Exception as e:
+            results, error = [], str(e)
+    timing = {"query": subquery, "ms": round((time.perf_counter() - start) * 1000, 1), "results": len(results)}
+    if cache_hit:
+        timing["cache"] = "hit"
+    if error:
+        timing["error"] = error
+    return results, timing
+
+
+async def multi_query_search(client, query: str, search_fn=perform_hybrid_search, cache=None,
+                             deadline_s: float = None):
+    """
+    Decomposes the query, runs all sub-queries concurrently and fuses the results.
+    Returns (merged_results, timings). Latency is that of the slowest sub-query,
+    not the sum. A failing sub-query only loses its own results unless all fail.
+    Sub-queries still running after `deadline_s` are cancelled and dropped the same way;
+    only when none finished does the search fail (asyncio.TimeoutError).
+    `search_fn` is perform_hybrid_search or the local backend's equivalent; sub-query
+    results are read from / written to the shared cache when one is given.
+    """
+    subqueries = decompose_query(query)
+    start = time.perf_counter()
+    tasks = [asyncio.create_task(_timed_search(client, subquery, search_fn, cache)) for subquery in subqueries]
+    done, pending = await asyncio.wait(tasks, timeout=deadline_s)
+    for task in pending:
+        task.cancel()
+    late_ms = round((time.perf_counter() - start) * 1000, 1)
+    outcomes = [task.result() if task in done else ([], {"query": subquery, "ms": late_ms, "results": 0,
+                                                         "error": "deadline exceeded"})
+                for subquery, task in zip(subqueries, tasks)]
+    timings = {
+        "search_ms": round((time.perf_counter() - start) * 1000, 1),
+        "subqueries": [timing for _, timing in outcomes],
+    }
+
+    if not done:
+        raise asyncio.TimeoutError(f"No sub-query finished within {deadline_s}s")
+    if all("error" in timing for _, timing in outcomes):
+        raise RuntimeError(outcomes[0][1]["error"])
+
+    if len(subqueries) == 1:
+        return outcomes[0][0], timings
+    return reciprocal_rank_fusion([results for results, _ in outcomes]), timings
@@ -0,0 +1,336 @@
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from datetime import datetime
+from .deal_model import ensure_rfc3339
+from .query_log import deal_key
+from .query_utils import normalize_query, extract_price_ceiling
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+SAVED_SEARCH_DB_PATH = os.getenv("SAVED_SEARCH_DB_PATH",
+                                 os.path.join(PROJECT_ROOT, 'backend', 'data', 'saved_searches.db'))
+SAVED_SEARCH_MAX_PER_CLIENT = int(os.getenv("SAVED_SEARCH_MAX_PER_CLIENT", "20"))
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_PRICE_FLOOR_RE = re.compile(r"(?:over|above|more than|at least|min(?:imum)?|>)\s*\$?\s*(\d+(?:\.\d+)?)")
+_PRICE_RANGE_RE = re.compile(r"between\s*\$?\s*(\d+(?:\.\d+)?)\s*(?:and|-|to)\s*\$?\s*(\d+(?:\.\d+)?)")
+_PRICE_PHRASE_RE = re.compile(
+    r"(?:between\s*\$?\s*\d+(?:\.\d+)?\s*(?:and|-|to)\s*|under|below|less than|cheaper than|max(?:imum)?|up to|<|"
+    r"over|above|more than|at least|min(?:imum)?|>)\s*\$?\s*\d+(?:\.\d+)?|\$\s*\d+(?:\.\d+)?"
+)
+_STORE_PHRASE_RE = re.compile(r"\b(?:at|from)\s+((?:[a-z0-9&'-]+\s*){1,3})")
+# Longest store name, in words ("at best buy" -> "bestbuy"), and words that end one
+MAX_STORE_WORDS = 3
+STORE_NAME_BREAKS = {"with", "for", "in", "on", "and", "or", "that", "this", "today", "now", "deal", "deals", "sale"}
+_FILLER_RE = re.compile(r"\bblack friday\b|\bdoor ?crashers?\b")
+STOPWORDS = {
+    "a", "an", "the", "any", "some", "deal", "deals", "sale", "sales", "on", "for", "in", "of", "with", "and",
+    "me", "my", "i", "want", "need", "looking", "show", "find", "tell", "when", "is", "are", "there", "new",
+    "cheap", "cheapest", "price", "prices", "discount", "discounted", "good", "best", "great", "offer", "offers",
+    "today", "now",
+}
+# Deal fields a saved search's terms are matched against
+TERM_FIELDS = ("product_name", "sku", "product_category", "attributes")
+
+
+def normalize_term(token: str):
+    """Lowercase token with a naive plural strip, so "tvs" matches "TV"."""
+    if len(token) >= 3 and token.endswith("s") and not token.endswith(("ss", "us", "is")):
+        return token[:-1]
+    return token
+
+
+def store_key(store: str):
+    return re.sub(r"[^a-z0-9]", "", (store or "").lower())
+
+
+def parse_saved_search(query: str):
+    """
+    Splits a saved query into the constraints the percolator indexes:
+    "PS5 under $400 at Best Buy" -> terms ["ps5"], store "bestbuy", price (None, 400).
+    """
+    text = _FILLER_RE.sub(" ", normalize_query(query))
+    min_price, max_price = None, extract_price_ceiling(text)
+    price_range = _PRICE_RANGE_RE.search(text)
+    if price_range:
+        min_price, max_price = sorted(float(value) for value in price_range.groups())
+    else:
+        floor = _PRICE_FLOOR_RE.search(text)
+        min_price = float(floor.group(1)) if floor else None
+    text = _PRICE_PHRASE_RE.sub(" ", text)
+
+    store = None
+    store_match = _STORE_PHRASE_RE.search(text)
+    if store_match:
+        # The store name runs until the next filler word: "at costco with wall mount" -> "costco"
+        words = store_match.group(1).split()
+        name = []
+        for word in words[:MAX_STORE_WORDS]:
+            if word in STORE_NAME_BREAKS:
+                break
+            name.append(word)
+        store = store_key("".join(name)) or None
+        rest = " ".join(words[len(name):])
+        text = text[:store_match.start()] + " " + rest + " " + text[store_match.end():]
+
+    terms = sorted({normalize_term(token) for token in _WORD_RE.findall(text) if token not in STOPWORDS})
+    return {"terms": terms, "store": store, "min_price": min_price, "max_price": max_price}
+
+
+def deal_terms(deal: dict):
+    values = []
+    for field in TERM_FIELDS:
+        value = deal.get(field)
+        values.extend(value if isinstance(value, list) else [value])
+    text = " ".join(str(value) for value in values if value).lower()
+    return {normalize_term(token) for token in _WORD_RE.findall(text)}
+
+
+def _deal_expired(deal: dict, now: float):
+    valid_to = ensure_rfc3339(deal.get("valid_to"))
+    if not valid_to:
+        return False
+    if 'T' not in deal["valid_to"]:
+        valid_to = valid_to.replace('T00:00:00Z', 'T23:59:59Z')  # date-only: valid through that day
+    try:
+        return datetime.fromisoformat(valid_to.replace('Z', '+00:00')).timestamp() < now
+    except ValueError:
+        return False
+
+
+class IntervalTree:
+    """Static centered interval tree over closed [low, high] intervals; stab(x) finds those containing x."""
+
+    def __init__(self, intervals: list[tuple]):
+        endpoints = sorted(value for low, high, _ in intervals for value in (low, high) if math.isfinite(value))
+        self.center = endpoints[len(endpoints) // 2] if endpoints else 0.0
+        here = [iv for iv in intervals if iv[0] <= self.center <= iv[1]]
+        left = [iv for iv in intervals if iv[1] < self.center]
+        right = [iv for iv in intervals if iv[0] > self.center]
+        self.by_low = sorted(here, key=lambda iv: iv[0])
+        self.by_high = sorted(here, key=lambda iv: iv[1], reverse=True)
+        self.left = IntervalTree(left) if left else None
+        self.right = IntervalTree(right) if right else None
+
+    def stab(self, x: float, out: set):
+        node = self
+        while node is not None:
+            if x < node.center:
+                for low, _, item in node.by_low:
+                    if low > x:
+                        break
+                    out.add(item)
+                node = node.left
+            elif x > node.center:
+                for _, high, item in node.by_high:
+                    if high < x:
+                        break
+                    out.add(item)
+                node = node.right
+            else:
+                out.update(item for _, _, item in node.by_low)
+                break
+        return out
+
+
+class SavedSearchIndex:
+    """
+    Percolator: the saved searches are indexed, and each deal is run against all of
+    them at once instead of every search being re-run against the corpus.
+
+    - terms:  inverted index term -> searches; a search matches when all of its
+              terms were hit (counted in one pass over the deal's terms)
+    - store:  map store name -> searches; either name may be a prefix of the other
+              ("at best" and "at best buy today" both match store "BESTBUY")
+    - price:  interval tree over [min_price, max_price]
+    """
+
+    def __init__(self, searches: list[dict]):
+        self.searches = {search["id"]: search for search in searches}
+        self.postings = defaultdict(list)
+        self.term_counts = {}
+        self.termless = set()
+        self.by_store = defaultdict(set)
+        self.any_store = set()
+        self.any_price = set()
+        intervals = []
+        for search in searches:
+            search_id = search["id"]
+            for term in search["terms"]:
+                self.postings[term].append(search_id)
+            self.term_counts[search_id] = len(search["terms"])
+            if not search["terms"]:
+                self.termless.add(search_id)
+            if search["store"]:
+                self.by_store[search["store"]].add(search_id)
+            else:
+                self.any_store.add(search_id)
+            if search["min_price"] is None and search["max_price"] is None:
+                self.any_price.add(search_id)
+            else:
+                low = search["min_price"] if search["min_price"] is not None else -math.inf
+                high = search["max_price"] if search["max_price"] is not None else math.inf
+                intervals.append((low, high, search_id))
+        self.prices = IntervalTree(intervals) if intervals else None
+        self.store_names = sorted(self.by_store)
+
+    def __len__(self):
+        return len(self.searches)
+
+    def match(self, deal: dict):
+        """Ids of the saved searches this deal satisfies."""
+        hits = Counter()
+        for term in deal_terms(deal):
+            for search_id in self.postings.get(term, ()):
+                hits[search_id] += 1
+        candidates = {search_id for search_id, count in hits.items() if count == self.term_counts[search_id]}
+        candidates |= self.termless
+        if not candidates:
+            return []
+
+        key = store_key(deal.get("store"))
+        stores = set(self.any_store)
+        if key:
+            for end in range(1, len(key)):
+                stores |= self.by_store.get(key[:end], set())
+            i = bisect_left(self.store_names, key)
+            while i < len(self.store_names) and self.store_names[i].startswith(key):
+                stores |= self.by_store[self.store_names[i]]
+                i += 1
+
+        prices = set(self.any_price)
+        price = deal.get("price")
+        if isinstance(price, (int, float)) and self.prices is not None:
+            self.prices.stab(float(price), prices)
+        return sorted(candidates & stores & prices)
+
+
+class SavedSearchStore:
+    """
+    Saved searches and the notification outbox, in one SQLite file shared by the API
+    (which saves searches and serves notifications) and ingestion (which percolates
+    new deals). A deal is queued once per search and price: re-ingesting the same
+    deal does not notify again, a price change does.
+    """
+
+    def __init__(self, path: str = SAVED_SEARCH_DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS saved_searches ("
+            "id TEXT PRIMARY KEY, client_id TEXT NOT NULL, query TEXT NOT NULL, spec TEXT NOT NULL, "
+            "created_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS saved_searches_client ON saved_searches (client_id)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS notifications ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, search_id TEXT NOT NULL, client_id TEXT NOT NULL, "
+            "deal_key TEXT NOT NULL, price REAL, deal TEXT NOT NULL, created_at REAL NOT NULL, delivered_at REAL, "
+            "UNIQUE (search_id, deal_key, price))"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS notifications_pending ON notifications (client_id, delivered_at)")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _row_to_search(row):
+        return {"id": row["id"], "client_id": row["client_id"], "query": row["query"],
+                "created_at": row["created_at"], **json.loads(row["spec"])}
+
+    def add(self, client_id: str, query: str):
+        """Saves a search. Raises ValueError if it has no constraint or the client is at its limit."""
+        spec = parse_saved_search(query)
+        if not (spec["terms"] or spec["store"] or spec["min_price"] is not None or spec["max_price"] is not None):
+            raise ValueError("Saved search needs a product, store or price to match on")
+        conn = self._connect()
+        count = conn.execute("SELECT COUNT(*) FROM saved_searches WHERE client_id = ?", (client_id,)).fetchone()[0]
+        if count >= SAVED_SEARCH_MAX_PER_CLIENT:
+            raise ValueError(f"At most {SAVED_SEARCH_MAX_PER_CLIENT} saved searches per client")
+        search = {"id": uuid.uuid4().hex, "client_id": client_id, "query": query, "created_at": time.time(), **spec}
+        conn.execute("INSERT INTO saved_searches (id, client_id, query, spec, created_at) VALUES (?, ?, ?, ?, ?)",
+                     (search["id"], client_id, query, json.dumps(spec), search["created_at"]))
+        return search
+
+    def remove(self, client_id: str, search_id: str):
+        conn = self._connect()
+        deleted = conn.execute("DELETE FROM saved_searches WHERE id = ? AND client_id = ?",
+                               (search_id, client_id)).rowcount
+        if deleted:
+            conn.execute("DELETE FROM notifications WHERE search_id = ? AND delivered_at IS NULL", (search_id,))
+        return bool(deleted)
+
+    def list_searches(self, client_id: str = None):
+        conn = self._connect()
+        if client_id is None:
+            rows = conn.execute("SELECT * FROM saved_searches ORDER BY created_at").fetchall()
+        else:
+            rows = conn.execute("SELECT * FROM saved_searches WHERE client_id = ? ORDER BY created_at",
+                                (client_id,)).fetchall()
+        return [self._row_to_search(row) for row in rows]
+
+    def percolate(self, deals: list[dict]):
+        """Matches new/changed deals against every saved search and queues notifications. Returns how many."""
+        searches = self.list_searches()
+        if not searches or not deals:
+            return 0
+        index = SavedSearchIndex(searches)
+        now = time.time()
+        rows = []
+        for deal in deals:
+            if _deal_expired(deal, now):
+                continue
+            for search_id in index.match(deal):
+                rows.append((search_id, index.searches[search_id]["client_id"], deal_key(deal), deal.get("price"),
+                             json.dumps(deal), now))
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO notifications (search_id, client_id, deal_key, price, deal, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)", rows)
+            queued = conn.total_changes - before
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return queued
+
+    def pending(self, client_id: str, limit: int = 50, mark_delivered: bool = True):
+        """Undelivered notifications for a client, oldest first (marked delivered unless told otherwise)."""
+        conn = self._connect()
+        rows = conn.execute(
+            "SELECT n.id, n.search_id, s.query, n.deal, n.created_at FROM notifications n "
+            "JOIN saved_searches s ON s.id = n.search_id "
+            "WHERE n.client_id = ? AND n.delivered_at IS NULL ORDER BY n.id LIMIT ?", (client_id, limit)
+        ).fetchall()
+        if rows and mark_delivered:
+            placeholders = ",".join("?" * len(rows))
+            conn.execute(f"UPDATE notifications SET delivered_at = ? WHERE id IN ({placeholders})",
+                         (time.time(), *(row["id"] for row in rows)))
+        return [{"id": row["id"], "search_id": row["search_id"], "query": row["query"],
+                 "deal": json.loads(row["deal"]), "created_at": row["created_at"]} for row in rows]
+
+    def stats(self):
+        conn = self._connect()
+        return {
+            "saved_searches": conn.execute("SELECT COUNT(*) FROM saved_searches").fetchone()[0],
+            "pending_notifications": conn.execute(
+                "SELECT COUNT(*) FROM notifications WHERE delivered_at IS NULL").fetchone()[0],
+        }
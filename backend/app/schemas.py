@@ -3,8 +3,54 @@ from typing import List, Optional, Any
 
 class QueryRequest(BaseModel):
     query: str = Field(..., max_length=250) # Enforce 250 char limit
+    # Returned by the previous /chat response; enables follow-up questions
+    session_id: Optional[str] = Field(None, max_length=64)
 
 class ChatResponse(BaseModel):
     answer: str
     source_deals: List[dict]
+    # Which path served the answer: "full" (LLM), "cached" (shared answer cache),
+    # "follow_up" (LLM over the previous turn's deals, no retrieval), "degraded"
+    # (search results ranked locally because the LLM was slow/unavailable) or
+    # "unavailable" (search timed out) or "comparison" (cross-store price question
+    # answered from the product group table, no retrieval or LLM)
+    mode: str = "full"
+    # Stage timings in ms, including one entry per retrieval sub-query
+    timings: Optional[dict] = None
+    # Send this back with the next question to ask follow-ups ("which of those is cheapest?")
+    session_id: Optional[str] = None
 
+
+class Suggestion(BaseModel):
+    text: str
+    # "product", "category", "store" or "brand"
+    kind: str
+    # Deals behind the suggestion and the best discount among them (0.25 = 25% off)
+    deals: int
+    max_discount: float
+
+class SuggestResponse(BaseModel):
+    query: str
+    suggestions: List[Suggestion]
+
+
+class SavedSearchRequest(BaseModel):
+    # e.g. "PS5 under $400 at Best Buy": product terms, store and price range are matched
+    # against every newly ingested deal
+    query: str = Field(..., max_length=250)
+
+class SavedSearch(BaseModel):
+    id: str
+    query: str
+    terms: List[str]
+    store: Optional[str] = None
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    created_at: float
+
+class Notification(BaseModel):
+    id: int
+    search_id: str
+    query: str
+    deal: dict
+    created_at: float
@@ -0,0 +1,52 @@
+import json
+import os
+from .query_utils import classify_query
+
+# Hybrid search parameters per query class, chosen offline by scripts/tune_search.py.
+# The backend re-reads the file when it changes, so a new tuning run needs no restart.
+SEARCH_PARAMS_FILE = os.getenv(
+    "SEARCH_PARAMS_FILE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '../search_params.json')
+)
+
+# Used for any class (or field) the file does not set
+DEFAULT_SEARCH_PARAMS = {"alpha": 0.5, "limit": 20, "vector_text_boost": 2.0}
+
+_cached_params = None
+_cached_mtime = None
+
+
+def load_search_params():
+    """Returns {"default": {...}, "classes": {class: {...}}} (re-read only when the file changes)."""
+    global _cached_params, _cached_mtime
+    try:
+        mtime = os.stat(SEARCH_PARAMS_FILE).st_mtime_ns
+    except FileNotFoundError:
+        return {"default": dict(DEFAULT_SEARCH_PARAMS), "classes": {}}
+
+    if mtime != _cached_mtime:
+        try:
+            with open(SEARCH_PARAMS_FILE, 'r') as f:
+                config = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            # Keep serving the last good parameters rather than failing searches
+            print(f"⚠️  Could not read {SEARCH_PARAMS_FILE}: {e}")
+            return _cached_params or {"default": dict(DEFAULT_SEARCH_PARAMS), "classes": {}}
+        _cached_params = {
+            "default": {**DEFAULT_SEARCH_PARAMS, **config.get("default", {})},
+            "classes": config.get("classes", {}),
+        }
+        _cached_mtime = mtime
+    return _cached_params
+
+
+def search_params_for(query: str):
+    """Hybrid parameters for this query's class: {"alpha", "limit", "vector_text_boost"}."""
+    config = load_search_params()
+    return {**config["default"], **config["classes"].get(classify_query(query), {})}
+
+
+def hybrid_query_properties(vector_text_boost: float):
+    """Keyword properties for the hybrid query, with the descriptive text boosted."""
+    boost = f"{vector_text_boost:g}"
+    return [f"vector_text^{boost}", "product_name", "sku", "product_category"]
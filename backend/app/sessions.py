@@ -0,0 +1,158 @@
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from .query_utils import extract_price_ceiling
+from .saved_searches import deal_terms, normalize_term, parse_saved_search, store_key
+
+# Turns kept verbatim in the prompt; older turns are compacted into one summary line
+HISTORY_WINDOW = 2
+# Answers are clipped when replayed as history
+MAX_HISTORY_ANSWER_CHARS = 300
+# Candidate deals remembered from the last retrieval (same as the search window)
+MAX_CANDIDATES = 20
+
+_FOLLOW_UP_RE = re.compile(
+    r"\b(those|these|them|they|that one|this one|the first|the second|the last|which one|which of|"
+    r"any of|of those|of these|the cheapest|cheapest one|most expensive|biggest discount|"
+    r"cheaper|what about|how about|compare them|same store)\b",
+    re.IGNORECASE,
+)
+# Words of the follow-up phrasing itself; anything else in the question is a product / store term
+# (normalized like the terms they are removed from)
+FOLLOW_UP_WORDS = {normalize_term(word) for word in (
+    "those", "these", "them", "they", "that", "this", "it", "one", "ones", "first", "second", "third", "last",
+    "which", "what", "how", "about", "any", "of", "compare", "same", "store", "most", "least", "expensive",
+    "priciest", "highest", "lowest", "cheaper", "biggest", "largest", "discount", "savings", "do", "does",
+    "have", "has", "is", "are", "more", "less", "only", "under", "over", "below", "above", "at", "from",
+    "to", "or", "than",
+)}
+_CHEAPEST_RE = re.compile(r"\b(cheapest|lowest price|least expensive|cheaper)\b", re.IGNORECASE)
+_MOST_EXPENSIVE_RE = re.compile(r"\b(most expensive|priciest|highest price)\b", re.IGNORECASE)
+_DISCOUNT_RE = re.compile(r"\b(biggest|best|largest|most) (discount|savings|deal)\b", re.IGNORECASE)
+
+
+class Session:
+    """One conversation: a window of recent turns plus the last turn's candidate deals."""
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.turns = []  # [{"query": str, "answer": str}]
+        self.summary = ""  # compacted older turns
+        self.candidates = []  # deal dicts retrieved for the last turn
+        self.selected_ids = []  # positions in candidates the LLM judged relevant
+        self.updated_at = time.monotonic()
+
+    def record_turn(self, query: str, answer: str, candidates: list[dict], selected_ids: list[int]):
+        self.turns.append({"query": query, "answer": answer[:MAX_HISTORY_ANSWER_CHARS]})
+        if len(self.turns) > HISTORY_WINDOW:
+            # Compact everything outside the window into a single line of earlier questions
+            older = self.turns[:-HISTORY_WINDOW]
+            self.turns = self.turns[-HISTORY_WINDOW:]
+            asked = "; ".join(turn["query"] for turn in older)
+            self.summary = f"{self.summary}; {asked}" if self.summary else asked
+            self.summary = self.summary[-MAX_HISTORY_ANSWER_CHARS:]
+        self.candidates = candidates[:MAX_CANDIDATES]
+        self.selected_ids = [i for i in selected_ids if i < len(self.candidates)]
+
+    def history_messages(self):
+        """Chat messages describing the conversation so far (compacted)."""
+        messages = []
+        if self.summary:
+            messages.append({"role": "system", "content": f"Earlier in this conversation the user asked: {self.summary}"})
+        for turn in self.turns:
+            messages.append({"role": "user", "content": turn["query"]})
+            messages.append({"role": "assistant", "content": turn["answer"]})
+        return messages
+
+
+class SessionStore:
+    """In-memory sessions with an idle TTL and an LRU cap on the number of sessions."""
+
+    def __init__(self, ttl_s: float = 1800, max_sessions: int = 10_000):
+        self.ttl_s = ttl_s
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_create(self, session_id: str = None):
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(session_id) if session_id else None
+            if session is not None and now - session.updated_at > self.ttl_s:
+                del self._sessions[session_id]
+                session = None
+            if session is None:
+                session = Session(session_id or uuid.uuid4().hex)
+                self._sessions[session.session_id] = session
+            session.updated_at = now
+            self._sessions.move_to_end(session.session_id)
+            self._evict(now)
+            return session
+
+    def _evict(self, now: float):
+        # Oldest sessions sit at the front of the OrderedDict
+        while self._sessions:
+            oldest_id, oldest = next(iter(self._sessions.items()))
+            if len(self._sessions) > self.max_sessions or now - oldest.updated_at > self.ttl_s:
+                del self._sessions[oldest_id]
+            else:
+                break
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+def detect_follow_up(query: str, session: Session):
+    """
+    Decides whether a question refers back to the previous answer.
+    Returns the narrowed candidate deals to answer from, or None for a fresh question.
+    """
+    if not session.candidates or not _FOLLOW_UP_RE.search(query):
+        return None
+    # "What about TVs?" after a drill question is a new search: only questions whose product and
+    # store terms are all covered by the previous candidates are answered from them
+    parsed = parse_saved_search(query)
+    terms = [term for term in parsed["terms"] if term not in FOLLOW_UP_WORDS and not term.isdigit()]
+    if terms and not set(terms) <= set().union(*(deal_terms(deal) for deal in session.candidates)):
+        return None
+    if parsed["store"] and parsed["store"] not in {store_key(deal.get("store")) for deal in session.candidates}:
+        return None
+
+    # Prefer the deals the user was actually shown, fall back to the whole candidate set
+    if session.selected_ids:
+        deals = [session.candidates[i] for i in session.selected_ids]
+    else:
+        deals = list(session.candidates)
+    return narrow_candidates(query, deals)
+
+
+def narrow_candidates(query: str, deals: list[dict]):
+    """Applies cheap, deterministic narrowing (price ceiling, store, sort order) before the LLM sees them."""
+    price_ceiling = extract_price_ceiling(query)
+    if price_ceiling is not None:
+        deals = [d for d in deals if isinstance(d.get("price"), (int, float)) and d["price"] <= price_ceiling]
+
+    query_lower = query.lower()
+    store_matches = [d for d in deals if d.get("store") and str(d["store"]).lower() in query_lower]
+    if store_matches:
+        deals = store_matches
+
+    def price_of(deal):
+        price = deal.get("price")
+        return price if isinstance(price, (int, float)) else float("inf")
+
+    def savings_of(deal):
+        original, price = deal.get("original_price"), deal.get("price")
+        if isinstance(original, (int, float)) and isinstance(price, (int, float)):
+            return original - price
+        return 0
+
+    if _CHEAPEST_RE.search(query):
+        deals = sorted(deals, key=price_of)
+    elif _MOST_EXPENSIVE_RE.search(query):
+        deals = sorted(deals, key=price_of, reverse=True)
+    elif _DISCOUNT_RE.search(query):
+        deals = sorted(deals, key=savings_of, reverse=True)
+    return deals
@@ -0,0 +1,222 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+import msgpack
+from .corpus import get_corpus_version
+
+# Namespaces whose entries depend on the deal corpus. They are only served for the
+# corpus version they were written under and are purged when ingestion bumps it.
+# Query embeddings depend only on the query text, so they survive re-ingestion.
+VERSIONED_NAMESPACES = {"answer", "retrieval"}
+
+# Default time-to-live per namespace (seconds), overridable via <NAMESPACE>_CACHE_TTL_S
+DEFAULT_TTLS = {"answer": 300, "retrieval": 600, "embedding": 7 * 24 * 3600}
+
+# Expired rows are swept every this many writes
+PURGE_EVERY_WRITES = 500
+# Threads running SQLite cache calls for async callers (each keeps its own connection)
+CACHE_IO_THREADS = int(os.getenv("CACHE_IO_THREADS", "4"))
+
+
+def _msgpack_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if hasattr(value, "tolist"):  # numpy arrays / scalars
+        return value.tolist()
+    raise TypeError(f"Cannot cache value of type {type(value).__name__}")
+
+
+def encode_value(value):
+    """Compact binary encoding (msgpack) for cached values."""
+    return msgpack.packb(value, default=_msgpack_default, use_bin_type=True)
+
+
+def decode_value(data: bytes):
+    return msgpack.unpackb(data, raw=False)
+
+
+def ttl_for(namespace: str):
+    return float(os.getenv(f"{namespace.upper()}_CACHE_TTL_S", DEFAULT_TTLS.get(namespace, 300)))
+
+
+class CacheStats:
+    def __init__(self):
+        self.hits = {}
+        self.misses = {}
+
+    def record(self, namespace: str, hit: bool):
+        counter = self.hits if hit else self.misses
+        counter[namespace] = counter.get(namespace, 0) + 1
+
+    def as_dict(self):
+        namespaces = set(self.hits) | set(self.misses)
+        report = {}
+        for ns in sorted(namespaces):
+            hits, misses = self.hits.get(ns, 0), self.misses.get(ns, 0)
+            report[ns] = {"hits": hits, "misses": misses, "hit_rate": round(hits / (hits + misses), 3)}
+        return report
+
+
+class MemoryCache:
+    """Per-process LRU cache with TTL. Not shared between workers."""
+
+    def __init__(self, max_entries: int = 10_000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # (namespace, key) -> (corpus_version, expires_at, encoded)
+        self._lock = threading.Lock()
+        self.stats = CacheStats()
+
+    def get(self, namespace: str, key: str):
+        version = get_corpus_version() if namespace in VERSIONED_NAMESPACES else None
+        with self._lock:
+            entry = self._entries.get((namespace, key))
+            if entry is None or entry[0] != version or entry[1] < time.time():
+                self.stats.record(namespace, False)
+                return None
+            self._entries.move_to_end((namespace, key))
+        self.stats.record(namespace, True)
+        return decode_value(entry[2])
+
+    def set(self, namespace: str, key: str, value, ttl_s: float = None):
+        version = get_corpus_version() if namespace in VERSIONED_NAMESPACES else None
+        expires_at = time.time() + (ttl_s if ttl_s is not None else ttl_for(namespace))
+        with self._lock:
+            self._entries[(namespace, key)] = (version, expires_at, encode_value(value))
+            self._entries.move_to_end((namespace, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    # Async variants for the event loop; memory lookups never block, so they run inline
+    async def aget(self, namespace: str, key: str):
+        return self.get(namespace, key)
+
+    async def aset(self, namespace: str, key: str, value, ttl_s: float = None):
+        self.set(namespace, key, value, ttl_s)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteCache:
+    """
+    Cache shared by every worker on the host through one SQLite file in WAL mode
+    (concurrent readers, one writer, no external service).
+
+    Cross-worker invalidation: the corpus version each worker sees is compared with
+    the one recorded in the file. The first worker to notice a new version records it
+    and deletes all corpus-dependent rows; reads also filter on the version, so a
+    stale row can never be served in between.
+
+    Async code uses aget() / aset(), which run on a small dedicated thread pool: a
+    call can wait up to 5 s on another worker's write lock and must not stall the
+    event loop meanwhile.
+    """
+
+    def __init__(self, path: str, max_entries: int = 100_000):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        self._known_version = None
+        self.stats = CacheStats()
+        self._executor = ThreadPoolExecutor(max_workers=CACHE_IO_THREADS, thread_name_prefix="cache-io")
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "namespace TEXT NOT NULL, key TEXT NOT NULL, corpus_version TEXT, "
+            "expires_at REAL NOT NULL, value BLOB NOT NULL, PRIMARY KEY (namespace, key))"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires_at)")
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")  # durable enough for a cache, much faster
+            self._local.conn = conn
+        return conn
+
+    def _current_version(self, conn):
+        version = get_corpus_version()
+        if version != self._known_version:
+            self._sync_corpus_version(conn, version)
+            self._known_version = version
+        return version
+
+    def _sync_corpus_version(self, conn, version: str):
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT value FROM meta WHERE name = 'corpus_version'").fetchone()
+            if row is None or row[0] != version:
+                placeholders = ",".join("?" * len(VERSIONED_NAMESPACES))
+                conn.execute(f"DELETE FROM cache WHERE namespace IN ({placeholders})", tuple(VERSIONED_NAMESPACES))
+                conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('corpus_version', ?)", (version,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def get(self, namespace: str, key: str):
+        conn = self._connect()
+        version = self._current_version(conn) if namespace in VERSIONED_NAMESPACES else None
+        row = conn.execute(
+            "SELECT value FROM cache WHERE namespace = ? AND key = ? AND corpus_version IS ? AND expires_at >= ?",
+            (namespace, key, version, time.time())
+        ).fetchone()
+        self.stats.record(namespace, row is not None)
+        return decode_value(row[0]) if row else None
+
+    def set(self, namespace: str, key: str, value, ttl_s: float = None):
+        conn = self._connect()
+        version = self._current_version(conn) if namespace in VERSIONED_NAMESPACES else None
+        expires_at = time.time() + (ttl_s if ttl_s is not None else ttl_for(namespace))
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (namespace, key, corpus_version, expires_at, value) VALUES (?, ?, ?, ?, ?)",
+            (namespace, key, version, expires_at, encode_value(value))
+        )
+        self._writes += 1
+        if self._writes % PURGE_EVERY_WRITES == 0:
+            self.purge()
+
+    async def aget(self, namespace: str, key: str):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self.get, namespace, key)
+
+    async def aset(self, namespace: str, key: str, value, ttl_s: float = None):
+        await asyncio.get_running_loop().run_in_executor(self._executor, self.set, namespace, key, value, ttl_s)
+
+    def purge(self):
+        """Deletes expired rows, then the soonest-expiring rows beyond max_entries."""
+        conn = self._connect()
+        conn.execute("DELETE FROM cache WHERE expires_at < ?", (time.time(),))
+        excess = conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0] - self.max_entries
+        if excess > 0:
+            conn.execute(
+                "DELETE FROM cache WHERE rowid IN (SELECT rowid FROM cache ORDER BY expires_at LIMIT ?)", (excess,)
+            )
+
+    def clear(self):
+        self._connect().execute("DELETE FROM cache")
+
+
+def create_shared_cache():
+    """
+    Builds the cache selected by CACHE_BACKEND:
+    "sqlite" (default, shared by all workers), "memory" (per process) or "none".
+    """
+    backend = os.getenv("CACHE_BACKEND", "sqlite")
+    if backend == "none":
+        return None
+    if backend == "memory":
+        return MemoryCache()
+    project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+    path = os.getenv("CACHE_DB_PATH", os.path.join(project_root, 'backend', 'data', 'cache.db'))
+    return SQLiteCache(path)
@@ -0,0 +1,65 @@
+import asyncio
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key into one in-flight computation.
+
+    The first caller for a key (the "leader") starts the computation as a
+    separate task; every caller that arrives while it is running awaits the
+    same task instead of starting its own. Once the task finishes the key is
+    released, so this is NOT a cache - it only deduplicates work that is
+    happening right now.
+
+    - Errors are propagated to every waiter, and the key is released so the
+      next request retries from scratch.
+    - A cancelled waiter never cancels the shared task for the others. The
+      task is only cancelled when every waiter has gone away.
+    """
+
+    def __init__(self):
+        self._in_flight = {}  # key -> [task, waiter_count]
+        self.leader_count = 0
+        self.coalesced_count = 0
+
+    async def do(self, key, coroutine_factory):
+        """Runs coroutine_factory() once per key among concurrent callers and returns its result."""
+        entry = self._in_flight.get(key)
+        if entry is None:
+            task = asyncio.ensure_future(coroutine_factory())
+            entry = [task, 0]
+            self._in_flight[key] = entry
+            task.add_done_callback(lambda _t, k=key, e=entry: self._release(k, e))
+            self.leader_count += 1
+        else:
+            self.coalesced_count += 1
+
+        task = entry[0]
+        entry[1] += 1
+        try:
+            # shield() keeps one caller's cancellation from propagating into the shared task
+            return await asyncio.shield(task)
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and not task.done():
+                # Nobody is waiting for the result any more. Release the key
+                # first so a caller arriving right now starts a fresh task.
+                if self._in_flight.get(key) is entry:
+                    del self._in_flight[key]
+                task.cancel()
+
+    def _release(self, key, entry):
+        # Only drop the key if it still points at this computation
+        if self._in_flight.get(key) is entry:
+            del self._in_flight[key]
+        task = entry[0]
+        if not task.cancelled():
+            # Mark the exception as retrieved when every waiter was cancelled
+            task.exception()
+
+    def stats(self):
+        return {
+            "in_flight": len(self._in_flight),
+            "leaders": self.leader_count,
+            "coalesced": self.coalesced_count,
+        }
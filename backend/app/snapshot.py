@@ -0,0 +1,270 @@
+"""
+Versioned, memory-mappable binary snapshot of the deal corpus.
+
+Layout (little-endian):
+
+    magic "DZSNAP01" | u32 format version | u32 directory length | directory (JSON)
+    ... sections, each 64-byte aligned ...
+
+The directory maps section names to {offset, dtype, shape}. Sections:
+- numeric columns:  price, original_price, valid_from_ts, valid_to_ts (float64, NaN = null), flags (uint8)
+- interned strings: store_id, category_id, deal_type_id (uint32 into the string table, NULL_ID = null)
+                    + strings_offsets (uint64) / strings_blob (utf-8)
+- text fields:      text_offsets (uint64, one row per field) / text_null (uint8) / text_blob (utf-8)
+- embeddings:       optional float32 (count x dimensions) matrix
+
+Readers mmap the file and wrap sections with np.frombuffer, so nothing is
+copied or parsed at load time and forked workers share the same pages.
+Writers replace the file atomically; processes that already mapped the old
+snapshot keep reading it until they reopen.
+"""
+
+import json
+import math
+import mmap
+import os
+import struct
+from datetime import datetime
+import numpy as np
+
+MAGIC = b"DZSNAP01"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+NULL_ID = 0xFFFFFFFF
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+SNAPSHOT_PATH = os.getenv("DEAL_SNAPSHOT_PATH", os.path.join(PROJECT_ROOT, 'backend', 'data', 'deals.snapshot'))
+
+NUMERIC_FIELDS = ["price", "original_price"]
+INTERNED_FIELDS = {"store": "store_id", "product_category": "category_id", "deal_type": "deal_type_id"}
+# Plain text fields; lists and unknown keys are stored as JSON text
+TEXT_FIELDS = ["product_name", "sku", "valid_from", "valid_to", "required_purchase", "free_item",
+               "deal_conditions", "attributes", "extra"]
+JSON_TEXT_FIELDS = {"deal_conditions", "attributes", "extra"}
+# Field order used when rebuilding a deal dict (matches the extraction prompt schema)
+DEAL_FIELD_ORDER = ["product_name", "sku", "product_category", "price", "original_price", "store",
+                    "valid_from", "valid_to", "deal_type", "in_store_only", "deal_conditions",
+                    "attributes", "bundle_deal", "required_purchase", "free_item"]
+
+FLAG_IN_STORE_ONLY = 1
+FLAG_IN_STORE_ONLY_NULL = 2
+FLAG_BUNDLE_DEAL = 4
+FLAG_BUNDLE_DEAL_NULL = 8
+
+
+def _to_epoch(value):
+    if not value or not isinstance(value, str):
+        return math.nan
+    from .deal_model import ensure_rfc3339
+    try:
+        return datetime.fromisoformat(ensure_rfc3339(value).replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return math.nan
+
+
+def _number(value):
+    return float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else math.nan
+
+
+def _bool_flags(value, true_flag, null_flag):
+    if value is None:
+        return null_flag
+    return true_flag if value else 0
+
+
+def _encode_strings(values):
+    """list[str] -> (uint64 offsets of length n+1, utf-8 blob)"""
+    encoded = [v.encode('utf-8') for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.uint64)
+    offsets[1:] = np.cumsum([len(e) for e in encoded], dtype=np.uint64)
+    return offsets, b"".join(encoded)
+
+
+def write_snapshot(path: str, deals: list[dict], embeddings=None, corpus_version: str = None,
+                   embedding_model: str = None):
+    """Writes `deals` (and optionally an aligned embedding matrix) as a snapshot file."""
+    count = len(deals)
+    sections = {}
+
+    for field in NUMERIC_FIELDS:
+        sections[field] = np.array([_number(d.get(field)) for d in deals], dtype=np.float64)
+    sections["valid_from_ts"] = np.array([_to_epoch(d.get("valid_from")) for d in deals], dtype=np.float64)
+    sections["valid_to_ts"] = np.array([_to_epoch(d.get("valid_to")) for d in deals], dtype=np.float64)
+    sections["flags"] = np.array([
+        _bool_flags(d.get("in_store_only"), FLAG_IN_STORE_ONLY, FLAG_IN_STORE_ONLY_NULL)
+        | _bool_flags(d.get("bundle_deal", False), FLAG_BUNDLE_DEAL, FLAG_BUNDLE_DEAL_NULL)
+        for d in deals
+    ], dtype=np.uint8)
+
+    # Interned string table shared by store / category / deal_type
+    string_ids = {}
+    for field, column in INTERNED_FIELDS.items():
+        ids = np.empty(count, dtype=np.uint32)
+        for i, deal in enumerate(deals):
+            value = deal.get(field)
+            if value is None:
+                ids[i] = NULL_ID
+            else:
+                ids[i] = string_ids.setdefault(str(value), len(string_ids))
+        sections[column] = ids
+    sections["strings_offsets"], strings_blob = _encode_strings(list(string_ids))
+    sections["strings_blob"] = np.frombuffer(strings_blob, dtype=np.uint8)
+
+    # Offsets-indexed text region: row f of text_offsets indexes field f for every deal
+    known = set(DEAL_FIELD_ORDER)
+    text_values, text_null = [], np.zeros((len(TEXT_FIELDS), count), dtype=np.uint8)
+    for f, field in enumerate(TEXT_FIELDS):
+        for i, deal in enumerate(deals):
+            if field == "extra":
+                value = {k: v for k, v in deal.items() if k not in known} or None
+            else:
+                value = deal.get(field)
+            if value is None:
+                text_null[f, i] = 1
+                text_values.append("")
+            elif field in JSON_TEXT_FIELDS:
+                text_values.append(json.dumps(value, ensure_ascii=False))
+            else:
+                text_values.append(str(value))
+    flat_offsets, text_blob = _encode_strings(text_values)
+    # Per-field rows of (count + 1) offsets into one shared blob
+    text_offsets = np.empty((len(TEXT_FIELDS), count + 1), dtype=np.uint64)
+    for f in range(len(TEXT_FIELDS)):
+        text_offsets[f] = flat_offsets[f * count:(f + 1) * count + 1]
+    sections["text_offsets"] = text_offsets
+    sections["text_null"] = text_null
+    sections["text_blob"] = np.frombuffer(text_blob, dtype=np.uint8)
+
+    if embeddings is not None:
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        if embeddings.shape[0] != count:
+            raise ValueError(f"Embedding matrix has {embeddings.shape[0]} rows for {count} deals")
+        sections["embeddings"] = embeddings
+
+    # Lay out sections after the header, then write header + padding + data
+    directory = {"count": count, "corpus_version": corpus_version, "embedding_model": embedding_model,
+                 "text_fields": TEXT_FIELDS, "sections": {}}
+    header_reserve = 4096 + 128 * len(sections)
+    offset = header_reserve
+    for name, array in sections.items():
+        offset = (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+        directory["sections"][name] = {"offset": offset, "dtype": array.dtype.str, "shape": list(array.shape)}
+        offset += array.nbytes
+
+    directory_bytes = json.dumps(directory).encode('utf-8')
+    if len(directory_bytes) + 16 > header_reserve:
+        raise ValueError("Snapshot directory does not fit in the header")
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC + struct.pack("<II", FORMAT_VERSION, len(directory_bytes)) + directory_bytes)
+        for name, array in sections.items():
+            f.seek(directory["sections"][name]["offset"])
+            f.write(array.tobytes())
+    os.replace(tmp_path, path)
+    return path
+
+
+class DealSnapshot:
+    """Read-only, zero-copy view of a snapshot file."""
+
+    def __init__(self, path: str = SNAPSHOT_PATH):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._mmap[:8] != MAGIC:
+            raise ValueError(f"{path} is not a deal snapshot")
+        version, directory_length = struct.unpack_from("<II", self._mmap, 8)
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported snapshot format version {version} (expected {FORMAT_VERSION})")
+        directory = json.loads(self._mmap[16:16 + directory_length])
+
+        self.count = directory["count"]
+        self.corpus_version = directory.get("corpus_version")
+        self.embedding_model = directory.get("embedding_model")
+        self._text_field_index = {field: f for f, field in enumerate(directory["text_fields"])}
+        self._sections = {}
+        for name, spec in directory["sections"].items():
+            dtype = np.dtype(spec["dtype"])
+            shape = tuple(spec["shape"])
+            items = int(np.prod(shape)) if shape else 1
+            if items == 0:
+                # Empty sections (e.g. an empty corpus) may sit at an offset past the end of the file
+                self._sections[name] = np.empty(shape, dtype=dtype)
+                continue
+            self._sections[name] = np.frombuffer(self._mmap, dtype=dtype, count=items,
+                                                 offset=spec["offset"]).reshape(shape)
+
+        self.price = self._sections["price"]
+        self.original_price = self._sections["original_price"]
+        self.valid_from_ts = self._sections["valid_from_ts"]
+        self.valid_to_ts = self._sections["valid_to_ts"]
+        self.flags = self._sections["flags"]
+        self.embeddings = self._sections.get("embeddings")
+        self._strings = self._decode_string_table()
+
+    def _decode_string_table(self):
+        # The interned table is tiny (a few hundred values), so decode it once
+        offsets, blob = self._sections["strings_offsets"], self._sections["strings_blob"]
+        return [bytes(blob[offsets[i]:offsets[i + 1]]).decode('utf-8') for i in range(len(offsets) - 1)]
+
+    def __len__(self):
+        return self.count
+
+    def interned(self, field: str, i: int):
+        """store / product_category / deal_type of deal i."""
+        string_id = int(self._sections[INTERNED_FIELDS[field]][i])
+        return None if string_id == NULL_ID else self._strings[string_id]
+
+    def text(self, field: str, i: int):
+        """Decodes one text field of deal i straight from the mapped blob."""
+        f = self._text_field_index[field]
+        if self._sections["text_null"][f, i]:
+            return None
+        offsets = self._sections["text_offsets"][f]
+        value = bytes(self._sections["text_blob"][offsets[i]:offsets[i + 1]]).decode('utf-8')
+        return json.loads(value) if field in JSON_TEXT_FIELDS else value
+
+    def deal(self, i: int):
+        """Rebuilds the deal dict for row i (optional fields missing from the source come back as null)."""
+        flags = int(self.flags[i])
+        values = {
+            "price": None if math.isnan(self.price[i]) else float(self.price[i]),
+            "original_price": None if math.isnan(self.original_price[i]) else float(self.original_price[i]),
+            "in_store_only": None if flags & FLAG_IN_STORE_ONLY_NULL else bool(flags & FLAG_IN_STORE_ONLY),
+            "bundle_deal": None if flags & FLAG_BUNDLE_DEAL_NULL else bool(flags & FLAG_BUNDLE_DEAL),
+        }
+        for field in INTERNED_FIELDS:
+            values[field] = self.interned(field, i)
+        for field in TEXT_FIELDS:
+            if field != "extra":
+                values[field] = self.text(field, i)
+
+        deal = {field: values[field] for field in DEAL_FIELD_ORDER}
+        deal.update(self.text("extra", i) or {})
+        return deal
+
+    def deals(self):
+        for i in range(self.count):
+            yield self.deal(i)
+
+    def close(self):
+        self._sections = {}
+        self.price = self.original_price = self.valid_from_ts = self.valid_to_ts = self.flags = None
+        self.embeddings = None
+        self._mmap.close()
+
+
+def load_deals(deals_file: str = None, snapshot_path: str = SNAPSHOT_PATH):
+    """
+    Returns the deal list, reading the snapshot when it exists instead of parsing JSON.
+    An explicit deals_file always wins. Raises FileNotFoundError if there is neither.
+    """
+    if deals_file is None and os.path.exists(snapshot_path):
+        return list(DealSnapshot(snapshot_path).deals())
+    if deals_file is None:
+        raise FileNotFoundError(f"No deal snapshot at {snapshot_path} and no deals file given")
+    with open(deals_file, 'r') as f:
+        return json.load(f)
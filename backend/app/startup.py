@@ -0,0 +1,74 @@
+import asyncio
+import time
+from .admission import AdmissionRejected
+
+
+class PipelineGate:
+    """
+    Builds the RAG pipeline in the background and gates requests on it being ready.
+
+    The factory (which imports the OpenAI/Weaviate clients and connects) runs in a
+    worker thread after the server has started, so worker spawn is not blocked on
+    it and a down Weaviate no longer crashes the import. Failed attempts are
+    retried with exponential backoff until the pipeline comes up.
+    """
+
+    def __init__(self, factory, retry_initial_s: float = 1, retry_max_s: float = 30):
+        self.factory = factory
+        self.retry_initial_s = retry_initial_s
+        self.retry_max_s = retry_max_s
+        self.pipeline = None
+        self.last_error = None
+        self.attempts = 0
+        self.ready_after_s = None
+        self._ready = asyncio.Event()
+        self._task = None
+        self._started_at = None
+
+    def start(self):
+        self._started_at = time.perf_counter()
+        self._task = asyncio.create_task(self._connect_loop())
+
+    async def _connect_loop(self):
+        delay = self.retry_initial_s
+        while True:
+            self.attempts += 1
+            try:
+                self.pipeline = await asyncio.to_thread(self.factory)
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                print(f"⚠️  Pipeline not ready (attempt {self.attempts}): {self.last_error}. Retrying in {delay:.0f}s")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.retry_max_s)
+                continue
+            self.ready_after_s = round(time.perf_counter() - self._started_at, 3)
+            self.last_error = None
+            self._ready.set()
+            return
+
+    @property
+    def is_ready(self):
+        return self._ready.is_set()
+
+    async def get(self, timeout_s: float):
+        """Returns the pipeline, waiting up to timeout_s for startup to finish (else 503)."""
+        if not self._ready.is_set():
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout=timeout_s)
+            except asyncio.TimeoutError:
+                raise AdmissionRejected(503, self.retry_initial_s * 2, "DealZen is starting up. Please try again shortly.")
+        return self.pipeline
+
+    async def close(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        if self.pipeline is not None:
+            await asyncio.to_thread(self.pipeline.close)
+
+    def status(self):
+        return {
+            "ready": self.is_ready,
+            "attempts": self.attempts,
+            "ready_after_s": self.ready_after_s,
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,144 @@
+import json
+import re
+
+# Deals are referenced in the prompt by short IDs ("D1", "D2", ...) so the model
+# only has to emit a few tokens per relevant deal.
+DEAL_ID_PREFIX = "D"
+
+# Key order matters: structured outputs are generated in schema order, so the
+# cheap relevance fields arrive first and the answer text can be streamed after them.
+RELEVANCE_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "deal_answer",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "no_match": {
+                    "type": "boolean",
+                    "description": "true if none of the deals answer the question",
+                },
+                "relevant_deal_ids": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "IDs (e.g. D3) of every deal that matches the user's intent",
+                },
+                "answer": {
+                    "type": "string",
+                    "description": "Friendly, concise answer for the user",
+                },
+            },
+            "required": ["no_match", "relevant_deal_ids", "answer"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+# What the prompt tells the model to say when nothing matches; also used for empty replies
+NO_MATCH_ANSWER = "I'm sorry, I couldn't find any deals for that."
+
+_DEAL_ID_RE = re.compile(rf"{DEAL_ID_PREFIX}(\d+)")
+_PARTIAL_ANSWER_RE = re.compile(r'"answer"\s*:\s*"((?:[^"\\]|\\.)*)')
+_PARTIAL_IDS_RE = re.compile(r'"relevant_deal_ids"\s*:\s*\[([^\]]*)')
+_NO_MATCH_RE = re.compile(r'"no_match"\s*:\s*(true|false)')
+
+
+def deal_id(index: int):
+    """0-indexed position -> short deal ID used in the prompt."""
+    return f"{DEAL_ID_PREFIX}{index + 1}"
+
+
+def deal_ids_to_indices(ids, num_deals: int):
+    """Short deal IDs -> sorted, de-duplicated 0-indexed positions (unknown IDs are dropped)."""
+    indices = set()
+    for value in ids:
+        match = _DEAL_ID_RE.fullmatch(str(value).strip().upper())
+        if match:
+            index = int(match.group(1)) - 1
+            if 0 <= index < num_deals:
+                indices.add(index)
+    return sorted(indices)
+
+
+def partial_answer(buffer: str):
+    """
+    Returns the answer text received so far from an incomplete JSON buffer.
+    Used while streaming: the buffer may end in the middle of a string or escape.
+    """
+    match = _PARTIAL_ANSWER_RE.search(buffer)
+    if not match:
+        return ""
+    raw = match.group(1)
+    # Drop a dangling escape (e.g. a lone backslash or an unfinished \\u00) before decoding
+    raw = re.sub(r'\\(u[0-9a-fA-F]{0,3})?$', '', raw)
+    try:
+        return json.loads(f'"{raw}"')
+    except json.JSONDecodeError:
+        return raw
+
+
+def parse_structured_response(text: str, num_deals: int):
+    """
+    Parses the JSON-schema response into (answer, relevant_indices, no_match).
+
+    A truncated or otherwise malformed payload is salvaged field by field
+    instead of falling back to "every deal is relevant". A refusal or empty
+    message (no content) is a no-match.
+    """
+    if not text:
+        return NO_MATCH_ANSWER, [], True
+    try:
+        payload = json.loads(text)
+        ids = payload.get("relevant_deal_ids")
+        return (
+            (payload.get("answer") or "").strip(),
+            # null is allowed by the schema's "required", so only a list names deals
+            deal_ids_to_indices(ids if isinstance(ids, list) else [], num_deals),
+            bool(payload.get("no_match", False)),
+        )
+    except (json.JSONDecodeError, AttributeError):
+        pass
+
+    ids_match = _PARTIAL_IDS_RE.search(text)
+    ids = re.findall(r'"([^"]*)"', ids_match.group(1)) if ids_match else []
+    no_match = _NO_MATCH_RE.search(text)
+    return (
+        partial_answer(text).strip(),
+        deal_ids_to_indices(ids, num_deals),
+        bool(no_match and no_match.group(1) == "true"),
+    )
+
+
+# Phrases the free-text prompt uses when nothing matched
+NO_DEALS_PHRASES = ["couldn't find any deals", "couldn't find any specific deals",
+                    "no deals", "not find any deals", "don't have any deals"]
+
+
+def parse_legacy_response(full_response: str, num_deals: int):
+    """
+    Parser for the original free-text format ("... RELEVANT_DEALS: 1, 3").
+    Kept for RELEVANCE_OUTPUT_MODE=legacy and for the regression comparison script.
+    Returns (answer, relevant_indices, no_match).
+    """
+    relevant_indices = []
+    if "RELEVANT_DEALS:" in full_response:
+        parts = full_response.split("RELEVANT_DEALS:")
+        answer = parts[0].strip()
+
+        # Extract deal numbers and convert to 0-indexed
+        try:
+            deals_str = parts[1].strip()
+            deal_numbers = [int(x.strip()) for x in deals_str.split(",") if x.strip().isdigit()]
+            relevant_indices = [num - 1 for num in deal_numbers if num > 0]  # Convert to 0-indexed
+        except (ValueError, IndexError):
+            # If parsing fails, return all deals
+            relevant_indices = list(range(num_deals))
+    else:
+        # If no RELEVANT_DEALS marker found, return answer as-is and all deals
+        answer = full_response
+        relevant_indices = list(range(num_deals))
+
+    answer_lower = answer.lower()
+    no_match = any(phrase in answer_lower for phrase in NO_DEALS_PHRASES)
+    return answer, relevant_indices, no_match
@@ -0,0 +1,312 @@
+"""
+Typeahead suggestions for the chat box (GET /suggest).
+
+Ingestion writes a suggestion table next to the snapshot (write_suggest_index):
+product names, every product_category level, stores and brands, each with the
+number of deals behind it, its best discount and its popularity (how often its
+deals were selected in /chat answers, from the query log).
+
+SuggestIndex keeps sorted arrays of (key, suggestion id) pairs in memory. Keys
+are the normalized suggestion text and its later word starts ("drill" finds
+"hammer drill kit"), so a prefix lookup is one bisect plus a short scan. Top
+suggestions for 1-2 character prefixes are precomputed. When ingestion replaces
+the table, only the suggestions that were added, removed or re-scored are
+applied (see scripts/benchmark_suggest.py).
+"""
+
+import bisect
+import heapq
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter
+import msgpack
+from .query_log import deal_key, query_log_files, read_query_log
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+SUGGEST_INDEX_PATH = os.getenv("SUGGEST_INDEX_PATH", os.path.join(PROJECT_ROOT, 'backend', 'data', 'suggest_index.msgpack'))
+
+SUGGEST_LIMIT = int(os.getenv("SUGGEST_LIMIT", "8"))
+# Longer prefixes are answered from at most this many matching keys
+SUGGEST_MAX_SCAN = int(os.getenv("SUGGEST_MAX_SCAN", "500"))
+# Prefixes this short have their top suggestions precomputed
+SUGGEST_SHORT_PREFIX = 2
+# Word starts indexed per suggestion
+SUGGEST_WORD_STARTS = 12
+# Query log window used for popularity at ingest time
+SUGGEST_POPULARITY_HOURS = float(os.getenv("SUGGEST_POPULARITY_HOURS", "168"))
+# How often /suggest checks whether ingestion wrote a new table
+SUGGEST_REFRESH_S = float(os.getenv("SUGGEST_REFRESH_S", "2"))
+
+# Flyer badges that lead product names but are not brands
+NOT_BRANDS = {"exclusive", "new", "only", "special", "save", "buy", "get", "free", "bonus", "hot", "limited"}
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def normalize_prefix(text: str):
+    return " ".join(_TOKEN_RE.findall((text or "").lower()))
+
+
+def product_brand(product_name: str):
+    words = (product_name or "").split()
+    if not words:
+        return None
+    word = words[0].strip(",.:;")
+    if len(word) < 2 or not word[0].isalpha() or any(c.isdigit() for c in word) or word.lower() in NOT_BRANDS:
+        return None
+    return word
+
+
+def _discount(deal: dict):
+    price, original = deal.get("price"), deal.get("original_price")
+    if isinstance(price, (int, float)) and isinstance(original, (int, float)) and original > price >= 0:
+        return round((original - price) / original, 3)
+    return 0.0
+
+
+def deal_popularity(paths=None, since: float = 0):
+    """How often each deal (by deal_key) was among the selected deals of a logged /chat answer."""
+    counts = Counter()
+    paths = query_log_files() if paths is None else paths
+    for record in read_query_log(p for p in paths if os.path.exists(p)):
+        if record.get("ts", 0) >= since:
+            counts.update(record.get("selected") or [])
+    return counts
+
+
+def build_suggestions(deals: list[dict], popularity: Counter = None):
+    """
+    {suggestion id: [text, kind, deals, max_discount, popularity]} for product names,
+    category levels, stores and brands. The id is "<kind>:<normalized text>".
+    """
+    popularity = popularity or Counter()
+    suggestions = {}
+    for deal in deals:
+        discount, popular = _discount(deal), popularity.get(deal_key(deal), 0)
+        candidates = [("product", deal.get("product_name")), ("store", deal.get("store")),
+                      ("brand", product_brand(deal.get("product_name")))]
+        candidates += [("category", level.strip()) for level in (deal.get("product_category") or "").split(">")]
+        for kind, text in candidates:
+            normalized = normalize_prefix(text)
+            if not normalized:
+                continue
+            entry = suggestions.setdefault(f"{kind}:{normalized}", [text, kind, 0, 0.0, 0])
+            entry[2] += 1
+            entry[3] = max(entry[3], discount)
+            entry[4] += popular
+    return suggestions
+
+
+def write_suggest_index(path: str, deals: list[dict], corpus_version: str = None, popularity: Counter = None):
+    """Writes the suggestion table for `deals` (atomically; backends pick it up on their next check)."""
+    if popularity is None:
+        popularity = deal_popularity(since=time.time() - SUGGEST_POPULARITY_HOURS * 3600)
+    suggestions = build_suggestions(deals, popularity)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(msgpack.packb({"corpus_version": corpus_version, "suggestions": suggestions}, use_bin_type=True))
+    os.replace(tmp_path, path)
+    return len(suggestions)
+
+
+def score(sid: str, entry):
+    """
+    Popularity first, then discount, then how many deals the suggestion covers.
+    Ties go to the shorter suggestion (then the id, so rebuilds rank identically).
+    """
+    _, _, deals, max_discount, popularity = entry
+    return math.log1p(popularity) + 2 * max_discount + 0.25 * math.log1p(deals), -len(sid), sid
+
+
+def index_keys(sid: str):
+    """The suggestion's normalized text (from its id) and its later word starts."""
+    words = sid.split(":", 1)[1].split()
+    return [" ".join(words[i:]) for i in range(min(len(words), SUGGEST_WORD_STARTS))]
+
+
+class SuggestIndex:
+    """
+    Prefix index over the ingested suggestion table. Thread-safe; empty until
+    refresh() (or the background load started by maybe_refresh()) has run.
+
+    Keys are bucketed by their first two characters, each bucket a sorted list of
+    (key, id), so updates only shift one small list. The best ids per bucket (and
+    per first character) are kept as top lists: 1-2 character prefixes are answered
+    from them, longer ones by bisecting into their bucket.
+    """
+
+    def __init__(self, path: str = SUGGEST_INDEX_PATH):
+        self.path = path
+        self.corpus_version = None
+        self._entries = {}          # id -> [text, kind, deals, max_discount, popularity]
+        self._scores = {}           # id -> score
+        self._buckets = {}          # key[:2] -> sorted [(key, id)]
+        self._bucket_tops = {}      # bucket -> best ids (answers 2-character prefixes)
+        self._char_tops = {}        # first character -> best ids
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._checked_at = 0.0
+        self._refreshing = False
+        self.refreshes = 0
+        self.last_refresh = None
+
+    def maybe_refresh(self):
+        """Re-reads the table in the background if ingestion replaced it (checked every SUGGEST_REFRESH_S)."""
+        now = time.monotonic()
+        if self._refreshing or now - self._checked_at < SUGGEST_REFRESH_S:
+            return
+        self._checked_at = now
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime != self._mtime:
+            self._refreshing = True
+            threading.Thread(target=self.refresh, daemon=True).start()
+
+    def refresh(self):
+        """Loads the table and applies the differences to the in-memory index."""
+        try:
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+                with open(self.path, 'rb') as f:
+                    table = msgpack.unpackb(f.read(), raw=False)
+            except FileNotFoundError:
+                return False
+            except (OSError, ValueError) as e:
+                print(f"⚠️  Could not read suggestion index {self.path}: {e}")
+                return False
+            self._apply(table.get("suggestions", {}), table.get("corpus_version"))
+            self._mtime = mtime
+            return True
+        finally:
+            self._refreshing = False
+
+    def _apply(self, suggestions: dict, corpus_version: str):
+        start = time.perf_counter()
+        entries = self._entries
+        removed = [sid for sid in entries if sid not in suggestions]
+        added = [sid for sid in suggestions if sid not in entries]
+        changed = [sid for sid in suggestions if sid in entries and entries[sid] != suggestions[sid]]
+        # Both paths build the new index next to the current one and swap it in
+        if len(added) + len(removed) > len(entries) // 4:
+            # First load or a mostly new corpus: sorting from scratch beats one insort per key
+            scores = {sid: score(sid, entry) for sid, entry in suggestions.items()}
+            buckets = {}
+            for sid in suggestions:
+                for key in index_keys(sid):
+                    buckets.setdefault(key[:2], []).append((key, sid))
+            for pairs in buckets.values():
+                pairs.sort()
+            index = (dict(suggestions), scores, buckets, *self._build_tops(buckets, scores))
+        else:
+            index = self._updated(suggestions, added, removed, changed)
+        with self._lock:
+            self._entries, self._scores, self._buckets, self._bucket_tops, self._char_tops = index
+            self.corpus_version = corpus_version
+        self.refreshes += 1
+        self.last_refresh = {"added": len(added), "removed": len(removed), "changed": len(changed),
+                             "ms": round((time.perf_counter() - start) * 1000, 1)}
+
+    @staticmethod
+    def _bucket_top(pairs: list, scores: dict):
+        return heapq.nlargest(SUGGEST_LIMIT * 2, {sid for _, sid in pairs}, key=scores.__getitem__)
+
+    @staticmethod
+    def _char_top(bucket_tops: dict, char: str, scores: dict):
+        # The best of a first character is the best of its buckets' top lists
+        ids = {sid for bucket, top in bucket_tops.items() if bucket[0] == char for sid in top}
+        return heapq.nlargest(SUGGEST_LIMIT * 2, ids, key=scores.__getitem__)
+
+    def _build_tops(self, buckets: dict, scores: dict):
+        bucket_tops = {bucket: self._bucket_top(pairs, scores) for bucket, pairs in buckets.items()}
+        char_tops = {char: self._char_top(bucket_tops, char, scores) for char in {bucket[0] for bucket in buckets}}
+        return bucket_tops, char_tops
+
+    def _updated(self, suggestions: dict, added: list, removed: list, changed: list):
+        """
+        Applies a small diff to copies of the index (only touched buckets are copied, top
+        lists are merged or recomputed) so readers keep using the current one meanwhile.
+        """
+        entries, scores = dict(self._entries), dict(self._scores)
+        buckets, bucket_tops, char_tops = dict(self._buckets), dict(self._bucket_tops), dict(self._char_tops)
+        copied = set()
+
+        def bucket_pairs(bucket):
+            if bucket not in copied:
+                buckets[bucket] = list(buckets.get(bucket, []))
+                copied.add(bucket)
+            return buckets[bucket]
+
+        stale, touched = set(), set()  # buckets whose top list must be recomputed / may have changed
+        for sid in removed:
+            for key in index_keys(sid):
+                pairs = bucket_pairs(key[:2])
+                i = bisect.bisect_left(pairs, (key, sid))
+                if i < len(pairs) and pairs[i] == (key, sid):
+                    del pairs[i]
+                if sid in bucket_tops.get(key[:2], ()):
+                    bucket_tops[key[:2]] = [other for other in bucket_tops[key[:2]] if other != sid]
+                    stale.add(key[:2])
+            del entries[sid], scores[sid]
+        for sid in added:
+            for key in index_keys(sid):
+                bisect.insort(bucket_pairs(key[:2]), (key, sid))
+        for sid in added + changed:
+            old_score = scores.get(sid)
+            entries[sid] = suggestions[sid]
+            scores[sid] = new_score = score(sid, suggestions[sid])
+            for bucket in {key[:2] for key in index_keys(sid)}:
+                touched.add(bucket)
+                top = bucket_tops.get(bucket, [])
+                if sid in top and old_score is not None and new_score < old_score:
+                    stale.add(bucket)  # it dropped: an id outside the list may now beat it
+                elif sid in top or len(top) < SUGGEST_LIMIT * 2 or new_score > scores[top[-1]]:
+                    bucket_tops[bucket] = heapq.nlargest(SUGGEST_LIMIT * 2, set(top) | {sid}, key=scores.__getitem__)
+        for bucket in stale:
+            bucket_tops[bucket] = self._bucket_top(buckets.get(bucket, []), scores)
+        for char in {bucket[0] for bucket in stale | touched}:
+            char_tops[char] = self._char_top(bucket_tops, char, scores)
+        return entries, scores, buckets, bucket_tops, char_tops
+
+    def suggest(self, prefix: str, limit: int = SUGGEST_LIMIT):
+        """Top suggestions whose text (or a later word of it) starts with `prefix`."""
+        prefix = normalize_prefix(prefix)
+        if not prefix:
+            return []
+        with self._lock:
+            if len(prefix) <= 2 and limit <= SUGGEST_LIMIT * 2:
+                tops = self._char_tops if len(prefix) == 1 else self._bucket_tops
+                ids = tops.get(prefix, [])[:limit]
+            else:
+                ids = self._scan(prefix, limit)
+            entries = [self._entries[sid] for sid in ids]
+        return [{"text": text, "kind": kind, "deals": deals, "max_discount": max_discount}
+                for text, kind, deals, max_discount, _ in entries]
+
+    def _scan(self, prefix: str, limit: int):
+        """Best ids among the first SUGGEST_MAX_SCAN keys starting with `prefix`."""
+        ids = set()
+        if len(prefix) == 1:
+            buckets = [pairs for bucket, pairs in self._buckets.items() if bucket[0] == prefix]
+        else:
+            buckets = [self._buckets.get(prefix[:2], [])]
+        for pairs in buckets:
+            i = bisect.bisect_left(pairs, (prefix,))
+            end = min(len(pairs), i + SUGGEST_MAX_SCAN)
+            while i < end and pairs[i][0].startswith(prefix):
+                ids.add(pairs[i][1])
+                i += 1
+        return heapq.nlargest(limit, ids, key=self._scores.__getitem__)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        return {"suggestions": len(self._entries), "keys": sum(len(pairs) for pairs in self._buckets.values()),
+                "corpus_version": self.corpus_version, "refreshes": self.refreshes,
+                "last_refresh": self.last_refresh}
@@ -0,0 +1,88 @@
+import math
+import threading
+
+# USD per 1M tokens: (input, cached input, output). Update when OpenAI pricing changes.
+MODEL_PRICING = {
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "text-embedding-3-small": (0.02, 0.02, 0.0),
+    "text-embedding-3-large": (0.13, 0.13, 0.0),
+}
+
+USAGE_FIELDS = ("prompt_tokens", "completion_tokens", "cached_tokens", "image_tokens")
+
+
+def token_usage(response):
+    """Token counts from an OpenAI response (zeros when the response carries no usage)."""
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return {"prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0}
+    details = getattr(usage, "prompt_tokens_details", None)
+    return {
+        "prompt_tokens": usage.prompt_tokens or 0,
+        "completion_tokens": usage.completion_tokens or 0,
+        "cached_tokens": (getattr(details, "cached_tokens", 0) or 0) if details is not None else 0,
+    }
+
+
+def estimate_cost(model: str, usage: dict):
+    """USD cost of one call. Cached prompt tokens are billed at the cached-input rate."""
+    # Dated snapshots ("gpt-4o-2024-08-06") are billed like their base model
+    base = next((name for name in sorted(MODEL_PRICING, key=len, reverse=True) if model.startswith(name)), None)
+    if base is None:
+        return 0.0
+    input_rate, cached_rate, output_rate = MODEL_PRICING[base]
+    cached = usage.get("cached_tokens", 0)
+    uncached = usage.get("prompt_tokens", 0) - cached
+    return (uncached * input_rate + cached * cached_rate + usage.get("completion_tokens", 0) * output_rate) / 1_000_000
+
+
+def vision_image_tokens(width: int, height: int, detail: str = "high"):
+    """
+    Prompt tokens GPT-4o charges for one image (they are included in prompt_tokens).
+    High detail: fit within 2048x2048, scale the short side to 768, then 170 per 512px tile + 85.
+    """
+    if detail == "low":
+        return 85
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    return 85 + 170 * math.ceil(width / 512) * math.ceil(height / 512)
+
+
+class UsageMeter:
+    """
+    In-process token/cost totals grouped by a key (query class, flyer, store...).
+    Thread-safe, since OpenAI calls run in worker threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals = {}
+
+    def record(self, key: str, model: str, usage: dict, latency_ms: float = None, cost: float = None):
+        """Adds one call (or request). Pass `cost` when the usage spans several models."""
+        cost = estimate_cost(model, usage) if cost is None else cost
+        with self._lock:
+            totals = self._totals.setdefault(key, {"calls": 0, "cost_usd": 0.0, "latency_ms": 0.0,
+                                                   **{field: 0 for field in USAGE_FIELDS}})
+            totals["calls"] += 1
+            totals["cost_usd"] += cost
+            totals["latency_ms"] += latency_ms or 0.0
+            for field in USAGE_FIELDS:
+                totals[field] += usage.get(field, 0) or 0
+        return cost
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                key: {
+                    **{field: totals[field] for field in USAGE_FIELDS},
+                    "calls": totals["calls"],
+                    "cost_usd": round(totals["cost_usd"], 6),
+                    "avg_cost_usd": round(totals["cost_usd"] / totals["calls"], 6),
+                    "avg_latency_ms": round(totals["latency_ms"] / totals["calls"], 1),
+                }
+                for key, totals in self._totals.items()
+            }
@@ -1,12 +1,22 @@
-import weaviate
-import weaviate.classes.config as wvc
-from weaviate.classes.query import Filter
 from datetime import datetime, timezone
+import asyncio
 import os
+from .search_params import DEFAULT_SEARCH_PARAMS, search_params_for, hybrid_query_properties
+
+# The weaviate package takes ~1s to import (grpc, protobuf, pydantic models), so it is
+# imported inside the functions below instead of at module import. The backend can
+# then start serving /ready while the connection is still being established.
+
+# Default hybrid search parameters shared by the Weaviate and local search backends.
+# Per-query-class values come from backend/search_params.json (see search_params.py).
+HYBRID_QUERY_PROPERTIES = hybrid_query_properties(DEFAULT_SEARCH_PARAMS["vector_text_boost"])
+HYBRID_ALPHA = DEFAULT_SEARCH_PARAMS["alpha"]
+HYBRID_LIMIT = DEFAULT_SEARCH_PARAMS["limit"]
 
 def get_weaviate_client():
     """Establishes connection to the Weaviate instance."""
     # Get API key at runtime (after .env is loaded)
+    import weaviate
     openai_api_key = os.getenv("OPENAI_API_KEY")
     
     client = weaviate.connect_to_local(
@@ -16,14 +26,35 @@ def get_weaviate_client():
     )
     return client
 
-async def perform_hybrid_search(client: weaviate.WeaviateClient, query: str):
+def collection_embedding_model(client: "weaviate.WeaviateClient", collection: str = "Deal"):
+    """
+    The embedding model the collection's text2vec vectorizer is configured with, or None
+    if it can't be read or was left to Weaviate's default.
+    """
+    try:
+        config = client.collections.get(collection).config.get()
+        vectorizer = config.vectorizer_config
+        if vectorizer is None and config.vector_config:
+            # Named vectors: the first one is the one hybrid search uses by default
+            vectorizer = next(iter(config.vector_config.values())).vectorizer
+        model = (getattr(vectorizer, "model", None) or {}).get("model")
+        return model or None
+    except Exception as e:
+        print(f"⚠️  Could not read the {collection} vectorizer config: {e}")
+        return None
+
+async def perform_hybrid_search(client: "weaviate.WeaviateClient", query: str, vector=None, params: dict = None):
     """
     Performs a hybrid search with date filtering.
     - Vector search on 'vector_text'
     - Keyword search on 'product_name', 'sku', and 'product_category'
     - Filters out expired deals (valid_to < current date)
     - Retrieves Top 5 results.
+    If `vector` (the query embedding) is given, Weaviate skips its own OpenAI call.
+    alpha / limit / boost come from `params`, else from the tuned values for the query's class.
     """
+    params = params or search_params_for(query)
+    from weaviate.classes.query import Filter
     deals = client.collections.get("Deal")
     
     # Get current date in ISO format
@@ -34,22 +65,27 @@ async def perform_hybrid_search(client: weaviate.WeaviateClient, query: str):
     # (Removed null check as it requires indexNullState configuration)
     date_filter = Filter.by_property("valid_to").greater_or_equal(current_date)
     
-    response = deals.query.hybrid(
+    # The Weaviate client is synchronous; run it in a worker thread so the
+    # event loop stays free and the caller's deadline can actually fire
+    response = await asyncio.to_thread(
+        deals.query.hybrid,
         query=query,
+        vector=list(map(float, vector)) if vector is not None else None,
         # Define properties for hybrid search
-        query_properties=["vector_text^2", "product_name", "sku", "product_category"],
-        # 50/50 blend of vector and keyword
-        alpha=0.5,
+        query_properties=hybrid_query_properties(params["vector_text_boost"]),
+        # Blend of vector and keyword (0.5 by default; SKU-like queries lean keyword)
+        alpha=params["alpha"],
         # Filter out expired deals
         filters=date_filter,
-        # Retrieve TOP 20 (increased from 10 for broader price comparison)
-        limit=20
+        # Retrieve top N (20 by default, for broader price comparison)
+        limit=params["limit"]
     )
     
     return [item.properties for item in response.objects]
 
 def get_deal_schema():
     """Returns the schema for our 'Deal' collection."""
+    import weaviate.classes.config as wvc
     return [
         wvc.Property(name="product_name", data_type=wvc.DataType.TEXT, tokenization=wvc.Tokenization.WORD),
         wvc.Property(name="sku", data_type=wvc.DataType.TEXT, tokenization=wvc.Tokenization.FIELD),
@@ -67,5 +103,13 @@ def get_deal_schema():
         wvc.Property(name="required_purchase", data_type=wvc.DataType.TEXT, tokenization=wvc.Tokenization.WORD),  # What to buy
         wvc.Property(name="free_item", data_type=wvc.DataType.TEXT, tokenization=wvc.Tokenization.WORD),  # What comes free
         wvc.Property(name="full_json", data_type=wvc.DataType.TEXT, skip_vectorization=True),
+        source_image_property(),  # Flyer page the deal came from (incremental upserts)
     ]
 
+
+def source_image_property():
+    """Added on its own to collections created before incremental ingestion existed."""
+    import weaviate.classes.config as wvc
+    return wvc.Property(name="source_image", data_type=wvc.DataType.TEXT, tokenization=wvc.Tokenization.FIELD,
+                        skip_vectorization=True)
+
@@ -30,15 +30,11 @@ echo "   Input: $PDF_FILE"
 echo "   Output: $OUTPUT_DIR/"
 echo ""
 
-# Check if ImageMagick is installed
-if ! command -v convert &> /dev/null; then
-    echo "⚠️  ImageMagick not found. Installing via Homebrew..."
-    echo ""
-    brew install imagemagick
-fi
-
-# Convert PDF to PNG images
-convert -density 300 "$PDF_FILE" "$OUTPUT_DIR/${BASENAME}_page_%02d.png"
+# Render pages in parallel with PyMuPDF, sized for GPT-4o Vision
+# (set PDF_RASTER_DPI=300 for the old ImageMagick resolution).
+# process_flyers.py also reads PDFs directly, without this step.
+source backend/.venv/bin/activate
+python scripts/rasterize_pdf.py "$PDF_FILE" --out "$OUTPUT_DIR"
 
 # Count generated images
 IMAGE_COUNT=$(ls -1 "$OUTPUT_DIR/${BASENAME}_page_"*.png 2>/dev/null | wc -l | tr -d ' ')
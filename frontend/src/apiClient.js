@@ -2,10 +2,11 @@ import axios from 'axios';
 
 const apiClient = axios.create({
   baseURL: 'http://localhost:8000', // FastAPI backend URL
+  withCredentials: true, // sends the client id cookie that owns saved searches / notifications
 });
 
-export const getChatResponse = async (query) => {
-  const response = await apiClient.post('/chat', { query });
+export const getChatResponse = async (query, sessionId = null) => {
+  const response = await apiClient.post('/chat', { query, session_id: sessionId });
   return response.data;
 };
 
@@ -252,6 +252,7 @@ const ChatInterface = () => {
     { sender: 'ai', text: "Hi! I'm DealZen, your Black Friday assistant. Ask me about any deal!" }
   ]);
   const [isLoading, setIsLoading] = useState(false);
+  const [sessionId, setSessionId] = useState(null);
   
   // TODO: Re-enable user limits after testing
   // const { hasReachedLimit, remainingQuestions, incrementCount } = useUserLimits(10);
@@ -278,13 +279,20 @@ const ChatInterface = () => {
     setQuery('');
 
     try {
-      const response = await getChatResponse(query);
+      const response = await getChatResponse(query, sessionId);
+      setSessionId(response.session_id);
       const aiMessage = { sender: 'ai', text: response.answer, sources: response.source_deals };
       setMessages(prev => [...prev, aiMessage]);
       incrementCount();
     } catch (error) {
       console.error("Failed to get chat response:", error);
-      const errorMessage = { sender: 'ai', text: 'Sorry, I ran into an error. Please try again.' };
+      const status = error.response?.status;
+      const retryAfter = error.response?.headers?.['retry-after'];
+      let text = 'Sorry, I ran into an error. Please try again.';
+      if (status === 429 || status === 503) {
+        text = `${error.response.data?.detail || 'The server is busy.'} Please try again in ${retryAfter || 'a few'} seconds.`;
+      }
+      const errorMessage = { sender: 'ai', text };
       setMessages(prev => [...prev, errorMessage]);
     }
 
@@ -9,13 +9,13 @@ echo "=================================================="
 echo ""
 
 # Check for flyer images
-FLYER_COUNT=$(ls -1 flyer-images/*.{jpg,png,jpeg} 2>/dev/null | wc -l | tr -d ' ')
+FLYER_COUNT=$(ls -1 flyer-images/*.{jpg,png,jpeg,pdf} 2>/dev/null | wc -l | tr -d ' ')
 
 if [ "$FLYER_COUNT" -eq "0" ]; then
     echo "❌ No flyer images found in flyer-images/ folder"
     echo ""
     echo "Please add some flyer images first:"
-    echo "  1. Download Black Friday flyers (JPG or PNG)"
+    echo "  1. Download Black Friday flyers (JPG, PNG or PDF)"
     echo "  2. Copy them to: flyer-images/"
     echo "  3. Run this script again"
     echo ""
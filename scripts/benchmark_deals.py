@@ -0,0 +1,141 @@
+"""
+DealZen Deal Model Benchmark
+Decode / validate / encode throughput of the shared Deal model
+(backend/app/deal_model.py) against the plain-dict handling it replaced:
+json.loads followed by per-field .get() access and Python-side date fixes.
+
+Deals are synthesized from deals.example.json (names, SKUs, prices and date
+styles varied). Decoding is timed on that raw extraction-style JSON and on the
+normalized JSON the model writes back (what deals.json holds after
+process_flyers.py). Memory is measured on a sample with tracemalloc.
+
+Usage:
+    python scripts/benchmark_deals.py [--count 1000000] [--memory-sample 100000]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+# Add project root to Python path
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(script_dir)
+sys.path.insert(0, project_root)
+
+from backend.app.deal_model import decode_deals, encode_deals, ensure_rfc3339
+
+CHUNK_SIZE = 100_000
+
+
+def synthesize_deals(count, chunk_size=CHUNK_SIZE):
+    """
+    JSON deal lists of up to chunk_size deals each (built piecewise, so 1M deals fit
+    in memory; each chunk is decoded and dropped before the next).
+    """
+    with open(os.path.join(script_dir, 'deals.example.json'), 'r') as f:
+        templates = json.load(f)
+    chunks, parts = [], []
+    for i in range(count):
+        deal = dict(templates[i % len(templates)])
+        deal["product_name"] = f"{deal.get('product_name')} #{i}"
+        deal["sku"] = f"{deal.get('sku') or 'SKU'}-{i}"
+        deal["price"] = round((deal.get("price") or 10.0) + (i % 100) / 100, 2)
+        if i % 3 == 0 and deal.get("valid_to"):
+            deal["valid_to"] = deal["valid_to"][:10]  # date-only, as flyers often print them
+        deal["source_image"] = f"store_page_{i % 40:02d}.png"
+        parts.append(json.dumps(deal).encode('utf-8'))
+        if len(parts) == chunk_size or i == count - 1:
+            chunks.append(b"[" + b",".join(parts) + b"]")
+            parts = []
+    return chunks
+
+
+def dict_decode(data):
+    """The previous path: json.loads, then the normalization ingestion did per deal."""
+    deals = json.loads(data)
+    for deal in deals:
+        valid_to = deal.get("valid_to")
+        deal["valid_from"] = ensure_rfc3339(deal.get("valid_from"))
+        deal["valid_to"] = ensure_rfc3339(valid_to)
+        if deal["valid_to"] and 'T' not in valid_to:
+            deal["valid_to"] = deal["valid_to"].replace('T00:00:00Z', 'T23:59:59Z')
+        deal["deal_conditions"] = deal.get("deal_conditions") or []
+        deal["attributes"] = deal.get("attributes") or []
+        deal["bundle_deal"] = deal.get("bundle_deal", False)
+        deal["in_store_only"] = deal.get("in_store_only", False)
+    return deals
+
+
+def run(chunks, decode, encode=None, keep=False):
+    """
+    Decodes (and optionally re-encodes) every chunk, dropping each result before the next.
+    Returns (decode seconds, encode seconds, encoded chunks if keep).
+    """
+    decode_s = encode_s = 0.0
+    encoded = []
+    for chunk in chunks:
+        start = time.perf_counter()
+        deals = decode(chunk)
+        decode_s += time.perf_counter() - start
+        if encode is not None:
+            start = time.perf_counter()
+            data = encode(deals)
+            encode_s += time.perf_counter() - start
+            if keep:
+                encoded.append(data)
+        del deals
+    return decode_s, encode_s, encoded
+
+
+def decoded_bytes(fn, data):
+    """Bytes held by the decoded deal list (tracemalloc, decode transients excluded)."""
+    tracemalloc.start()
+    result = fn(data)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deal model vs dict decode/validate/encode throughput")
+    parser.add_argument("--count", type=int, default=1_000_000)
+    parser.add_argument("--memory-sample", type=int, default=100_000)
+    args = parser.parse_args()
+
+    print(f"\n🧪 Synthesizing {args.count:,} deals...")
+    chunks = synthesize_deals(args.count)
+    print(f"   {sum(len(chunk) for chunk in chunks) / 1e6:.0f} MB of JSON in {len(chunks)} chunk(s)")
+
+    # Raw extraction output, and the normalized deals.json the model writes back
+    model_raw_s, model_encode_s, normalized = run(chunks, decode_deals, encode_deals, keep=True)
+    dict_raw_s, dict_encode_s, _ = run(chunks, dict_decode, lambda deals: json.dumps(deals).encode('utf-8'))
+    dict_normalized_s, _, _ = run(normalized, dict_decode)
+    model_normalized_s, _, _ = run(normalized, decode_deals)
+    del chunks, normalized
+
+    sample_count = min(args.count, args.memory_sample)
+    sample = synthesize_deals(sample_count, sample_count)[0]
+    dict_bytes = decoded_bytes(dict_decode, sample) / sample_count
+    model_bytes = decoded_bytes(decode_deals, sample) / sample_count
+
+    print("\n" + "="*70)
+    print(f"📊 DEAL DECODE / VALIDATE / ENCODE ({args.count:,} deals)")
+    print("="*70)
+    print(f"   {'':<24} {'raw extraction':>15} {'normalized':>13} {'encode':>12} {'bytes/deal':>11}")
+    rows = (("dicts (json + .get)", dict_raw_s, dict_normalized_s, dict_encode_s, dict_bytes),
+            ("Deal model (pydantic)", model_raw_s, model_normalized_s, model_encode_s, model_bytes))
+    for name, raw_s, normalized_s, encode_s, per_deal in rows:
+        print(f"   {name:<24} {args.count / raw_s:>12,.0f} /s {args.count / normalized_s:>10,.0f} /s "
+              f"{args.count / encode_s:>9,.0f} /s {per_deal:>11,.0f}")
+    print(f"\n   Model vs dicts: raw decode {dict_raw_s / model_raw_s:.2f}x, normalized decode "
+          f"{dict_normalized_s / model_normalized_s:.2f}x, encode {dict_encode_s / model_encode_s:.2f}x, "
+          f"memory {model_bytes / dict_bytes:.2f}x")
+    print("="*70 + "\n")
+
+
+if __name__ == "__main__":
+    main()
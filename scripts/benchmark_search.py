@@ -0,0 +1,110 @@
+"""
+DealZen Search Backend Benchmark
+Compares the local hybrid search engine with Weaviate on the same queries.
+
+Reports per-backend latency (p50 / p95 / max) and how much the local top-k
+overlaps with Weaviate's top-k. Weaviate must be running and loaded with the
+same deals file; the local index uses backend/data/local_index if built.
+
+Usage:
+    python scripts/benchmark_search.py [--runs 5] [--k 10]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from dotenv import load_dotenv
+
+# Add project root to Python path
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(script_dir)
+sys.path.insert(0, project_root)
+
+load_dotenv(dotenv_path=os.path.join(project_root, 'backend', '.env'))
+
+from backend.app.local_search import load_local_index, perform_local_hybrid_search
+
+BENCHMARK_QUERIES = [
+    "Show me all TV deals",
+    "RYOBI combo kit",
+    "cordless drill under $200",
+    "smart home security camera",
+    "air fryer",
+    "tool set",
+    "laptop deals at Best Buy",
+    "Buy one get one free",
+    "1006792638",
+    "gift ideas for a handyman",
+]
+
+
+def deal_key(item: dict):
+    return (item.get("product_name"), str(item.get("store")), item.get("sku"))
+
+
+async def time_backend(search_fn, client, queries, runs):
+    latencies, results = [], {}
+    for query in queries:
+        for _ in range(runs):
+            start = time.perf_counter()
+            results[query] = await search_fn(client, query)
+            latencies.append((time.perf_counter() - start) * 1000)
+    return latencies, results
+
+
+def summarize(name, latencies):
+    ordered = sorted(latencies)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    print(f"   {name:<10} p50={statistics.median(ordered):7.2f} ms   p95={p95:7.2f} ms   max={ordered[-1]:7.2f} ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark local search against Weaviate")
+    parser.add_argument("--runs", type=int, default=5, help="repetitions per query")
+    parser.add_argument("--k", type=int, default=10, help="top-k used for the overlap metric")
+    args = parser.parse_args()
+
+    print("\n" + "="*70)
+    print("⏱️  SEARCH BACKEND BENCHMARK")
+    print("="*70)
+
+    start = time.perf_counter()
+    index = load_local_index()
+    print(f"\n📦 Local index: {len(index.documents)} deals, "
+          f"{'vectors + BM25' if index.embeddings is not None else 'BM25 only'}, "
+          f"built in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    local_latencies, local_results = await time_backend(perform_local_hybrid_search, index, BENCHMARK_QUERIES, args.runs)
+
+    weaviate_results = None
+    try:
+        from backend.app.weaviate_client import get_weaviate_client, perform_hybrid_search
+        client = get_weaviate_client()
+        weaviate_latencies, weaviate_results = await time_backend(perform_hybrid_search, client, BENCHMARK_QUERIES, args.runs)
+        client.close()
+    except Exception as e:
+        print(f"⚠️  Weaviate unavailable, reporting local numbers only ({e})")
+
+    print(f"\n📊 Latency over {len(BENCHMARK_QUERIES)} queries x {args.runs} runs")
+    summarize("local", local_latencies)
+    if weaviate_results is not None:
+        summarize("weaviate", weaviate_latencies)
+
+        print(f"\n📊 Result overlap (top {args.k}, |local ∩ weaviate| / |weaviate|)")
+        overlaps = []
+        for query in BENCHMARK_QUERIES:
+            expected = {deal_key(item) for item in weaviate_results[query][:args.k]}
+            got = {deal_key(item) for item in local_results[query][:args.k]}
+            overlap = len(expected & got) / len(expected) if expected else 1.0
+            overlaps.append(overlap)
+            print(f"   {overlap:5.0%}  {query}")
+        print(f"\n   Mean overlap: {statistics.mean(overlaps):.0%}")
+
+    print("="*70 + "\n")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
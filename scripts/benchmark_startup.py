@@ -0,0 +1,106 @@
+"""
+DealZen Backend Startup Benchmark
+Tracks backend cold-start import time as a regression metric.
+
+Runs `python -X importtime -c "import app.main"` in fresh interpreters, takes
+the median cumulative import time of app.main, lists the heaviest imports,
+and compares the result with scripts/startup_baseline.json.
+
+Usage:
+    python scripts/benchmark_startup.py                   # compare with baseline
+    python scripts/benchmark_startup.py --update-baseline # record a new baseline
+
+Exit code 1 means import time regressed by more than the allowed tolerance.
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(script_dir)
+BACKEND_DIR = os.path.join(project_root, 'backend')
+BASELINE_FILE = os.path.join(script_dir, 'startup_baseline.json')
+
+# "import time:   self [us] | cumulative | imported package"
+IMPORTTIME_RE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+# Imports that must stay out of the cold path (loaded lazily once the pipeline is built)
+DEFERRED_MODULES = ["weaviate", "openai", "numpy"]
+
+
+def measure_once():
+    """Returns ({module: cumulative us}, set of every imported module) for one cold import."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=BACKEND_DIR, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import app.main failed:\n{result.stderr[-2000:]}")
+
+    cumulative_us, imported = {}, set()
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if not match:
+            continue
+        _, cumulative, _, module = match.groups()
+        imported.add(module)
+        cumulative_us[module] = int(cumulative)
+    return cumulative_us, imported
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark backend import time")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters to measure")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown vs baseline (0.25 = 25%%)")
+    parser.add_argument("--update-baseline", action="store_true", help="write the measurement as the new baseline")
+    args = parser.parse_args()
+
+    print("\n" + "="*70)
+    print("⏱️  BACKEND STARTUP BENCHMARK (python -X importtime)")
+    print("="*70)
+
+    totals, last_run, imported = [], {}, set()
+    for _ in range(args.runs):
+        last_run, imported = measure_once()
+        totals.append(last_run.get("app.main", 0))
+    # The minimum is the least noisy estimate of cold-start cost; it is what the baseline tracks
+    total_ms = min(totals) / 1000
+
+    print(f"\n📊 import app.main: {total_ms:.1f} ms (min of {args.runs}, median {statistics.median(totals) / 1000:.1f} ms)")
+    print("\n🐢 Heaviest third-party imports (last run, cumulative):")
+    third_party = {m: us for m, us in last_run.items() if "." not in m and m not in ("app", "site", "encodings")}
+    for module, cumulative in sorted(third_party.items(), key=lambda kv: kv[1], reverse=True)[:10]:
+        print(f"   {cumulative / 1000:8.1f} ms  {module}")
+
+    eager = [m for m in DEFERRED_MODULES if m in imported]
+    if eager:
+        print(f"\n❌ Heavy modules imported at startup (should be lazy): {', '.join(eager)}")
+
+    if args.update_baseline:
+        with open(BASELINE_FILE, 'w') as f:
+            json.dump({"import_app_main_ms": round(total_ms, 1), "python": sys.version.split()[0]}, f, indent=2)
+        print(f"\n📂 Baseline updated: {BASELINE_FILE}")
+        print("="*70 + "\n")
+        return
+
+    regressed = False
+    if os.path.exists(BASELINE_FILE):
+        with open(BASELINE_FILE, 'r') as f:
+            baseline_ms = json.load(f)["import_app_main_ms"]
+        change = (total_ms - baseline_ms) / baseline_ms
+        regressed = change > args.tolerance
+        status = "❌ REGRESSION" if regressed else "✅ OK"
+        print(f"\n{status}: {total_ms:.1f} ms vs baseline {baseline_ms:.1f} ms ({change:+.0%}, tolerance {args.tolerance:.0%})")
+    else:
+        print("\nℹ️  No baseline yet - run with --update-baseline to record one")
+
+    print("="*70 + "\n")
+    sys.exit(1 if regressed or eager else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+DealZen Typeahead Benchmark
+Latency of the /suggest prefix index (backend/app/suggest.py) on a synthetic
+corpus, and the cost of applying a small corpus change incrementally compared
+with a full rebuild.
+
+Deals are synthesized from deals.example.json (names, brands, stores and
+categories varied). Prefixes are typed the way users type: the first 1-12
+characters of product names, categories, brands and random words.
+
+Usage:
+    python scripts/benchmark_suggest.py [--count 200000] [--lookups 20000] [--change 0.01]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Add project root to Python path
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(script_dir)
+sys.path.insert(0, project_root)
+
+from collections import Counter
+from backend.app.query_log import deal_key
+from backend.app.suggest import SuggestIndex, write_suggest_index
+
+BRANDS = ["RYOBI", "DEWALT", "MILWAUKEE", "HUSKY", "Samsung", "LG", "Sony", "Apple", "Bose", "Dyson",
+          "Ninja", "KitchenAid", "Energizer", "Ring", "Philips", "Lenovo", "HP", "Dell", "Canon", "Nikon"]
+STORES = ["HOMEDEPOT", "LOWES", "BESTBUY", "WALMART", "TARGET", "COSTCO", "KOHLS", "MACYS"]
+
+
+def synthesize_deals(count, seed=7):
+    with open(os.path.join(script_dir, 'deals.example.json'), 'r') as f:
+        templates = json.load(f)
+    rng = random.Random(seed)
+    deals = []
+    for i in range(count):
+        deal = dict(templates[i % len(templates)])
+        words = (deal.get("product_name") or "Deal").split()
+        deal["product_name"] = f"{rng.choice(BRANDS)} {' '.join(words[1:])} {rng.choice('ABCDEFGHJK')}{i % 5000}"
+        deal["store"] = rng.choice(STORES)
+        deal["product_category"] = f"{deal.get('product_category') or 'General'} > Line {i % 300}"
+        deal["price"] = round(rng.uniform(5, 1500), 2)
+        deal["original_price"] = round(deal["price"] * rng.uniform(1.0, 1.8), 2) if rng.random() < 0.6 else None
+        deals.append(deal)
+    return deals
+
+
+def typed_prefixes(deals, count, seed=11):
+    rng = random.Random(seed)
+    prefixes = []
+    for _ in range(count):
+        deal = rng.choice(deals)
+        text = rng.choice([deal["product_name"], deal["product_category"].split(">")[-1], deal["store"],
+                           rng.choice(deal["product_name"].split())])
+        prefixes.append(text.strip()[:rng.randint(1, 12)])
+    return prefixes
+
+
+def percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Typeahead prefix index latency and incremental rebuild cost")
+    parser.add_argument("--count", type=int, default=200_000, help="number of synthetic deals")
+    parser.add_argument("--lookups", type=int, default=20_000)
+    parser.add_argument("--change", type=float, default=0.01, help="fraction of deals replaced for the incremental run")
+    args = parser.parse_args()
+
+    print(f"\n🧪 Synthesizing {args.count:,} deals...")
+    deals = synthesize_deals(args.count)
+    rng = random.Random(3)
+    popularity = Counter({deal_key(deal): rng.randint(1, 50) for deal in rng.sample(deals, len(deals) // 100)})
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'suggest_index.msgpack')
+        start = time.perf_counter()
+        suggestions = write_suggest_index(path, deals, "v1", popularity)
+        write_s = time.perf_counter() - start
+
+        index = SuggestIndex(path)
+        index.refresh()
+        full = index.last_refresh
+
+        latencies = []
+        for prefix in typed_prefixes(deals, args.lookups):
+            start = time.perf_counter()
+            index.suggest(prefix)
+            latencies.append((time.perf_counter() - start) * 1000)
+        latencies.sort()
+
+        # A re-ingestion that replaces a small share of the deals
+        changed = max(1, int(len(deals) * args.change))
+        replacements = synthesize_deals(changed, seed=99)
+        for i, deal in zip(rng.sample(range(len(deals)), changed), replacements):
+            deal["product_name"] += " v2"
+            deals[i] = deal
+        write_suggest_index(path, deals, "v2", popularity)
+        index.refresh()
+        incremental = index.last_refresh
+        stats = index.stats()
+
+    print("\n" + "="*70)
+    print(f"🔤 TYPEAHEAD PREFIX INDEX ({args.count:,} deals, {suggestions:,} suggestions, {stats['keys']:,} keys)")
+    print("="*70)
+    print(f"   Table written at ingest: {write_s * 1000:,.0f} ms")
+    print(f"   Lookups ({args.lookups:,}): p50 {percentile(latencies, 0.5):.3f} ms | "
+          f"p99 {percentile(latencies, 0.99):.3f} ms | max {latencies[-1]:.3f} ms")
+    print(f"   Full build: {full['ms']:,.0f} ms")
+    print(f"   Incremental ({changed:,} deals replaced): {incremental['ms']:,.0f} ms "
+          f"(+{incremental['added']:,} / -{incremental['removed']:,} / ~{incremental['changed']:,} suggestions)")
+    print("="*70 + "\n")
+
+
+if __name__ == "__main__":
+    main()
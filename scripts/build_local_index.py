@@ -0,0 +1,40 @@
+"""
+DealZen Local Index Builder
+Embeds every deal for the local search backend (SEARCH_BACKEND=local).
+
+Writes backend/data/local_index/embeddings.npy (float32, memory-mappable)
+and meta.json. Without this file the local backend runs keyword-only.
+
+Usage:
+    python scripts/build_local_index.py [path/to/deals.json]
+"""
+
+import os
+import sys
+import time
+from dotenv import load_dotenv
+
+# Add project root to Python path
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(script_dir)
+sys.path.insert(0, project_root)
+
+load_dotenv(dotenv_path=os.path.join(project_root, 'backend', '.env'))
+
+from backend.app.local_search import build_local_embeddings, default_deals_file, LOCAL_INDEX_DIR
+
+
+def main():
+    deals_file = sys.argv[1] if len(sys.argv) > 1 else default_deals_file()
+    print(f"\n🔍 Embedding deals from: {deals_file}")
+
+    start = time.time()
+    rows, dimensions = build_local_embeddings(deals_file)
+
+    print(f"✅ Embedded {rows} deals ({dimensions} dimensions) in {time.time() - start:.1f}s")
+    print(f"📂 Saved to: {LOCAL_INDEX_DIR}")
+    print("\n🚀 Next step: set SEARCH_BACKEND=local in backend/.env and start the backend\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+DealZen Deal Stream Parser
+Incremental, truncation-tolerant parsing of GPT-4o Vision extraction output.
+
+- The extraction response is streamed and fed to DealStreamParser chunk by
+  chunk. Every deal object is decoded the moment its closing brace arrives,
+  so a response cut off at max_tokens still yields all of its complete deals
+  (only the half-written last one is lost).
+- With EXTRACTION_STRUCTURED_OUTPUT (default on) the call uses a strict JSON
+  schema ({"deals": [...]}), so every deal has every field with the right
+  type. The parser also accepts the bare list the prompt asks for, with or
+  without ```json fences.
+- continuation_prompt() builds the follow-up request for a truncated page:
+  the deals already extracted are listed so the model only returns the rest.
+"""
+
+import json
+import os
+
+EXTRACTION_STRUCTURED_OUTPUT = os.getenv("EXTRACTION_STRUCTURED_OUTPUT", "1") != "0"
+# Follow-up requests per page when the output hits max_tokens
+EXTRACTION_MAX_CONTINUATIONS = int(os.getenv("EXTRACTION_MAX_CONTINUATIONS", "2"))
+
+
+def _nullable(type_name):
+    return {"type": [type_name, "null"]}
+
+
+DEAL_SCHEMA_PROPERTIES = {
+    "product_name": {"type": "string"},
+    "sku": _nullable("string"),
+    "product_category": _nullable("string"),
+    "price": {"type": "number"},
+    "original_price": _nullable("number"),
+    "store": {"type": "string"},
+    "valid_from": _nullable("string"),
+    "valid_to": _nullable("string"),
+    "deal_type": {"type": "string"},
+    "in_store_only": {"type": "boolean"},
+    "deal_conditions": {"type": "array", "items": {"type": "string"}},
+    "attributes": {"type": "array", "items": {"type": "string"}},
+    "bundle_deal": {"type": "boolean"},
+    "required_purchase": _nullable("string"),
+    "free_item": _nullable("string"),
+}
+
+
+def deal_list_response_format(with_image=False):
+    """
+    Strict JSON-schema response format for extraction. Structured outputs need an
+    object at the top level, so the deal list is wrapped as {"deals": [...]}.
+    with_image adds the "image" number used by packed (multi-image) calls.
+    """
+    properties = dict(DEAL_SCHEMA_PROPERTIES)
+    if with_image:
+        properties["image"] = {"type": "integer", "description": "number of the image the deal appears on"}
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": "flyer_deals",
+            "strict": True,
+            "schema": {
+                "type": "object",
+                "properties": {
+                    "deals": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": properties,
+                            "required": list(properties),
+                            "additionalProperties": False,
+                        },
+                    },
+                },
+                "required": ["deals"],
+                "additionalProperties": False,
+            },
+        },
+    }
+
+
+class DealStreamParser:
+    """
+    Feeds on raw response text and returns each deal object as soon as it is complete.
+    The deal list is the first JSON array in the text (a bare list, or the "deals"
+    array of the structured response); anything after it is ignored.
+    """
+
+    def __init__(self):
+        self.deals = []
+        self.complete = False   # the list's closing bracket has arrived
+        self.malformed = 0      # objects that closed but didn't decode
+        self._buffer = ""
+        self._depth = 0
+        self._list_depth = None
+        self._object_start = None
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, chunk):
+        """Consumes the next piece of the response; returns the deals it completed."""
+        if self.complete or not chunk:
+            return []
+        base = len(self._buffer)
+        self._buffer += chunk
+        completed = []
+        for offset, char in enumerate(chunk):
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+            if char == '"':
+                self._in_string = True
+            elif char in '[{':
+                if char == '[' and self._list_depth is None:
+                    self._list_depth = self._depth + 1
+                elif char == '{' and self._depth == self._list_depth:
+                    self._object_start = base + offset
+                self._depth += 1
+            elif char in ']}':
+                self._depth -= 1
+                if self._list_depth is None:
+                    continue
+                if char == '}' and self._depth == self._list_depth and self._object_start is not None:
+                    deal = self._decode(self._buffer[self._object_start:base + offset + 1])
+                    self._object_start = None
+                    if deal is not None:
+                        completed.append(deal)
+                elif char == ']' and self._depth < self._list_depth:
+                    self.complete = True
+                    break
+        self._compact()
+        self.deals.extend(completed)
+        return completed
+
+    @property
+    def found_list(self):
+        """Whether the response has started a deal list at all."""
+        return self._list_depth is not None
+
+    def _decode(self, text):
+        try:
+            deal = json.loads(text)
+        except json.JSONDecodeError:
+            self.malformed += 1
+            return None
+        return deal if isinstance(deal, dict) else None
+
+    def _compact(self):
+        # Only an unfinished object needs its text; everything before it is done
+        keep_from = self._object_start if self._object_start is not None else len(self._buffer)
+        self._buffer = self._buffer[keep_from:]
+        if self._object_start is not None:
+            self._object_start = 0
+
+
+def parse_deal_list(text):
+    """All complete deals in a (possibly truncated or fenced) response text."""
+    parser = DealStreamParser()
+    parser.feed(text)
+    return parser.deals
+
+
+def deal_key(deal):
+    """Identity used to drop deals a continuation repeats."""
+    return (str(deal.get("product_name") or "").strip().lower(), str(deal.get("sku") or "").strip().lower(),
+            deal.get("price"), deal.get("image"))
+
+
+def continuation_prompt(deals):
+    """Follow-up instruction for a page whose output was cut off after `deals`."""
+    lines = []
+    for deal in deals:
+        line = f"- {deal.get('product_name')}"
+        if deal.get("sku"):
+            line += f" (SKU {deal['sku']})"
+        if deal.get("price") is not None:
+            line += f" ${deal['price']}"
+        if deal.get("image"):
+            line += f" [image {deal['image']}]"
+        lines.append(line)
+    return (f"Your previous answer ran out of space after {len(deals)} deals. These deals are ALREADY "
+            "extracted - do NOT repeat them:\n" + "\n".join(lines) +
+            "\n\nContinue scanning from where the last of them appears and return ONLY the remaining "
+            "deals, in the same format.")
@@ -0,0 +1,185 @@
+"""
+DealZen Extraction Budget
+Token/cost ledger and budget governor for flyer extraction (process_flyers.py).
+
+- ExtractionLedger appends one JSON line per Vision call (flyer, store, tokens,
+  image tokens, cost, latency) to logs/extraction_usage.jsonl.
+- ExtractionBudget caps how many Vision calls run at once and adapts that cap:
+  it halves concurrency while the tokens-per-minute budget is exceeded, drops to
+  one call at 80% of the USD budget and stops starting new calls at 100%. A new
+  call only starts once the last minute's tokens are back under the TPM budget.
+"""
+
+import json
+import os
+import struct
+import threading
+import time
+from collections import deque
+
+EXTRACTION_USAGE_LOG = os.getenv("EXTRACTION_USAGE_LOG", 'logs/extraction_usage.jsonl')
+
+BUDGET_WARNING_RATIO = 0.8
+
+
+def image_size(data: bytes):
+    """(width, height) read from PNG / JPEG / WEBP / GIF headers, or None if unknown."""
+    if data[:8] == b'\x89PNG\r\n\x1a\n':
+        return struct.unpack('>II', data[16:24])
+    if data[:6] in (b'GIF87a', b'GIF89a'):
+        return struct.unpack('<HH', data[6:10])
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        chunk = data[12:16]
+        if chunk == b'VP8X':
+            return (int.from_bytes(data[24:27], 'little') + 1, int.from_bytes(data[27:30], 'little') + 1)
+        if chunk == b'VP8 ':
+            width, height = struct.unpack('<HH', data[26:30])
+            return width & 0x3fff, height & 0x3fff
+        if chunk == b'VP8L':
+            bits = int.from_bytes(data[21:25], 'little')
+            return (bits & 0x3fff) + 1, ((bits >> 14) & 0x3fff) + 1
+        return None
+    if data[:2] == b'\xff\xd8':
+        i = 2
+        while i + 9 < len(data):
+            if data[i] != 0xFF:
+                i += 1
+                continue
+            marker = data[i + 1]
+            # SOF0-SOF15 carry the frame size (except DHT/JPG/DAC markers)
+            if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+                height, width = struct.unpack('>HH', data[i + 5:i + 9])
+                return width, height
+            if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+                i += 2
+                continue
+            i += 2 + struct.unpack('>H', data[i + 2:i + 4])[0]
+    return None
+
+
+class ExtractionLedger:
+    """Append-only JSONL record of extraction calls (safe to use from worker threads)."""
+
+    def __init__(self, path: str = EXTRACTION_USAGE_LOG):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+    def record(self, entry: dict):
+        line = json.dumps({"ts": time.time(), **entry}) + "\n"
+        with self._lock:
+            with open(self.path, 'a') as f:
+                f.write(line)
+
+
+class ExtractionBudget:
+    """
+    Adaptive concurrency limit for Vision calls, driven by token and cost budgets.
+
+    Workers call acquire() before a call (False means the USD budget is spent and
+    the image must be skipped), record() with the call's tokens and cost, then
+    release(). acquire() blocks while the tokens-per-minute window is full, even at
+    concurrency 1, until enough of it has aged out.
+    """
+
+    def __init__(self, max_concurrency: int = 4, budget_usd: float = None, tokens_per_minute: int = None,
+                 window_s: float = 60.0):
+        self.max_concurrency = max(1, max_concurrency)
+        self.limit = self.max_concurrency
+        self.budget_usd = budget_usd
+        self.tokens_per_minute = tokens_per_minute
+        self.window_s = window_s
+        self.spent_usd = 0.0
+        self.total_tokens = 0
+        self.exhausted = False
+        self.alarms = []
+        self._window = deque()  # (timestamp, tokens)
+        self._active = 0
+        self._condition = threading.Condition()
+        self._warned_budget = False
+        self.tpm_waits = 0
+
+    def acquire(self):
+        waited = False
+        with self._condition:
+            while not self.exhausted:
+                if self._active >= self.limit:
+                    self._condition.wait()
+                    continue
+                wait_s = self._tpm_wait(time.monotonic())
+                if wait_s <= 0:
+                    break
+                if not waited:
+                    waited = True
+                    self.tpm_waits += 1
+                self._condition.wait(wait_s)
+            if self.exhausted:
+                return False
+            self._active += 1
+            return True
+
+    def _tpm_wait(self, now: float):
+        """Seconds until the window holds fewer than tokens_per_minute tokens (0 if it already does)."""
+        while self._window and self._window[0][0] <= now - self.window_s:
+            self._window.popleft()
+        if not self.tokens_per_minute:
+            return 0
+        excess = sum(tokens for _, tokens in self._window) - self.tokens_per_minute
+        if excess < 0:
+            return 0
+        # The oldest calls age out first; wait for the one that brings the total under the budget
+        for timestamp, tokens in self._window:
+            excess -= tokens
+            if excess < 0:
+                return timestamp + self.window_s - now
+        return 0
+
+    def release(self):
+        with self._condition:
+            self._active -= 1
+            self._condition.notify_all()
+
+    def record(self, tokens: int, cost_usd: float):
+        with self._condition:
+            now = time.monotonic()
+            self.spent_usd += cost_usd
+            self.total_tokens += tokens
+            self._window.append((now, tokens))
+            while self._window and self._window[0][0] < now - self.window_s:
+                self._window.popleft()
+            self._adjust()
+            self._condition.notify_all()
+
+    def _adjust(self):
+        if self.budget_usd is not None:
+            if self.spent_usd >= self.budget_usd:
+                if not self.exhausted:
+                    self._alarm(f"🛑 Budget exhausted: ${self.spent_usd:.2f} of ${self.budget_usd:.2f} - "
+                                "no new images will be sent")
+                self.exhausted = True
+                return
+            if self.spent_usd >= BUDGET_WARNING_RATIO * self.budget_usd:
+                if not self._warned_budget:
+                    self._warned_budget = True
+                    self._alarm(f"⚠️  {self.spent_usd / self.budget_usd:.0%} of the ${self.budget_usd:.2f} budget "
+                                "spent - concurrency reduced to 1")
+                self.limit = 1
+                return
+
+        if self.tokens_per_minute:
+            window_tokens = sum(tokens for _, tokens in self._window)
+            if window_tokens > self.tokens_per_minute and self.limit > 1:
+                self.limit = max(1, self.limit // 2)
+                self._alarm(f"⚠️  {window_tokens} tokens in the last minute (budget {self.tokens_per_minute}) - "
+                            f"concurrency reduced to {self.limit}")
+            elif window_tokens < self.tokens_per_minute / 2 and self.limit < self.max_concurrency:
+                self.limit += 1
+
+    def _alarm(self, message: str):
+        self.alarms.append(message)
+        print(f"    {message}")
+
+    def stats(self):
+        return {"spent_usd": round(self.spent_usd, 4), "total_tokens": self.total_tokens,
+                "concurrency": self.limit, "exhausted": self.exhausted, "alarms": len(self.alarms),
+                "tpm_waits": self.tpm_waits}
@@ -0,0 +1,140 @@
+"""
+DealZen Extraction Packing
+Groups low-density flyer pages of the same store into one Vision request
+(process_flyers.py --pack), so the ~2k-token extraction prompt and a full
+round-trip are paid once per group instead of once per page.
+
+- Density comes from past deal counts in the extraction ledger, or - for pages
+  never extracted before - from the image size: pages GPT-4o reads in at most
+  PACK_SMALL_IMAGE_TOKENS image tokens (two 512px tiles) are small enough to share.
+- A group holds at most PACK_MAX_IMAGES pages of one store and about
+  PACK_MAX_DEALS_PER_CALL expected deals, to stay well inside max_tokens.
+- Usage of a packed call is split back onto its pages (image tokens exactly,
+  the shared prompt evenly, completion tokens and time by deal count) so the
+  ledger stays per page.
+"""
+
+import json
+import os
+import threading
+from collections import defaultdict
+
+from backend.app.usage import vision_image_tokens
+from extraction_budget import image_size
+
+PACK_MAX_IMAGES = int(os.getenv("PACK_MAX_IMAGES", "4"))
+# Pages that previously yielded at most this many deals count as low-density
+PACK_MAX_PAGE_DEALS = int(os.getenv("PACK_MAX_PAGE_DEALS", "12"))
+PACK_MAX_DEALS_PER_CALL = int(os.getenv("PACK_MAX_DEALS_PER_CALL", "40"))
+PACK_SMALL_IMAGE_TOKENS = int(os.getenv("PACK_SMALL_IMAGE_TOKENS", str(85 + 170 * 2)))
+
+
+def past_deal_counts(ledger_path):
+    """Deals found on each flyer page in its latest extraction, from the ledger."""
+    counts = {}
+    if not os.path.exists(ledger_path):
+        return counts
+    with open(ledger_path, 'r') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record.get("flyer") is not None and "deals" in record:
+                counts[record["flyer"]] = record["deals"]
+    return counts
+
+
+class PagePacker:
+    """
+    Decides per page whether it is extracted alone or packed with other sparse
+    pages of its store. Pages arrive one by one (PDF pages while they render);
+    add() and flush() return the groups that are ready to submit.
+    """
+
+    def __init__(self, store_of, deal_history, max_images=PACK_MAX_IMAGES, max_page_deals=PACK_MAX_PAGE_DEALS,
+                 max_deals_per_call=PACK_MAX_DEALS_PER_CALL):
+        self.store_of = store_of
+        self.deal_history = deal_history
+        self.max_images = max(1, max_images)
+        self.max_page_deals = max_page_deals
+        self.max_deals_per_call = max_deals_per_call
+        self._open = defaultdict(list)  # store -> [(page, expected deals)]
+
+    def expected_deals(self, page):
+        """Expected deal count if the page is low-density, else None."""
+        past = self.deal_history.get(page.name)
+        if past is not None:
+            return past if past <= self.max_page_deals else None
+        size = image_size(page.read())
+        if size and vision_image_tokens(*size) <= PACK_SMALL_IMAGE_TOKENS:
+            return self.max_page_deals
+        return None
+
+    def add(self, page):
+        expected = self.expected_deals(page) if self.max_images > 1 else None
+        if expected is None:
+            return [[page]]
+        store = self.store_of(page.name)
+        group = self._open[store]
+        ready = []
+        if group and (len(group) >= self.max_images
+                      or sum(deals for _, deals in group) + expected > self.max_deals_per_call):
+            ready.append([p for p, _ in group])
+            group = self._open[store] = []
+        group.append((page, expected))
+        if len(group) >= self.max_images:
+            ready.append([p for p, _ in group])
+            self._open[store] = []
+        return ready
+
+    def flush(self):
+        groups = [[p for p, _ in group] for group in self._open.values() if group]
+        self._open.clear()
+        return groups
+
+
+def split_usage(usage, image_tokens, deal_counts, latency_ms):
+    """
+    Per-page shares of one packed call: (usage dict, latency_ms) for each page.
+    Shares add up to the call's totals.
+    """
+    pages = len(image_tokens)
+    total_deals = sum(deal_counts)
+    text_prompt = max(0, usage["prompt_tokens"] - sum(image_tokens))
+    shares = []
+    for i in range(pages):
+        weight = deal_counts[i] / total_deals if total_deals else 1 / pages
+        shares.append(({
+            "prompt_tokens": image_tokens[i] + round(text_prompt / pages),
+            "completion_tokens": round(usage["completion_tokens"] * weight),
+            "cached_tokens": round(usage.get("cached_tokens", 0) / pages),
+            "image_tokens": image_tokens[i],
+        }, latency_ms * weight))
+    return shares
+
+
+class ExtractionModeStats:
+    """Calls, deals, tokens and wall time per extraction mode ("single" / "packed")."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._modes = defaultdict(lambda: {"calls": 0, "pages": 0, "deals": 0, "tokens": 0, "seconds": 0.0})
+
+    def record(self, mode, pages, deals, tokens, seconds):
+        with self._lock:
+            stats = self._modes[mode]
+            stats["calls"] += 1
+            stats["pages"] += pages
+            stats["deals"] += deals
+            stats["tokens"] += tokens
+            stats["seconds"] += seconds
+
+    def report(self):
+        with self._lock:
+            return {
+                mode: {**stats,
+                       "tokens_per_deal": round(stats["tokens"] / stats["deals"], 1) if stats["deals"] else None,
+                       "seconds_per_deal": round(stats["seconds"] / stats["deals"], 2) if stats["deals"] else None}
+                for mode, stats in self._modes.items()
+            }
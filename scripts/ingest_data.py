@@ -1,8 +1,13 @@
 import json
+import queue
 import sys
 import os
+import threading
 import weaviate
+from collections import Counter
 from weaviate.classes.config import Configure
+from weaviate.classes.query import Filter
+from weaviate.util import generate_uuid5
 from dotenv import load_dotenv
 
 # Add project root to Python path
@@ -21,34 +26,251 @@ if not os.getenv("OPENAI_API_KEY"):
     print("   Please add your OpenAI API key to backend/.env")
     sys.exit(1)
 
-from backend.app.weaviate_client import get_weaviate_client, get_deal_schema
+from backend.app.weaviate_client import get_weaviate_client, get_deal_schema, source_image_property
+from backend.app.corpus import bump_corpus_version
+from backend.app.deal_properties import build_deal_properties
+from backend.app.deal_model import as_deal, deals_to_dicts, read_deals_file
+from backend.app.snapshot import write_snapshot, SNAPSHOT_PATH
+from backend.app.local_search import load_matching_embeddings
+from backend.app.embeddings import EMBEDDING_MODEL
+from backend.app.local_search import file_sha256
+from backend.app.saved_searches import SavedSearchStore
+from backend.app.suggest import write_suggest_index, SUGGEST_INDEX_PATH
+from backend.app.product_groups import write_product_groups, PRODUCT_GROUPS_PATH
 
-def create_vector_text(deal: dict):
+COLLECTION_NAME = "Deal"
+# Written by process_flyers.py: per-page validation results for the deals file it produced
+PAGE_MANIFEST_FILE = os.path.join(script_dir, 'deals.pages.json')
+
+
+def create_deals_collection(client, collection_name=COLLECTION_NAME):
+    """Drops and recreates the Deal collection (full rebuild)."""
+    if client.collections.exists(collection_name):
+        client.collections.delete(collection_name)
+
+    return client.collections.create(
+        name=collection_name,
+        # Pinned so query vectors computed by the backend (embeddings.py) live in the same space
+        vectorizer_config=Configure.Vectorizer.text2vec_openai(model=EMBEDDING_MODEL),
+        properties=get_deal_schema()
+    )
+
+
+def open_deals_collection(client, collection_name=COLLECTION_NAME):
+    """The existing Deal collection (created if missing), for incremental upserts."""
+    if not client.collections.exists(collection_name):
+        return create_deals_collection(client, collection_name)
+    collection = client.collections.get(collection_name)
+    if not any(prop.name == "source_image" for prop in collection.config.get().properties):
+        collection.config.add_property(source_image_property())
+    return collection
+
+
+def deal_uuids(deals):
     """
-    Creates a rich text string for vectorization from the deal's JSON.
-    This is our 'intelligent chunking' for semantic search.
+    Deterministic object ids: the same deal on the same flyer page always maps to
+    the same id, so re-ingesting a page overwrites its objects instead of adding copies.
     """
-    attrs = ", ".join(deal.get("attributes", []))
-    conditions = ", ".join(deal.get("deal_conditions", []))
+    seen = Counter()
+    uuids = []
+    for deal in map(as_deal, deals):
+        key = (deal.source_image or "", deal.store or "", deal.sku or deal.product_name or "")
+        uuids.append(generate_uuid5("|".join(key) + f"|{seen[key]}"))
+        seen[key] += 1
+    return uuids
+
+
+def ingest_deals(deals_collection, deals):
+    """Batch-inserts deals (Deals or dicts); returns the batch's failed objects."""
+    deals = [as_deal(deal) for deal in deals]
+    with deals_collection.batch.dynamic() as batch:
+        for deal, uuid in zip(deals, deal_uuids(deals)):
+            # Adds vector_text and full_json; dates are already RFC3339 (required by Weaviate)
+            properties = build_deal_properties(deal)
+            
+            batch.add_object(
+                properties=properties,
+                uuid=uuid
+            )
+    return deals_collection.batch.failed_objects
+
+
+def upsert_page_deals(deals_collection, source_image, deals):
+    """
+    Replaces the deals of one flyer page: writes the new objects (same ids overwrite),
+    then deletes the page's objects that are no longer on it. Returns failed objects.
+    """
+    failed_objects = ingest_deals(deals_collection, deals) if deals else []
+    keep = set(str(uuid) for uuid in deal_uuids(deals))
+    existing = deals_collection.query.fetch_objects(
+        filters=Filter.by_property("source_image").equal(source_image), limit=10000, return_properties=[])
+    stale = [obj.uuid for obj in existing.objects if str(obj.uuid) not in keep]
+    if stale:
+        deals_collection.data.delete_many(where=Filter.by_id().contains_any(stale))
+    return failed_objects
+
+
+def print_failed_objects(failed_objects, total):
+    failed = len(failed_objects)
+    successful = total - failed
     
-    return (
-        f"Product: {deal.get('product_name', '')}. "
-        f"Category: {deal.get('product_category', '')}. "
-        f"Store: {deal.get('store', '')}. "
-        f"Type of Deal: {deal.get('deal_type', '')}. "
-        f"Features: {attrs}. "
-        f"Conditions: {conditions}."
-    )
+    print(f"\n⚠️  BATCH ERRORS DETECTED:")
+    print(f"   ✅ Successful: {successful}/{total}")
+    print(f"   ❌ Failed: {failed}/{total}")
+    print(f"\n📋 First 3 errors:")
+    
+    for i, failed_obj in enumerate(failed_objects[:3]):
+        print(f"\n   Error {i+1}:")
+        if hasattr(failed_obj, 'message'):
+            print(f"   Message: {failed_obj.message}")
+        if hasattr(failed_obj, 'object_'):
+            try:
+                product_name = failed_obj.object_.properties.get('product_name', 'Unknown')
+                print(f"   Product: {product_name}")
+            except:
+                pass
 
-def main():
-    print("\n" + "="*70)
-    print("🚀 DEALZEN DATA INGESTION WITH AUTOMATED QUALITY CONTROL")
-    print("="*70)
+
+def notify_saved_searches(deals):
+    """Percolates new/changed deals through the users' saved searches into the notification outbox."""
+    try:
+        store = SavedSearchStore()
+        queued = store.percolate(deals)
+    except Exception as e:
+        print(f"⚠️  Saved-search matching failed: {e}")
+        return 0
+    if queued:
+        print(f"🔔 Queued {queued} saved-search notification(s)")
+    return queued
+
+
+def finalize_ingestion(data, deals_file, changed=None):
+    """
+    Bumps the corpus version, writes the binary snapshot, suggestion table and product groups and notifies saved searches
+    about `changed` deals (default: all of `data`). Returns the new version.
+    """
+    # New corpus version: in-flight work and caches keyed on the old one stop matching
+    corpus_version = bump_corpus_version()
     
-    # ========================================
-    # STEP 1: AUTOMATIC QUALITY VALIDATION
-    # ========================================
-    print("\n🔍 Step 1: Running automated quality validation...")
+    # Binary snapshot for the backend / workers: mmap-loaded, no JSON parsing at startup
+    embeddings, embedding_model = load_matching_embeddings(deals_file)
+    write_snapshot(SNAPSHOT_PATH, data, embeddings, corpus_version, embedding_model)
+    print(f"📦 Wrote corpus snapshot: {SNAPSHOT_PATH}" + (" (with embeddings)" if embeddings is not None else ""))
+
+    # Typeahead table for GET /suggest (backends apply the difference on their next check)
+    suggestions = write_suggest_index(SUGGEST_INDEX_PATH, data, corpus_version)
+    print(f"🔤 Wrote {suggestions} suggestions: {SUGGEST_INDEX_PATH}")
+
+    # Same product across stores, with precomputed price spread, for comparison questions
+    groups = write_product_groups(PRODUCT_GROUPS_PATH, data, corpus_version)
+    multi_store = sum(1 for group in groups.values() if len(group["stores"]) > 1)
+    print(f"🏷️  Wrote {len(groups)} product groups ({multi_store} at several stores): {PRODUCT_GROUPS_PATH}")
+
+    # Deals already notified at the same price are not queued again
+    notify_saved_searches(data if changed is None else changed)
+    return corpus_version
+
+
+def load_page_manifest(deals_file):
+    """The per-page validation manifest, if it was written for exactly this deals file."""
+    if not os.path.exists(PAGE_MANIFEST_FILE):
+        return None
+    try:
+        with open(PAGE_MANIFEST_FILE, 'r') as f:
+            manifest = json.load(f)
+    except json.JSONDecodeError:
+        return None
+    return manifest if manifest.get("deals_sha256") == file_sha256(deals_file) else None
+
+
+class StreamingIngester:
+    """
+    Ingests validated flyer pages while extraction is still running.
+
+    Pages are queued by extraction workers and inserted by a single thread that
+    owns the Weaviate client. By default the collection is rebuilt when the
+    ingester starts, exactly like a full ingest_data.py run; with upsert=True
+    (watch_flyers.py) the collection is kept and each page replaces only its
+    own deals.
+    """
+
+    def __init__(self, collection_name=COLLECTION_NAME, upsert=False):
+        self.collection_name = collection_name
+        self.upsert = upsert
+        self._queue = queue.Queue()
+        self._thread = None
+        self.ingested = 0
+        self.failed = 0
+        self.pages = 0
+
+    def start(self):
+        self.client = get_weaviate_client()
+        if self.upsert:
+            self.collection = open_deals_collection(self.client, self.collection_name)
+        else:
+            self.collection = create_deals_collection(self.client, self.collection_name)
+        self._thread = threading.Thread(target=self._run, name="streaming-ingester", daemon=True)
+        self._thread.start()
+        print(f"🔗 Streaming accepted pages into Weaviate collection '{self.collection_name}'")
+
+    def submit(self, page_name, deals):
+        """Queues a page. In upsert mode an empty list removes the page's deals."""
+        self._queue.put((page_name, deals))
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                break
+            page_name, deals = item
+            try:
+                self._write(page_name, deals)
+            finally:
+                self._queue.task_done()
+
+    def _write(self, page_name, deals):
+        try:
+            if self.upsert:
+                # Extraction tags deals with their page; the gate reports PDF pages as "<pdf>#page=N"
+                source_image = deals[0].get("source_image", page_name) if deals else page_name
+                failed_objects = upsert_page_deals(self.collection, source_image, deals)
+            else:
+                failed_objects = ingest_deals(self.collection, deals)
+        except Exception as e:
+            print(f"    ❌ [Ingest] {page_name}: {e}")
+            self.failed += len(deals)
+            return
+        self.pages += 1
+        self.failed += len(failed_objects)
+        self.ingested += len(deals) - len(failed_objects)
+        print(f"    📥 [Ingest] {page_name}: {len(deals) - len(failed_objects)}/{len(deals)} deals loaded")
+
+    def flush(self):
+        """Blocks until every queued page has been written."""
+        self._queue.join()
+
+    def close(self):
+        """Waits for queued pages to be written and closes the client."""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+        self.client.close()
+
+
+def validate_deals_file(deals_file):
+    """Step 1 of a standalone run. Returns False if ingestion must be blocked."""
+    manifest = load_page_manifest(deals_file) if os.path.exists(deals_file) else None
+    if manifest:
+        # process_flyers.py already gated every page; re-scoring the merged file would
+        # judge dozens of pages against per-page thresholds
+        pages = manifest["pages"]
+        accepted = sum(1 for page in pages if page["decision"] != "REJECT")
+        print(f"✅ Pages were validated during extraction: {accepted}/{len(pages)} accepted, "
+              f"rejected pages are in the retry queue")
+        return True
     
     try:
         from validate_extraction import QualityValidator, print_validation_report
@@ -69,7 +291,7 @@ def main():
                 print(f"   • {error}")
             print(f"\n💡 Recommendation: Re-run extraction with enhanced prompt")
             print("   Command: python scripts/process_flyers.py")
-            return
+            return False
         
         elif decision == 'RETRY':
             print(f"⚠️  Quality score {score}/100 is borderline")
@@ -88,23 +310,30 @@ def main():
     except Exception as e:
         print(f"⚠️  Warning: Validation failed with error: {e}")
         print("   Proceeding with ingestion anyway...")
+    return True
+
+
+def main():
+    print("\n" + "="*70)
+    print("🚀 DEALZEN DATA INGESTION WITH AUTOMATED QUALITY CONTROL")
+    print("="*70)
+    
+    # ========================================
+    # STEP 1: AUTOMATIC QUALITY VALIDATION
+    # ========================================
+    print("\n🔍 Step 1: Running automated quality validation...")
+    
+    if not validate_deals_file(os.path.join(script_dir, 'deals.json')):
+        return
     
     print("\n🔍 Step 2: Connecting to Weaviate and creating collection...")
     
     client = get_weaviate_client()
     
-    collection_name = "Deal"
-    if client.collections.exists(collection_name):
-        client.collections.delete(collection_name)
-    
-    deals_collection = client.collections.create(
-        name=collection_name,
-        vectorizer_config=Configure.Vectorizer.text2vec_openai(),
-        properties=get_deal_schema()
-    )
+    collection_name = COLLECTION_NAME
+    deals_collection = create_deals_collection(client, collection_name)
 
     # Determine which deals file to use
-    script_dir = os.path.dirname(os.path.abspath(__file__))
     deals_file = os.path.join(script_dir, 'deals.json')
     
     # Fallback to example file if deals.json doesn't exist
@@ -114,96 +343,35 @@ def main():
     else:
         print(f"✅ Loading deals from: {deals_file}")
     
-    with open(deals_file, 'r') as f:
-        data = json.load(f)
+    # Decoded and normalized (prices, dates, lists) by the shared Deal model
+    deals = read_deals_file(deals_file)
+    data = deals_to_dicts(deals)
 
-    with deals_collection.batch.dynamic() as batch:
-        for deal in data:
-            vector_text = create_vector_text(deal)
-            
-            # Parse and format dates to RFC3339 (required by Weaviate)
-            # Format: YYYY-MM-DDTHH:MM:SSZ
-            valid_from = deal.get("valid_from")
-            valid_to = deal.get("valid_to")
-            
-            # Helper function to ensure RFC3339 format
-            def ensure_rfc3339(date_str):
-                if not date_str or not isinstance(date_str, str):
-                    return None
-                
-                date_str = date_str.strip()
-                
-                # If date only (no time), add default time
-                if 'T' not in date_str:
-                    # For valid_from, use start of day; for valid_to, use end of day
-                    # But we'll use 00:00:00 for both and adjust later if needed
-                    date_str = date_str + 'T00:00:00'
-                
-                # If no timezone, add UTC
-                if not date_str.endswith('Z') and '+' not in date_str[-6:] and '-' not in date_str[-6:]:
-                    date_str = date_str + 'Z'
-                
-                return date_str
-            
-            valid_from = ensure_rfc3339(valid_from)
-            valid_to = ensure_rfc3339(valid_to)
-            
-            # For valid_to, if it was date-only, use end of day instead
-            if valid_to and deal.get("valid_to") and 'T' not in deal.get("valid_to"):
-                valid_to = valid_to.replace('T00:00:00Z', 'T23:59:59Z')
-            
-            properties = {
-                "product_name": deal.get("product_name"),
-                "sku": deal.get("sku"),
-                "product_category": deal.get("product_category"),
-                "vector_text": vector_text,
-                "price": deal.get("price"),
-                "store": deal.get("store"),
-                "original_price": deal.get("original_price"),
-                "deal_type": deal.get("deal_type"),
-                "in_store_only": deal.get("in_store_only"),
-                "deal_conditions": deal.get("deal_conditions"),
-                "valid_from": valid_from,  # RFC3339 format with timezone
-                "valid_to": valid_to,      # RFC3339 format with timezone
-                "bundle_deal": deal.get("bundle_deal", False),  # Bundle deals
-                "required_purchase": deal.get("required_purchase"),  # What to buy
-                "free_item": deal.get("free_item"),  # What comes free
-                "full_json": json.dumps(deal),
-            }
-            
-            batch.add_object(
-                properties=properties
-            )
+    failed_objects = ingest_deals(deals_collection, deals)
     
     # Check for failed objects
-    if deals_collection.batch.failed_objects:
-        failed = len(deals_collection.batch.failed_objects)
-        successful = len(data) - failed
-        
-        print(f"\n⚠️  BATCH ERRORS DETECTED:")
-        print(f"   ✅ Successful: {successful}/{len(data)}")
-        print(f"   ❌ Failed: {failed}/{len(data)}")
-        print(f"\n📋 First 3 errors:")
-        
-        for i, failed_obj in enumerate(deals_collection.batch.failed_objects[:3]):
-            print(f"\n   Error {i+1}:")
-            if hasattr(failed_obj, 'message'):
-                print(f"   Message: {failed_obj.message}")
-            if hasattr(failed_obj, 'object_'):
-                try:
-                    product_name = failed_obj.object_.properties.get('product_name', 'Unknown')
-                    print(f"   Product: {product_name}")
-                except:
-                    pass
+    if failed_objects:
+        print_failed_objects(failed_objects, len(data))
     else:
         print(f"\n✅ Successfully ingested {len(data)} deals with no errors!")
     
+    corpus_version = finalize_ingestion(data, deals_file)
+
+    # Popular questions answered ahead of the first users (see warm_answer_cache.py)
+    if os.getenv("WARM_CACHE_AFTER_INGEST", "1") != "0":
+        try:
+            from warm_answer_cache import warm_answer_cache
+            warm_answer_cache(data)
+        except Exception as e:
+            print(f"⚠️  Answer cache warm-up failed: {e}")
+    
     print("\n" + "="*70)
     print("✅ INGESTION COMPLETE")
     print("="*70)
     print(f"\n📊 Summary:")
     print(f"   Total deals in database: {len(data)}")
     print(f"   Weaviate collection: {collection_name}")
+    print(f"   Corpus version: {corpus_version}")
     print(f"\n🚀 Next Steps:")
     print(f"   1. Start backend: cd backend && uvicorn app.main:app --reload")
     print(f"   2. Start frontend: cd frontend && npm run dev")
@@ -212,4 +380,3 @@ def main():
 
 if __name__ == "__main__":
     main()
-
@@ -0,0 +1,77 @@
+"""
+DealZen Per-Page Quality Gate
+Validates each flyer page as soon as its extraction completes (process_flyers.py).
+
+- ACCEPT: recorded as a success and passed on (to deals.json / streaming ingestion)
+- RETRY:  borderline - passed on, and queued for a better re-extraction
+- REJECT: (or a failed extraction) kept out of deals.json and queued for retry
+
+Runs in the extraction worker threads, so validation of one page overlaps the
+other in-flight Vision calls.
+"""
+
+import json
+import os
+import threading
+from validate_extraction import QualityValidator
+from retry_queue import RetryQueue
+
+
+class PageGate:
+    """Per-page validation decisions, with the retry queue and optional streaming ingestion."""
+
+    def __init__(self, retry_queue=None, ingester=None):
+        self.retry_queue = retry_queue or RetryQueue()
+        self.ingester = ingester
+        self.pages = []
+        # RetryQueue rewrites whole JSON files; workers must not interleave those writes
+        self._lock = threading.Lock()
+
+    def check(self, image_path, deals):
+        """Validates one page. Returns the deals to keep, or None if the page is rejected."""
+        name = os.path.basename(image_path)
+        if not deals:
+            self._record(name, 'REJECT', 0, 0)
+            with self._lock:
+                self.retry_queue.add_to_retry_queue(image_path, "Extraction failed or returned no deals", 0)
+            return None
+
+        report = QualityValidator(deals=deals, per_page=True).validate()
+        decision, score = report['decision'], report['score']
+        self._record(name, decision, score, len(deals))
+
+        with self._lock:
+            if decision == 'ACCEPT':
+                self.retry_queue.mark_as_success(image_path, score, len(deals))
+            else:
+                self.retry_queue.add_to_retry_queue(image_path, report['reason'], score, extraction_data=deals)
+
+        if decision == 'REJECT':
+            print(f"    🛑 {name}: rejected (score {score}/100) - {report['reason']}")
+            return None
+
+        print(f"    🎯 {name}: {decision.lower()} (score {score}/100)")
+        if self.ingester is not None:
+            self.ingester.submit(name, deals)
+        return deals
+
+    def _record(self, name, decision, score, deals_count):
+        with self._lock:
+            self.pages.append({"image": name, "decision": decision, "score": score, "deals": deals_count})
+
+    def summary(self):
+        counts = {"ACCEPT": 0, "RETRY": 0, "REJECT": 0}
+        for page in self.pages:
+            counts[page["decision"]] += 1
+        return counts
+
+    def write_manifest(self, path, deals_sha256, previous_pages=()):
+        """
+        Lets ingest_data.py skip whole-file validation for a deals file built from gated pages.
+        previous_pages: entries from an earlier manifest that are still in the deals file.
+        """
+        pages = {page["image"]: page for page in previous_pages}
+        pages.update({page["image"]: page for page in self.pages})  # the latest check of a page wins
+        with open(path, 'w') as f:
+            json.dump({"deals_sha256": deals_sha256, "pages": sorted(pages.values(), key=lambda p: p["image"])},
+                      f, indent=2)
@@ -0,0 +1,92 @@
+"""
+DealZen Query Embedding Precompute
+Embeds the most frequent queries ahead of time so the backend answers them
+without an embeddings API round-trip (see backend/app/embeddings.py).
+
+Queries come from a seed list (one per line) and/or a query log (JSONL with a
+"query" field, or plain text). They are normalized, counted, and the top N are
+embedded in batches and written to backend/data/warm_query_embeddings.npz,
+which the backend loads at startup.
+
+Usage:
+    python scripts/precompute_query_embeddings.py [--seed FILE] [--log FILE ...] [--top N]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+from dotenv import load_dotenv
+
+# Add project root to Python path
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(script_dir)
+sys.path.insert(0, project_root)
+
+load_dotenv(dotenv_path=os.path.join(project_root, 'backend', '.env'))
+
+from openai import OpenAI
+from backend.app.embeddings import EMBEDDING_MODEL, WARM_EMBEDDINGS_PATH, save_warm_embeddings
+from backend.app.query_utils import normalize_query
+
+DEFAULT_SEED_FILE = os.path.join(script_dir, 'seed_queries.txt')
+
+
+def read_queries(path: str):
+    """Yields raw queries from a plain-text list or a JSONL query log."""
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            if line.startswith('{'):
+                try:
+                    query = json.loads(line).get("query")
+                except json.JSONDecodeError:
+                    continue
+                if query:
+                    yield query
+            else:
+                yield line
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute embeddings for popular queries")
+    parser.add_argument("--seed", default=DEFAULT_SEED_FILE, help="seed query list (one per line)")
+    parser.add_argument("--log", action="append", default=[], help="query log file(s) to mine for frequent queries")
+    parser.add_argument("--top", type=int, default=500, help="number of queries to embed")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--output", default=WARM_EMBEDDINGS_PATH)
+    args = parser.parse_args()
+
+    counts = Counter()
+    for path in ([args.seed] if args.seed else []) + args.log:
+        if not os.path.exists(path):
+            print(f"⚠️  Skipping missing file: {path}")
+            continue
+        counts.update(normalize_query(q) for q in read_queries(path))
+    counts.pop("", None)
+
+    queries = [q for q, _ in counts.most_common(args.top)]
+    if not queries:
+        print("❌ No queries found")
+        sys.exit(1)
+
+    print(f"\n🔍 Embedding {len(queries)} queries with {EMBEDDING_MODEL}...")
+    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    start = time.time()
+    vectors = []
+    for i in range(0, len(queries), args.batch_size):
+        response = client.embeddings.create(model=EMBEDDING_MODEL, input=queries[i:i + args.batch_size])
+        vectors.extend(item.embedding for item in response.data)
+
+    save_warm_embeddings(args.output, queries, vectors, EMBEDDING_MODEL)
+    print(f"✅ Embedded {len(queries)} queries in {time.time() - start:.1f}s")
+    print(f"📂 Saved to: {args.output}")
+    print("\n🚀 Restart the backend to load the warm set\n")
+
+
+if __name__ == "__main__":
+    main()
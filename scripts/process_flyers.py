@@ -1,8 +1,11 @@
 import os
+import sys
+import argparse
 import base64
 import json
 import mimetypes
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from openai import OpenAI
 from dotenv import load_dotenv
@@ -10,12 +13,33 @@ from dotenv import load_dotenv
 # Load environment variables from the backend .env file
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '../backend/.env'))
 
+# Add project root to Python path (token/cost helpers are shared with the backend)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.app.usage import token_usage, estimate_cost, vision_image_tokens, UsageMeter
+from backend.app.local_search import file_sha256
+from backend.app.deal_model import coerce_deals, deals_to_dicts
+from extraction_budget import ExtractionBudget, ExtractionLedger, image_size
+from page_gate import PageGate
+from flyer_packing import PagePacker, ExtractionModeStats, PACK_MAX_IMAGES, past_deal_counts, split_usage
+from rasterize_pdf import FlyerPage, PdfRasterizer, pdf_page_count
+from deal_stream import (DealStreamParser, EXTRACTION_MAX_CONTINUATIONS, EXTRACTION_STRUCTURED_OUTPUT,
+                         continuation_prompt, deal_key, deal_list_response_format)
+
 # --- Configuration ---
 # Get project root (one level up from scripts/)
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 INPUT_FOLDER = os.path.join(PROJECT_ROOT, 'flyer-images')
 OUTPUT_FILE = os.path.join(os.path.dirname(__file__), 'deals.json')
+# Per-page validation results for OUTPUT_FILE (read by ingest_data.py)
+PAGE_MANIFEST_FILE = os.path.join(os.path.dirname(__file__), 'deals.pages.json')
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+EXTRACTION_MODEL = "gpt-4o"
+
+# Concurrency and spend limits (see extraction_budget.py)
+EXTRACTION_MAX_CONCURRENCY = int(os.getenv("EXTRACTION_MAX_CONCURRENCY", "4"))
+EXTRACTION_BUDGET_USD = float(os.getenv("EXTRACTION_BUDGET_USD")) if os.getenv("EXTRACTION_BUDGET_USD") else None
+EXTRACTION_TPM_LIMIT = int(os.getenv("EXTRACTION_TPM_LIMIT")) if os.getenv("EXTRACTION_TPM_LIMIT") else None
 
 if not OPENAI_API_KEY:
     raise EnvironmentError("OPENAI_API_KEY not found in backend/.env file")
@@ -133,36 +157,22 @@ CRITICAL RULES (Must Follow):
    - Each choice = One separate deal entry
 """
 
-def encode_image_to_base64(image_path):
-    """Encodes a local image file to a base64 string."""
-    mime_type, _ = mimetypes.guess_type(image_path)
+def image_file_page(filename):
+    """A flyer image from INPUT_FOLDER as a FlyerPage (read by the extraction worker)."""
+    mime_type, _ = mimetypes.guess_type(filename)
     if not mime_type or not mime_type.startswith('image'):
-        raise ValueError(f"File {image_path} is not a valid image.")
-        
-    with open(image_path, "rb") as image_file:
-        return base64.b64encode(image_file.read()).decode('utf-8')
+        raise ValueError(f"File {filename} is not a valid image.")
+    return FlyerPage(filename, os.path.join(INPUT_FOLDER, filename), mime_type)
 
-def call_gpt4o_vision_api(base64_image_data, mime_type, filename):
-    """
-    Calls the GPT-4o Vision API to extract deals from a single flyer image.
-    """
-    print(f"[API Call] Sending {filename} to GPT-4o Vision...")
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4o", # Use the powerful vision model
-            messages=[
-                {
-                    "role": "system",
-                    "content": EXTRACTION_SYSTEM_PROMPT
-                },
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": f"""Extract ALL deals from this flyer image.
-
-STORE NAME: {filename.split('_')[0].upper()}
+def store_from_filename(filename):
+    """Flyers are named <store>_<anything>.<ext>."""
+    return filename.split('_')[0].upper()
+
+def extraction_instructions(store):
+    """User-prompt text that accompanies the flyer image(s)."""
+    return f"""Extract ALL deals from this flyer image.
+
+STORE NAME: {store}
 Use this store name for all deals unless you see clear different branding in the image.
 
 📅 DATE HANDLING (CRITICAL):
@@ -179,37 +189,302 @@ Example: "Choose 30-pack OR 36-pack for $18.87" = TWO deals (one for 30-pack, on
 
 Your extraction count target: If you see 50 items, extract 50. If you see 100 items, extract 100.
 Do not stop early. Extract until every priced product is captured."""
-                        },
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:{mime_type};base64,{base64_image_data}"
-                            }
-                        }
-                    ]
-                }
-            ],
-            max_tokens=16384, # Increased from 4096 to allow comprehensive extraction
-            temperature=0.1 # Be precise, not creative
-        )
-        
-        json_response = response.choices[0].message.content
-        
-        # Clean the response to ensure it's valid JSON
-        # GPT can sometimes add ```json ... ```
-        if "```json" in json_response:
-            json_response = json_response.split("```json\n", 1)[1].rsplit("```", 1)[0]
-            
-        print(f"[API Call] Received response for {filename}.")
-        return json.loads(json_response) # Parse string to JSON list
+
+STRUCTURED_OUTPUT_NOTE = """
+
+Return the deals in the "deals" array of the response object (one object per deal, same fields)."""
+
+def add_usage(total, usage):
+    """Sums the token counts of several requests for one page (continuations)."""
+    if total is None:
+        return dict(usage)
+    for field in ("prompt_tokens", "completion_tokens", "cached_tokens"):
+        total[field] = total.get(field, 0) + usage.get(field, 0)
+    return total
+
+def stream_deals(content):
+    """
+    One streamed extraction request. Deals are parsed as they arrive, so a response
+    cut off at max_tokens still returns every complete deal.
+    Returns (deals, usage, truncated); deals is None if the response held no deal list.
+    """
+    with_image = sum(part["type"] == "image_url" for part in content) > 1
+    options = {}
+    if EXTRACTION_STRUCTURED_OUTPUT:
+        options["response_format"] = deal_list_response_format(with_image)
+        content = [{"type": "text", "text": content[0]["text"] + STRUCTURED_OUTPUT_NOTE}] + content[1:]
+    stream = client.chat.completions.create(
+        model=EXTRACTION_MODEL, # Use the powerful vision model
+        messages=[
+            {"role": "system", "content": EXTRACTION_SYSTEM_PROMPT},
+            {"role": "user", "content": content}
+        ],
+        max_tokens=16384, # Increased from 4096 to allow comprehensive extraction
+        temperature=0.1, # Be precise, not creative
+        stream=True,
+        stream_options={"include_usage": True},
+        **options
+    )
+    parser = DealStreamParser()
+    usage = None
+    finish_reason = None
+    for chunk in stream:
+        if getattr(chunk, "usage", None) is not None:
+            usage = token_usage(chunk)
+        for choice in chunk.choices:
+            if choice.delta is not None and choice.delta.content:
+                parser.feed(choice.delta.content)
+            if choice.finish_reason:
+                finish_reason = choice.finish_reason
+    if parser.malformed:
+        print(f"[Warning] {parser.malformed} deal object(s) in the response were not valid JSON and were skipped")
+    if not parser.found_list:
+        print(f"[Warning] Response contained no deal list (finish_reason={finish_reason})")
+        return None, usage or token_usage(None), False
+    # An unterminated list is incomplete whatever the finish reason says
+    return parser.deals, usage or token_usage(None), finish_reason == "length" or not parser.complete
+
+def extract_deals(content, label):
+    """
+    Streams the extraction for one request's images. When the output hits max_tokens,
+    the complete deals are kept and up to EXTRACTION_MAX_CONTINUATIONS follow-up
+    requests ask only for the deals not extracted yet.
+    Returns (deals, usage); usage covers every request and records how many were made.
+    deals is None if the first response held no deal list.
+    """
+    deals, usage, truncated = stream_deals(content)
+    usage = add_usage(None, usage)
+    if deals is None:
+        usage.update(requests=1, truncated=False)
+        return None, usage
+    seen = {deal_key(deal) for deal in deals}
+    requests = 1
+    while truncated and requests <= EXTRACTION_MAX_CONTINUATIONS:
+        print(f"[API Call] {label}: output cut off after {len(deals)} deals - requesting the rest "
+              f"({requests}/{EXTRACTION_MAX_CONTINUATIONS})")
+        more, more_usage, truncated = stream_deals(content + [{"type": "text", "text": continuation_prompt(deals)}])
+        usage = add_usage(usage, more_usage)
+        requests += 1
+        fresh = [deal for deal in more or [] if deal_key(deal) not in seen]
+        seen.update(deal_key(deal) for deal in fresh)
+        deals.extend(fresh)
+        if not fresh:
+            break
+    if truncated:
+        print(f"[Warning] {label}: still cut off after {requests} request(s) - keeping {len(deals)} complete deals")
+    usage["requests"] = requests
+    usage["truncated"] = truncated
+    return deals, usage
+
+def call_gpt4o_vision_api(base64_image_data, mime_type, filename):
+    """
+    Calls the GPT-4o Vision API to extract deals from a single flyer image.
+    Returns (deals_list, usage); deals_list is None on failure, usage is None if no response arrived.
+    """
+    print(f"[API Call] Sending {filename} to GPT-4o Vision...")
+    content = [
+        {
+            "type": "text",
+            "text": extraction_instructions(store_from_filename(filename))
+        },
+        {
+            "type": "image_url",
+            "image_url": {
+                "url": f"data:{mime_type};base64,{base64_image_data}"
+            }
+        }
+    ]
+    try:
+        deals, usage = extract_deals(content, filename)
     except Exception as e:
         print(f"[Error] API call failed for {filename}: {e}")
+        return None, None
+    print(f"[API Call] Received response for {filename}.")
+    return deals, usage
+
+BATCH_ATTRIBUTION_PROMPT = """You are given {count} flyer images from the same store. Each image is preceded by a
+label "IMAGE <n>". Extract the deals from EVERY image and add one extra integer field to each deal object:
+
+  "image": <n>  (the number of the image the deal appears on)
+
+Return ONE JSON list containing the deals of all images.
+
+"""
+
+def call_gpt4o_vision_api_batch(images, store):
+    """
+    Extracts several flyer images of one store in a single Vision call (the prompt is sent once).
+    images: [(filename, mime_type, base64_data)]. Returns (deals per image, usage); deals per
+    image is None if the response could not be parsed or attributed.
+    """
+    names = ", ".join(name for name, _, _ in images)
+    print(f"[API Call] Sending {len(images)} images to GPT-4o Vision in one request: {names}")
+    content = [{"type": "text", "text": BATCH_ATTRIBUTION_PROMPT.format(count=len(images))
+                + extraction_instructions(store)}]
+    for number, (name, mime_type, base64_image_data) in enumerate(images, 1):
+        content.append({"type": "text", "text": f"IMAGE {number}"})
+        content.append({"type": "image_url", "image_url": {"url": f"data:{mime_type};base64,{base64_image_data}"}})
+
+    try:
+        deals, usage = extract_deals(content, names)
+    except Exception as e:
+        print(f"[Error] Batched API call failed for {names}: {e}")
+        return None, None
+    if deals is None:
+        return None, usage
+
+    per_image = [[] for _ in images]
+    unattributed = 0
+    for deal in deals:
+        number = deal.pop("image", None) if isinstance(deal, dict) else None
+        if isinstance(number, int) and 1 <= number <= len(images):
+            per_image[number - 1].append(deal)
+        else:
+            unattributed += 1
+    if unattributed:
+        print(f"[Warning] {unattributed} deal(s) in the batched response named no valid image and were dropped")
+        if unattributed == len(deals):
+            return None, usage
+    print(f"[API Call] Received response for {names}.")
+    return per_image, usage
+
+def page_deals(deals_list, filename):
+    """
+    Normalizes a page's deals through the shared Deal model (prices, dates, lists) and
+    tags them with their page, so ingestion can replace exactly this page's deals later.
+    """
+    deals = coerce_deals(deals_list)
+    for deal in deals:
+        deal.source_image = filename
+    return deals_to_dicts(deals)
+
+def process_image_group(pages, index, total_images, budget, ledger, meter, gate, mode_stats):
+    """
+    Extracts a group of low-density pages of one store with a single Vision call and
+    gates each page on its own. Falls back to one call per page if the batched
+    response can't be attributed. Returns the gated deals of each page.
+    """
+    if len(pages) == 1:
+        return [process_image(pages[0], index, total_images, budget, ledger, meter, gate, mode_stats)]
+    names = [page.name for page in pages]
+    if not budget.acquire():
+        print(f"    ⏭️  [{index}-{index + len(pages) - 1}/{total_images}] Skipping {', '.join(names)}: "
+              "extraction budget exhausted")
+        return [None] * len(pages)
+
+    try:
+        group_start = time.time()
+        print(f"\n[{index}-{index + len(pages) - 1}/{total_images}] 📦 Processing {len(pages)} pages together: "
+              f"{', '.join(names)}")
+        images, image_tokens = [], []
+        for page in pages:
+            image_data = page.read()
+            size = image_size(image_data)
+            image_tokens.append(vision_image_tokens(*size) if size else 0)
+            images.append((page.name, page.mime_type, base64.b64encode(image_data).decode('utf-8')))
+
+        store = store_from_filename(pages[0].name)
+        per_image, usage = call_gpt4o_vision_api_batch(images, store)
+        group_time = time.time() - group_start
+
+        if usage is not None:
+            # Continuations resend the images
+            image_tokens = [tokens * usage["requests"] for tokens in image_tokens]
+            usage["image_tokens"] = sum(image_tokens)
+            cost = meter.record(store, EXTRACTION_MODEL, usage, group_time * 1000)
+            budget.record(usage["prompt_tokens"] + usage["completion_tokens"], cost)
+            deal_counts = [len(deals) for deals in per_image] if per_image else [0] * len(pages)
+            shares = split_usage(usage, image_tokens, deal_counts, group_time * 1000)
+            for page, deals_count, (share, latency_ms) in zip(pages, deal_counts, shares):
+                ledger.record({"flyer": page.name, "store": store, "model": EXTRACTION_MODEL, **share,
+                               "cost_usd": round(estimate_cost(EXTRACTION_MODEL, share), 6),
+                               "latency_ms": round(latency_ms, 1), "deals": deals_count,
+                               "mode": "packed", "batch": names[0], "requests": usage["requests"],
+                               "truncated": usage["truncated"]})
+            mode_stats.record("packed", len(pages), sum(deal_counts),
+                              usage["prompt_tokens"] + usage["completion_tokens"], group_time)
+    except Exception as e:
+        print(f"    ❌ [Error] Failed to process {', '.join(names)}: {e}")
+        return [None] * len(pages)
+    finally:
+        budget.release()
+
+    if per_image is None:
+        print(f"    ↩️  Batched response unusable - extracting {len(pages)} pages one by one")
+        return [process_image(page, index + i, total_images, budget, ledger, meter, gate, mode_stats)
+                for i, page in enumerate(pages)]
+
+    results = []
+    for page, deals_list in zip(pages, per_image):
+        deals_list = page_deals(deals_list, page.name)
+        print(f"    ✅ Extracted {len(deals_list)} deals from {page.name} (batched, {group_time:.1f}s for the group)")
+        results.append(gate.check(page.source, deals_list))
+    return results
+
+def process_image(page, index, total_images, budget, ledger, meter, gate, mode_stats=None):
+    """
+    Extracts one flyer page under the budget governor, records its token usage and
+    validates the page right away. Returns the deals that passed the gate.
+    """
+    filename = page.name
+    if not budget.acquire():
+        print(f"    ⏭️  [{index}/{total_images}] Skipping {filename}: extraction budget exhausted")
+        return None
+
+    try:
+        image_start = time.time()
+        print(f"\n[{index}/{total_images}] 📄 Processing: {filename}")
+
+        # Image files are read here; rendered PDF pages are already in memory
+        image_data = page.read()
+        base64_image = base64.b64encode(image_data).decode('utf-8')
+        size = image_size(image_data)
+
+        print(f"    ⏳ Sending to GPT-4o Vision API...")
+        # Call the AI to get the deals for this one flyer
+        deals_list, usage = call_gpt4o_vision_api(base64_image, page.mime_type, filename)
+
+        image_time = time.time() - image_start
+
+        if usage is not None:
+            # Continuations resend the image
+            usage["image_tokens"] = (vision_image_tokens(*size) if size else 0) * usage["requests"]
+            store = store_from_filename(filename)
+            cost = meter.record(store, EXTRACTION_MODEL, usage, image_time * 1000)
+            budget.record(usage["prompt_tokens"] + usage["completion_tokens"], cost)
+            ledger.record({"flyer": filename, "store": store, "model": EXTRACTION_MODEL, **usage,
+                           "cost_usd": round(cost, 6), "latency_ms": round(image_time * 1000, 1),
+                           "deals": len(deals_list) if deals_list else 0, "mode": "single"})
+            if mode_stats is not None:
+                mode_stats.record("single", 1, len(deals_list) if deals_list else 0,
+                                  usage["prompt_tokens"] + usage["completion_tokens"], image_time)
+
+        if deals_list:
+            deals_list = page_deals(deals_list, filename)
+            print(f"    ✅ Extracted {len(deals_list)} deals from {filename} ({image_time:.1f}s)")
+        else:
+            print(f"    ⚠️  No deals found or error in {filename} ({image_time:.1f}s)")
+        # Failing pages go to the retry queue; passing pages are kept (and streamed if ingesting)
+        return gate.check(page.source, deals_list)
+
+    except Exception as e:
+        print(f"    ❌ [Error] Failed to process {filename}: {e}")
         return None
+    finally:
+        budget.release()
 
 def main():
     """
     Main script to process all flyers and generate the deals.json file.
     """
+    parser = argparse.ArgumentParser(description="Extract deals from flyer images with GPT-4o Vision")
+    parser.add_argument("--ingest", action="store_true",
+                        help="stream pages that pass validation into Weaviate while extraction runs")
+    parser.add_argument("--pack", action="store_true",
+                        help="extract several low-density pages of the same store per Vision call")
+    parser.add_argument("pdf", nargs="*", help="PDF flyers to extract (PDFs in flyer-images/ are included too)")
+    args = parser.parse_args()
+
     start_time = time.time()
     print("\n" + "="*60)
     print("    DealZen Flyer Processing Script")
@@ -224,48 +499,66 @@ def main():
     # Get all image files
     image_files = [f for f in os.listdir(INPUT_FOLDER) 
                    if f.lower().endswith(('.png', '.jpg', '.jpeg', '.webp'))]
+    pdf_files = args.pdf + [os.path.join(INPUT_FOLDER, f) for f in sorted(os.listdir(INPUT_FOLDER))
+                            if f.lower().endswith('.pdf')]
     
-    if not image_files:
-        print(f"❌ No image files found in {INPUT_FOLDER}")
+    if not image_files and not pdf_files:
+        print(f"❌ No image or PDF files found in {INPUT_FOLDER}")
         return
-    
-    total_images = len(image_files)
-    print(f"📸 Found {total_images} image(s) to process")
-    print(f"⏱️  Estimated time: {total_images * 25} seconds (~{total_images * 25 / 60:.1f} minutes)\n")
-    
-    all_deals = []
-    
-    # Loop through all files in the input folder
-    for index, filename in enumerate(image_files, 1):
-        image_path = os.path.join(INPUT_FOLDER, filename)
-        
-        try:
-            image_start = time.time()
-            print(f"\n[{index}/{total_images}] 📄 Processing: {filename}")
-            
-            mime_type, _ = mimetypes.guess_type(image_path)
-            base64_image = encode_image_to_base64(image_path)
-            
-            print(f"    ⏳ Sending to GPT-4o Vision API...")
-            # Call the AI to get the deals for this one flyer
-            deals_list = call_gpt4o_vision_api(base64_image, mime_type, filename)
-            
-            image_time = time.time() - image_start
-            
-            if deals_list:
-                print(f"    ✅ Extracted {len(deals_list)} deals from {filename} ({image_time:.1f}s)")
-                # Add all deals from this flyer to our main list
-                all_deals.extend(deals_list)
-            else:
-                print(f"    ⚠️  No deals found or error in {filename} ({image_time:.1f}s)")
-                
-        except Exception as e:
-            print(f"    ❌ [Error] Failed to process {filename}: {e}")
-        
-        # Show progress
-        remaining = total_images - index
-        if remaining > 0:
-            print(f"    📊 Progress: {index}/{total_images} complete, {remaining} remaining")
+
+    # PDF pages are rendered in a process pool and handed to extraction one by one
+    rasterizer = PdfRasterizer() if pdf_files else None
+    pdf_pages = sum(pdf_page_count(path) for path in pdf_files)
+    total_images = len(image_files) + pdf_pages
+    print(f"📸 Found {total_images} image(s) to process"
+          + (f" ({pdf_pages} page(s) from {len(pdf_files)} PDF(s))" if pdf_files else ""))
+    print(f"⚙️  Up to {EXTRACTION_MAX_CONCURRENCY} concurrent Vision calls"
+          + (f", budget ${EXTRACTION_BUDGET_USD:.2f}" if EXTRACTION_BUDGET_USD else "")
+          + (f", {EXTRACTION_TPM_LIMIT} tokens/min" if EXTRACTION_TPM_LIMIT else ""))
+    estimate = total_images * 25 / EXTRACTION_MAX_CONCURRENCY
+    print(f"⏱️  Estimated time: {estimate:.0f} seconds (~{estimate / 60:.1f} minutes)\n")
+
+    budget = ExtractionBudget(EXTRACTION_MAX_CONCURRENCY, EXTRACTION_BUDGET_USD, EXTRACTION_TPM_LIMIT)
+    ledger = ExtractionLedger()
+    meter = UsageMeter()
+
+    ingester = None
+    if args.ingest:
+        from ingest_data import StreamingIngester
+        ingester = StreamingIngester()
+        ingester.start()
+    gate = PageGate(ingester=ingester)
+
+    mode_stats = ExtractionModeStats()
+    # Without --pack every page is a group of one (one Vision call per page)
+    packer = PagePacker(store_from_filename, past_deal_counts(ledger.path) if args.pack else {},
+                        max_images=PACK_MAX_IMAGES if args.pack else 1)
+
+    # The budget governor decides how many of these workers may call the API at once
+    with ThreadPoolExecutor(max_workers=EXTRACTION_MAX_CONCURRENCY) as executor:
+        futures = []
+        submitted = 0
+
+        def submit(groups):
+            nonlocal submitted
+            for group in groups:
+                futures.append(executor.submit(process_image_group, group, submitted + 1, total_images,
+                                               budget, ledger, meter, gate, mode_stats))
+                submitted += len(group)
+
+        for filename in image_files:
+            submit(packer.add(image_file_page(filename)))
+        if rasterizer is not None:
+            # Each page is queued as soon as it renders, so page 1 is extracted while the rest render
+            with rasterizer:
+                for pdf_path in pdf_files:
+                    for page in rasterizer.pages(pdf_path):
+                        submit(packer.add(page))
+        submit(packer.flush())
+        results = [deals_list for future in futures for deals_list in future.result()]
+
+    # Keep deals in submission order regardless of completion order
+    all_deals = [deal for deals_list in results if deals_list for deal in deals_list]
 
     # Write all collected deals to the final JSON file
     total_time = time.time() - start_time
@@ -277,14 +570,36 @@ def main():
     try:
         with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
             json.dump(all_deals, f, indent=2, ensure_ascii=False)
+        gate.write_manifest(PAGE_MANIFEST_FILE, file_sha256(OUTPUT_FILE))
         
+        pages = gate.summary()
         print(f"✅ Success! Extracted {len(all_deals)} total deals from {total_images} images")
+        print(f"🎯 Pages: {pages['ACCEPT']} accepted, {pages['RETRY']} borderline, "
+              f"{pages['REJECT']} rejected (rejected and borderline pages are in logs/retry_queue.json)")
         print(f"📂 Saved to: {OUTPUT_FILE}")
         print(f"⏱️  Total time: {total_time:.1f} seconds ({total_time/60:.1f} minutes)")
         print(f"📊 Average: {total_time/total_images:.1f} seconds per image")
-        print(f"\n🚀 Next step: Load into Weaviate with 'uv run python scripts/ingest_data.py'")
+        print(f"💰 Tokens: {budget.total_tokens} (≈ ${budget.spent_usd:.2f})")
+        for store, totals in sorted(meter.snapshot().items()):
+            print(f"   {store}: {totals['calls']} calls, {totals['prompt_tokens']} prompt / "
+                  f"{totals['completion_tokens']} completion tokens, ${totals['cost_usd']:.2f}")
+        for mode, stats in sorted(mode_stats.report().items()):
+            print(f"   {mode}: {stats['calls']} calls for {stats['pages']} pages, {stats['deals']} deals, "
+                  f"{stats['tokens_per_deal']} tokens/deal, {stats['seconds_per_deal']} s/deal")
+        if budget.exhausted:
+            print(f"🛑 Budget exhausted - some images were skipped (see alarms above)")
+        if ingester is None:
+            print(f"\n🚀 Next step: Load into Weaviate with 'uv run python scripts/ingest_data.py'")
     except Exception as e:
         print(f"❌ [Error] Failed to write output file: {e}")
+
+    if ingester is not None:
+        from ingest_data import finalize_ingestion
+        ingester.close()
+        print(f"📥 Streamed {ingester.ingested} deals from {ingester.pages} pages into Weaviate"
+              + (f" ({ingester.failed} failed)" if ingester.failed else ""))
+        corpus_version = finalize_ingestion(all_deals, OUTPUT_FILE)
+        print(f"🔖 Corpus version: {corpus_version}")
     
     print("="*60 + "\n")
 
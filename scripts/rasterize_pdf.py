@@ -0,0 +1,161 @@
+"""
+DealZen PDF Rasterizer
+Turns PDF flyers into page images in-process (PyMuPDF), replacing the
+ImageMagick step in convert_pdf.sh.
+
+- Pages render in a process pool, so a 40-page flyer uses every core.
+- Pages are yielded in order as soon as each one is ready: process_flyers.py
+  starts extracting page 1 while later pages are still rendering.
+- By default each page is rendered at the resolution GPT-4o Vision actually
+  uses (short side 768px, long side at most 2048px). Anything larger is
+  downscaled by the API anyway, so 300 DPI renders only cost time and upload size.
+
+Usage (write pages to flyer-images/ like convert_pdf.sh did):
+    python scripts/rasterize_pdf.py path/to/flyer.pdf [--dpi 150] [--out flyer-images]
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# Resolution (DPI) for every page; unset = fit each page to the Vision input size
+PDF_RASTER_DPI = int(os.getenv("PDF_RASTER_DPI")) if os.getenv("PDF_RASTER_DPI") else None
+PDF_RASTER_FORMAT = os.getenv("PDF_RASTER_FORMAT", "png")  # png | jpeg
+PDF_RASTER_WORKERS = int(os.getenv("PDF_RASTER_WORKERS", str(os.cpu_count() or 2)))
+
+# GPT-4o high detail: fit within 2048x2048, then scale the short side down to 768
+VISION_MAX_LONG_SIDE = 2048
+VISION_SHORT_SIDE = 768
+
+MIME_TYPES = {"png": "image/png", "jpeg": "image/jpeg"}
+
+
+class FlyerPage:
+    """One page to extract: an image file on disk, or an in-memory rendered PDF page."""
+
+    def __init__(self, name, source, mime_type, data=None):
+        self.name = name          # flyer file name (the store is its prefix)
+        self.source = source      # path recorded in the retry queue ("flyer.pdf#page=3" for PDF pages)
+        self.mime_type = mime_type
+        self.data = data
+
+    def read(self):
+        if self.data is not None:
+            return self.data
+        with open(self.source, 'rb') as f:
+            return f.read()
+
+
+def _import_fitz():
+    try:
+        import pymupdf as fitz
+    except ImportError:
+        try:
+            import fitz  # PyMuPDF < 1.24.3
+        except ImportError:
+            raise ImportError("PDF flyers need PyMuPDF: pip install pymupdf") from None
+    return fitz
+
+
+def vision_zoom(width_pt, height_pt, dpi=None):
+    """Render scale for a page of the given size in points (72 per inch)."""
+    if dpi:
+        return dpi / 72
+    return min(VISION_SHORT_SIDE / min(width_pt, height_pt), VISION_MAX_LONG_SIDE / max(width_pt, height_pt))
+
+
+# Each pool process keeps the PDFs it has opened, so pages don't re-parse the file
+_open_documents = {}
+
+
+def rasterize_page(pdf_path, page_number, dpi=None, image_format=PDF_RASTER_FORMAT):
+    """Renders one page (0-based) and returns the encoded image bytes. Runs in a pool process."""
+    fitz = _import_fitz()
+    document = _open_documents.get(pdf_path)
+    if document is None:
+        document = _open_documents[pdf_path] = fitz.open(pdf_path)
+    page = document[page_number]
+    zoom = vision_zoom(page.rect.width, page.rect.height, dpi)
+    pixmap = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+    if image_format == "jpeg":
+        return pixmap.tobytes("jpeg", jpg_quality=90)
+    return pixmap.tobytes("png")
+
+
+def pdf_page_count(pdf_path):
+    fitz = _import_fitz()
+    with fitz.open(pdf_path) as document:
+        return document.page_count
+
+
+class PdfRasterizer:
+    """Process pool that streams rendered PDF pages as FlyerPage objects."""
+
+    def __init__(self, workers=PDF_RASTER_WORKERS, dpi=PDF_RASTER_DPI, image_format=PDF_RASTER_FORMAT):
+        if image_format not in MIME_TYPES:
+            raise ValueError(f"PDF_RASTER_FORMAT must be one of {', '.join(MIME_TYPES)}")
+        _import_fitz()
+        self.dpi = dpi
+        self.image_format = image_format
+        self.pool = ProcessPoolExecutor(max_workers=max(1, workers))
+
+    def pages(self, pdf_path):
+        """Yields the PDF's pages in order, each as soon as it has rendered."""
+        base_name = os.path.splitext(os.path.basename(pdf_path))[0]
+        extension = "jpg" if self.image_format == "jpeg" else "png"
+        # Queue every page up front; the pool renders ahead while the caller consumes
+        futures = [self.pool.submit(rasterize_page, pdf_path, number, self.dpi, self.image_format)
+                   for number in range(pdf_page_count(pdf_path))]
+        try:
+            for number, future in enumerate(futures, 1):
+                yield FlyerPage(f"{base_name}_page_{number:02d}.{extension}", f"{pdf_path}#page={number}",
+                                MIME_TYPES[self.image_format], future.result())
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render PDF flyer pages to images for extraction")
+    parser.add_argument("pdf", nargs="+", help="PDF flyer(s)")
+    parser.add_argument("--out", default=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                                     'flyer-images'), help="output folder")
+    parser.add_argument("--dpi", type=int, default=PDF_RASTER_DPI,
+                        help="fixed resolution (default: fit pages to the Vision input size)")
+    parser.add_argument("--format", default=PDF_RASTER_FORMAT, choices=list(MIME_TYPES))
+    parser.add_argument("--workers", type=int, default=PDF_RASTER_WORKERS)
+    args = parser.parse_args()
+
+    for pdf_path in args.pdf:
+        if not os.path.isfile(pdf_path):
+            print(f"❌ File not found: {pdf_path}")
+            sys.exit(1)
+
+    os.makedirs(args.out, exist_ok=True)
+    start = time.time()
+    count = 0
+    with PdfRasterizer(args.workers, args.dpi, args.format) as rasterizer:
+        for pdf_path in args.pdf:
+            print(f"📄 Rendering {pdf_path}...")
+            for page in rasterizer.pages(pdf_path):
+                with open(os.path.join(args.out, page.name), 'wb') as f:
+                    f.write(page.data)
+                count += 1
+                print(f"   🖼️  {page.name} ({len(page.data) / 1024:.0f} KB)")
+
+    print(f"\n✅ Rendered {count} page(s) into {args.out}/ in {time.time() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+DealZen Relevance Parser Regression Suite
+Compares the structured (JSON schema) relevance output with the legacy
+RELEVANT_DEALS text parser.
+
+Offline (default): replays recorded response pairs through both parsers and
+checks they select the same deals and agree on "no match".
+
+Live (--live): runs each query through Weaviate + GPT-4o in both modes and
+reports how much the selected deal sets overlap.
+
+Usage:
+    python scripts/relevance_regression.py
+    python scripts/relevance_regression.py --live
+"""
+
+import asyncio
+import os
+import sys
+
+# Add project root to Python path
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(script_dir)
+sys.path.insert(0, project_root)
+
+from backend.app.structured_output import (
+    parse_structured_response, parse_legacy_response, partial_answer
+)
+
+# Recorded response pairs for the same question: (legacy text, structured JSON, num_deals)
+RECORDED_CASES = [
+    (
+        "Here are two great drill kits: the RYOBI kit for $199 and the DEWALT kit for $169.\nRELEVANT_DEALS: 1, 3",
+        '{"no_match": false, "relevant_deal_ids": ["D1", "D3"], "answer": "Here are two great drill kits: the RYOBI kit for $199 and the DEWALT kit for $169."}',
+        20,
+    ),
+    (
+        "I'm sorry, I couldn't find any deals for that.\nRELEVANT_DEALS:",
+        '{"no_match": true, "relevant_deal_ids": [], "answer": "I\'m sorry, I couldn\'t find any deals for that."}',
+        20,
+    ),
+    (
+        "The cheapest TV is the 43\" Roku TV at $98.\nRELEVANT_DEALS: 4, 2, 9",
+        '{"no_match": false, "relevant_deal_ids": ["D2", "D4", "D9"], "answer": "The cheapest TV is the 43\\" Roku TV at $98."}',
+        10,
+    ),
+    (
+        "Only one deal fits: Ring 2 pc. Starter Set for $69.99.\nRELEVANT_DEALS: 3, 25",
+        '{"no_match": false, "relevant_deal_ids": ["D3", "D25"], "answer": "Only one deal fits: Ring 2 pc. Starter Set for $69.99."}',
+        20,
+    ),
+]
+
+# Truncated structured payloads (e.g. an interrupted stream) and what must still be recovered
+TRUNCATED_CASES = [
+    ('{"no_match": false, "relevant_deal_ids": ["D1", "D7"], "answer": "Two deals match: the RYO', [0, 6], "Two deals match: the RYO"),
+    ('{"no_match": false, "relevant_deal_ids": ["D2", "D5"', [1, 4], ""),
+    ('{"no_match": false, "relevant_deal_ids": ["D2"], "answer": "Line one\\nLine \\u00', [1], "Line one\nLine"),
+]
+
+LIVE_QUERIES = [
+    "Show me all TV deals",
+    "What's under $100?",
+    "RYOBI combo kit",
+    "Best Buy electronics",
+    "Any deals on smart home security?",
+    "Do you have deals on cars?",
+]
+
+
+def run_offline():
+    failures = 0
+    print("\n🔍 Recorded response pairs")
+    for legacy_text, structured_text, num_deals in RECORDED_CASES:
+        legacy_answer, legacy_indices, legacy_no_match = parse_legacy_response(legacy_text, num_deals)
+        answer, indices, no_match = parse_structured_response(structured_text, num_deals)
+
+        # The legacy parser keeps out-of-range and duplicate numbers; the pipeline drops them later
+        legacy_selected = sorted({i for i in legacy_indices if i < num_deals})
+        ok = legacy_selected == indices and legacy_no_match == no_match and legacy_answer == answer
+        failures += not ok
+        print(f"   {'✅' if ok else '❌'} legacy={legacy_selected} structured={indices} no_match={no_match}")
+
+    print("\n🔍 Truncated structured payloads")
+    for text, expected_indices, expected_answer in TRUNCATED_CASES:
+        answer, indices, _ = parse_structured_response(text, 20)
+        ok = indices == expected_indices and answer == expected_answer and partial_answer(text).strip() == expected_answer
+        failures += not ok
+        print(f"   {'✅' if ok else '❌'} indices={indices} answer={answer!r}")
+
+    return failures
+
+
+async def run_live():
+    from dotenv import load_dotenv
+    load_dotenv(dotenv_path=os.path.join(project_root, 'backend', '.env'))
+    from backend.app.rag_pipeline import RAGPipeline
+
+    pipeline = RAGPipeline()
+    overlaps = []
+    print("\n🔍 Live comparison (structured vs legacy)")
+    for query in LIVE_QUERIES:
+        results = await pipeline.search_fn(pipeline.search_client, query)
+        if not results:
+            print(f"   ⚠️  {query!r}: no search results")
+            continue
+
+        selections = {}
+        for mode in ("legacy", "structured"):
+            pipeline.relevance_mode = mode
+            context = pipeline.format_context(results)
+            _, indices, no_match, _ = pipeline.generate_answer_with_relevance(context, query, len(results))
+            selections[mode] = (set() if no_match else set(indices), no_match)
+
+        legacy, structured = selections["legacy"][0], selections["structured"][0]
+        union = legacy | structured
+        jaccard = len(legacy & structured) / len(union) if union else 1.0
+        overlaps.append(jaccard)
+        print(f"   {query!r}: legacy={sorted(legacy)} structured={sorted(structured)} overlap={jaccard:.2f}")
+
+    pipeline.search_client.close()
+    if overlaps:
+        print(f"\n📊 Mean deal-set overlap: {sum(overlaps) / len(overlaps):.2f}")
+
+
+def main():
+    print("\n" + "="*70)
+    print("🎯 RELEVANCE PARSER REGRESSION SUITE")
+    print("="*70)
+
+    failures = run_offline()
+    if "--live" in sys.argv:
+        asyncio.run(run_live())
+
+    print("\n" + "="*70)
+    if failures:
+        print(f"❌ {failures} regression(s) found")
+    else:
+        print("✅ Structured parser matches the legacy parser on all recorded cases")
+    print("="*70 + "\n")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""
+DealZen Query Log Replay
+Re-runs captured /chat traffic (backend/data/query_logs/*.jsonl) against the
+backend pipeline with stubbed providers, for load tests and cache studies.
+
+- Search runs on the in-process local index (keyword only, no expiry filter),
+  plus the search latency recorded for each sub-query.
+- The OpenAI chat call is replaced by a stub that sleeps for the recorded
+  generation time and reports the recorded token counts.
+- Arrival times follow the log; --speed 10 replays ten times faster,
+  --speed 0 sends everything at once.
+
+Nothing is sent to OpenAI or Weaviate. The report covers latency percentiles,
+response modes (cached / coalesced / follow-up...), admission rejections and
+tokens that would have been spent.
+
+Usage:
+    python scripts/replay_queries.py [--log FILE ...] [--speed 10] [--cache-backend memory] [--admission]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+import types
+from collections import Counter, defaultdict
+from dotenv import load_dotenv
+
+# Add project root to Python path
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(script_dir)
+sys.path.insert(0, project_root)
+
+load_dotenv(dotenv_path=os.path.join(project_root, 'backend', '.env'))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Replay captured queries against stubbed providers")
+    parser.add_argument("--log", action="append", default=[], help="query log file(s) (default: all captured logs)")
+    parser.add_argument("--speed", type=float, default=1.0, help="arrival speed multiplier (0 = all at once)")
+    parser.add_argument("--limit", type=int, default=None, help="replay only the first N queries")
+    parser.add_argument("--cache-backend", default="memory", choices=["memory", "sqlite", "none"],
+                        help="answer/retrieval cache to simulate")
+    parser.add_argument("--admission", action="store_true", help="pass requests through admission control")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="multiplier for recorded provider latency")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    return parser.parse_args()
+
+
+args = parse_args()
+
+# Replay must never touch real providers or pollute the captured log
+os.environ["SEARCH_BACKEND"] = "local"
+os.environ["QUERY_EMBEDDING"] = "weaviate"
+os.environ["QUERY_LOG_ENABLED"] = "0"
+os.environ["RELEVANCE_OUTPUT_MODE"] = "structured"
+os.environ["CACHE_BACKEND"] = args.cache_backend
+os.environ.setdefault("OPENAI_API_KEY", "replay-stub")
+
+from backend.app.rag_pipeline import RAGPipeline
+from backend.app.admission import AdmissionController, AdmissionRejected
+from backend.app.query_log import query_log_files, read_query_log
+from backend.app.query_utils import normalize_query
+from backend.app.search_params import search_params_for
+
+
+class RecordedProfile:
+    """Recorded latencies and token counts, looked up by normalized query."""
+
+    def __init__(self, records: list[dict]):
+        self.search_ms = {}
+        self.generation = {}
+        search_samples, generation_samples = [], []
+        for record in records:
+            timings = record.get("timings") or {}
+            for sub in timings.get("subqueries", []):
+                self.search_ms[normalize_query(sub["query"])] = sub["ms"]
+                search_samples.append(sub["ms"])
+            if record.get("tokens") and "generation_ms" in timings:
+                self.generation[record["normalized"]] = (timings["generation_ms"], record["tokens"],
+                                                         len(record.get("selected", [])))
+                generation_samples.append(timings["generation_ms"])
+        # Queries first seen as cache hits have no recording of their own
+        self.default_search_ms = statistics.median(search_samples) if search_samples else 50.0
+        self.default_generation_ms = statistics.median(generation_samples) if generation_samples else 2000.0
+
+    def search_latency_s(self, query: str):
+        return self.search_ms.get(normalize_query(query), self.default_search_ms) / 1000
+
+    def generation_for(self, query: str):
+        return self.generation.get(normalize_query(query), (self.default_generation_ms, None, 2))
+
+
+class StubChatClient:
+    """Stands in for OpenAI chat completions: recorded latency, recorded tokens, fixed selection."""
+
+    def __init__(self, profile: RecordedProfile, latency_scale: float):
+        self.profile = profile
+        self.latency_scale = latency_scale
+        self.calls = 0
+        self.tokens = Counter()
+        self.chat = types.SimpleNamespace(completions=self)
+
+    def create(self, model, messages, **kwargs):
+        self.calls += 1
+        query = messages[-1]["content"]
+        generation_ms, tokens, selected = self.profile.generation_for(query)
+        time.sleep(generation_ms / 1000 * self.latency_scale)
+
+        num_deals = messages[0]["content"].count("--- Deal D")
+        ids = [f"D{i + 1}" for i in range(min(max(selected, 1), num_deals))]
+        content = json.dumps({"no_match": not ids, "relevant_deal_ids": ids, "answer": "Replayed answer."})
+        tokens = tokens or {"prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0}
+        self.tokens.update(tokens)
+        usage = types.SimpleNamespace(prompt_tokens=tokens["prompt_tokens"],
+                                      completion_tokens=tokens["completion_tokens"],
+                                      prompt_tokens_details=types.SimpleNamespace(cached_tokens=tokens["cached_tokens"]))
+        message = types.SimpleNamespace(content=content)
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)], usage=usage, model=model)
+
+
+def percentile(values: list[float], pct: float):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def replay(records: list[dict], pipeline: RAGPipeline, admission):
+    latencies = []
+    outcomes = Counter()
+    sessions = {}  # logged session id -> replay session id
+    first_ts = records[0].get("ts", 0)
+    started = time.perf_counter()
+
+    async def send(record):
+        if args.speed > 0:
+            offset = (record.get("ts", first_ts) - first_ts) / args.speed
+            await asyncio.sleep(max(0.0, offset - (time.perf_counter() - started)))
+        logged_session = record.get("session_id")
+        request_start = time.perf_counter()
+        try:
+            if admission is not None:
+                async with admission.admit(logged_session or "replay"):
+                    response = await pipeline.answer_query(record["query"], sessions.get(logged_session))
+            else:
+                response = await pipeline.answer_query(record["query"], sessions.get(logged_session))
+        except AdmissionRejected as e:
+            outcomes[f"rejected_{e.status_code}"] += 1
+            return
+        except Exception as e:
+            outcomes[f"error_{type(e).__name__}"] += 1
+            return
+        latencies.append((time.perf_counter() - request_start) * 1000)
+        outcomes[response["mode"]] += 1
+        if logged_session:
+            sessions.setdefault(logged_session, response["session_id"])
+
+    # Turns of one conversation stay in order; conversations run concurrently
+    by_session = defaultdict(list)
+    for i, record in enumerate(records):
+        by_session[record.get("session_id") or f"anonymous-{i}"].append(record)
+
+    async def run_session(session_records):
+        for record in session_records:
+            await send(record)
+
+    await asyncio.gather(*(run_session(r) for r in by_session.values()))
+    return latencies, outcomes, time.perf_counter() - started
+
+
+def main():
+    paths = args.log or query_log_files()
+    records = [r for r in read_query_log(paths) if r.get("query")]
+    records.sort(key=lambda r: r.get("ts", 0))
+    if args.limit:
+        records = records[:args.limit]
+    if not records:
+        print("❌ No captured queries found (is QUERY_LOG_ENABLED on in the backend?)")
+        sys.exit(1)
+
+    profile = RecordedProfile(records)
+    pipeline = RAGPipeline()
+    # Keyword-only local search: no embedding calls during replay
+    pipeline.search_client.embed_fn = None
+    stub = StubChatClient(profile, args.latency_scale)
+    pipeline.openai_client = stub
+
+    async def stub_search(client, query):
+        await asyncio.sleep(profile.search_latency_s(query) * args.latency_scale)
+        # Deals in the log were live when captured, so don't drop them as expired now
+        params = search_params_for(query)
+        return await asyncio.to_thread(client.hybrid_search, query, params["alpha"], params["limit"],
+                                       apply_date_filter=False, weights={"vector_text": params["vector_text_boost"]})
+
+    pipeline.search_fn = stub_search
+    admission = AdmissionController() if args.admission else None
+
+    if not args.json:
+        span = records[-1].get("ts", 0) - records[0].get("ts", 0)
+        print(f"\n🔁 Replaying {len(records)} queries ({span:.0f}s of traffic) at {args.speed}x "
+              f"with cache={args.cache_backend}{', admission on' if admission else ''}...")
+
+    latencies, outcomes, elapsed = asyncio.run(replay(records, pipeline, admission))
+    stats = pipeline.get_stats()
+    pipeline.close()
+
+    report = {
+        "queries": len(records),
+        "elapsed_s": round(elapsed, 2),
+        "throughput_rps": round(len(records) / elapsed, 2) if elapsed else None,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 1) if latencies else None,
+            "p95": round(percentile(latencies, 95), 1) if latencies else None,
+            "p99": round(percentile(latencies, 99), 1) if latencies else None,
+        },
+        "outcomes": dict(outcomes),
+        "llm_calls": stub.calls,
+        "tokens": dict(stub.tokens),
+        "coalesced": stats["single_flight"]["coalesced"],
+        "cache": stats["cache"],
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"\n📊 {report['queries']} queries in {report['elapsed_s']}s ({report['throughput_rps']} req/s)")
+    print(f"   Latency p50 {report['latency_ms']['p50']} ms | p95 {report['latency_ms']['p95']} ms | "
+          f"p99 {report['latency_ms']['p99']} ms")
+    print(f"   Outcomes: {', '.join(f'{k}={v}' for k, v in sorted(outcomes.items()))}")
+    print(f"   LLM calls: {stub.calls} (coalesced: {report['coalesced']})")
+    print(f"   Tokens: {stub.tokens['prompt_tokens']} prompt / {stub.tokens['completion_tokens']} completion")
+    if report["cache"]:
+        print(f"   Cache: {json.dumps(report['cache'])}")
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+"""
+DealZen Search Tuning
+Offline evaluation of hybrid search parameters (alpha, limit, vector_text boost)
+and a per-query-class sweep that writes backend/search_params.json.
+
+1. A labeled query -> relevant-deals set is generated from the deals file:
+   SKU lookups, category browsing, price ceilings and store filters, each with
+   the deals that truly answer it.
+2. Every (alpha, limit, boost) combination is run for every query. Recall is
+   measured at the limit (everything retrieved goes into the prompt), together
+   with estimated prompt tokens and search latency.
+3. Per class, the cheapest configuration whose recall is within
+   --recall-tolerance of the best one wins (fewest prompt tokens, then lowest
+   latency). --write saves the winners; the backend picks them up without a restart.
+
+Without local embeddings (scripts/build_local_index.py) the local backend is
+keyword-only and alpha is not evaluated.
+
+Usage:
+    python scripts/tune_search.py [--backend local|weaviate] [--write] [--save-set FILE]
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import statistics
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+
+# Add project root to Python path
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(script_dir)
+sys.path.insert(0, project_root)
+
+load_dotenv(dotenv_path=os.path.join(project_root, 'backend', '.env'))
+
+from backend.app.local_search import default_deals_file
+from backend.app.query_log import deal_key
+from backend.app.query_utils import classify_query
+from backend.app.search_params import SEARCH_PARAMS_FILE, DEFAULT_SEARCH_PARAMS
+
+# System prompt + instructions in generate_answer_with_relevance, and ~4 characters per token
+BASE_PROMPT_TOKENS = 330
+CHARS_PER_TOKEN = 4
+
+
+def category_leaf(deal: dict):
+    return (deal.get("product_category") or "").split(">")[-1].strip().lower()
+
+
+def build_eval_set(deals: list[dict], per_class: int = 40, seed: int = 7):
+    """
+    Generates labeled queries from the deals themselves. Each case is
+    {"query", "class", "relevant": [deal keys]}.
+    """
+    rng = random.Random(seed)
+    by_leaf = defaultdict(list)
+    for deal in deals:
+        if category_leaf(deal):
+            by_leaf[category_leaf(deal)].append(deal)
+
+    candidates = []
+    for deal in deals:
+        key = deal_key(deal)
+        if deal.get("sku"):
+            candidates.append({"query": str(deal["sku"]), "relevant": [key]})
+        leaf = category_leaf(deal)
+        if not leaf:
+            continue
+        same_leaf = by_leaf[leaf]
+        candidates.append({"query": leaf, "relevant": [deal_key(d) for d in same_leaf]})
+        if deal.get("price"):
+            ceiling = math.ceil(deal["price"] * 1.1)
+            candidates.append({"query": f"{leaf} under ${ceiling}",
+                               "relevant": [deal_key(d) for d in same_leaf if (d.get("price") or 0) <= ceiling]})
+        if deal.get("store"):
+            candidates.append({"query": f"{leaf} at {deal['store'].title()}",
+                               "relevant": [deal_key(d) for d in same_leaf if d.get("store") == deal["store"]]})
+        if deal.get("attributes"):
+            # Descriptive query: words from the feature list, no product name
+            words = deal["attributes"][0].split()[:6]
+            if len(words) >= 3:
+                candidates.append({"query": " ".join(words).lower().strip(",."), "relevant": [key]})
+
+    eval_set, seen, per_class_count = [], set(), defaultdict(int)
+    rng.shuffle(candidates)
+    for case in candidates:
+        query_class = classify_query(case["query"])
+        # Compound questions are split into sub-queries before search, so they are tuned via their parts
+        if case["query"] in seen or query_class == "compound" or per_class_count[query_class] >= per_class:
+            continue
+        seen.add(case["query"])
+        per_class_count[query_class] += 1
+        eval_set.append({**case, "class": query_class})
+    return eval_set
+
+
+def estimate_prompt_tokens(results: list[dict]):
+    return BASE_PROMPT_TOKENS + sum(len(item.get("full_json") or "") for item in results) // CHARS_PER_TOKEN
+
+
+class LocalTarget:
+    """Runs searches on the in-process index, with query vectors computed once per query."""
+
+    def __init__(self, deals_file: str):
+        from backend.app.local_search import load_local_index
+        self.index = load_local_index(deals_file)
+        self.has_vectors = self.index.embeddings is not None
+        self.vectors = {}
+        if self.has_vectors:
+            from backend.app.embeddings import QueryEmbedder
+            self.embedder = QueryEmbedder()
+
+    def prepare(self, queries: list[str]):
+        if self.has_vectors:
+            for query in queries:
+                self.vectors[query] = self.embedder.embed(query)
+
+    def search(self, query: str, params: dict):
+        return self.index.hybrid_search(query, params["alpha"], params["limit"], self.vectors.get(query),
+                                        apply_date_filter=False,
+                                        weights={"vector_text": params["vector_text_boost"]})
+
+    def close(self):
+        self.index.close()
+
+
+class WeaviateTarget:
+    """Runs searches against the running Weaviate instance (expired deals are filtered there)."""
+
+    has_vectors = True
+
+    def __init__(self):
+        from backend.app.weaviate_client import get_weaviate_client
+        from backend.app.embeddings import QueryEmbedder
+        self.client = get_weaviate_client()
+        self.embedder = QueryEmbedder()
+        self.vectors = {}
+
+    def prepare(self, queries: list[str]):
+        for query in queries:
+            self.vectors[query] = self.embedder.embed(query)
+
+    def search(self, query: str, params: dict):
+        from backend.app.weaviate_client import perform_hybrid_search
+        return asyncio.run(perform_hybrid_search(self.client, query, self.vectors[query], params))
+
+    def close(self):
+        self.client.close()
+
+
+def evaluate(target, cases: list[dict], params: dict, k: int):
+    """Mean recall@limit, recall@k, prompt tokens and search latency over the cases."""
+    recall_limit, recall_k, tokens, latencies = [], [], [], []
+    for case in cases:
+        relevant = set(case["relevant"])
+        start = time.perf_counter()
+        results = target.search(case["query"], params)
+        latencies.append((time.perf_counter() - start) * 1000)
+        keys = [deal_key(item) for item in results]
+        recall_limit.append(len(relevant & set(keys)) / len(relevant))
+        recall_k.append(len(relevant & set(keys[:k])) / len(relevant))
+        tokens.append(estimate_prompt_tokens(results))
+    recall = statistics.mean(recall_limit)
+    mean_tokens = statistics.mean(tokens)
+    latency = statistics.median(latencies)
+    return {
+        "recall": round(recall, 4),
+        f"recall@{k}": round(statistics.mean(recall_k), 4),
+        "prompt_tokens": round(mean_tokens, 1),
+        "latency_ms": round(latency, 2),
+        "recall_per_1k_tokens": round(recall / mean_tokens * 1000, 4) if mean_tokens else None,
+        "recall_per_100ms": round(recall / max(latency, 0.01) * 100, 4),
+    }
+
+
+def choose(results: list[tuple[dict, dict]], tolerance: float):
+    """Cheapest configuration (prompt tokens, then latency) within `tolerance` of the best recall."""
+    best_recall = max(metrics["recall"] for _, metrics in results)
+    eligible = [r for r in results if r[1]["recall"] >= best_recall - tolerance]
+    return min(eligible, key=lambda r: (r[1]["prompt_tokens"], r[1]["latency_ms"]))
+
+
+def parse_floats(text: str):
+    return [float(x) for x in text.split(",") if x]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate and tune hybrid search parameters per query class")
+    parser.add_argument("--backend", choices=["local", "weaviate"], default="local")
+    parser.add_argument("--deals", default=None, help="deals file for labels and the local index")
+    parser.add_argument("--eval-set", default=None, help="use a saved labeled set instead of generating one")
+    parser.add_argument("--save-set", default=None, help="save the generated labeled set to this file")
+    parser.add_argument("--alphas", default="0,0.25,0.5,0.75,1")
+    parser.add_argument("--limits", default="5,10,15,20,30")
+    parser.add_argument("--boosts", default="1,2,3")
+    parser.add_argument("--k", type=int, default=5, help="also report recall@k")
+    parser.add_argument("--recall-tolerance", type=float, default=0.02,
+                        help="accept configs this close to the best recall if they are cheaper")
+    parser.add_argument("--write", action="store_true", help=f"save the chosen parameters to {SEARCH_PARAMS_FILE}")
+    args = parser.parse_args()
+
+    deals_file = args.deals or default_deals_file()
+    if args.eval_set:
+        with open(args.eval_set, 'r') as f:
+            eval_set = json.load(f)
+    else:
+        with open(deals_file, 'r') as f:
+            eval_set = build_eval_set(json.load(f))
+        if args.save_set:
+            with open(args.save_set, 'w') as f:
+                json.dump(eval_set, f, indent=2)
+            print(f"📂 Saved {len(eval_set)} labeled queries to {args.save_set}")
+
+    by_class = defaultdict(list)
+    for case in eval_set:
+        by_class[case["class"]].append(case)
+
+    target = LocalTarget(deals_file) if args.backend == "local" else WeaviateTarget()
+    alphas = parse_floats(args.alphas) if target.has_vectors else [0.0]
+    limits = [int(x) for x in parse_floats(args.limits)]
+    boosts = parse_floats(args.boosts)
+    target.prepare([case["query"] for case in eval_set])
+
+    print("\n" + "="*78)
+    print(f"🎯 HYBRID SEARCH TUNING ({args.backend}, {len(eval_set)} labeled queries, "
+          f"{len(alphas) * len(limits) * len(boosts)} configs)")
+    print("="*78)
+    if not target.has_vectors:
+        print("⚠️  No local embeddings - keyword-only, alpha not evaluated (run scripts/build_local_index.py)")
+
+    chosen = {}
+    for query_class, cases in sorted(by_class.items()):
+        results = []
+        for alpha in alphas:
+            for limit in limits:
+                for boost in boosts:
+                    params = {"alpha": alpha, "limit": limit, "vector_text_boost": boost}
+                    results.append((params, evaluate(target, cases, params, args.k)))
+
+        params, metrics = choose(results, args.recall_tolerance)
+        baseline = evaluate(target, cases, DEFAULT_SEARCH_PARAMS, args.k)
+        chosen[query_class] = (params, metrics)
+
+        print(f"\n📂 {query_class} ({len(cases)} queries)")
+        print(f"   {'alpha':>5} {'limit':>5} {'boost':>5} {'recall':>7} {f'r@{args.k}':>7} {'tokens':>7} "
+              f"{'ms':>7} {'r/1k tok':>9} {'r/100ms':>8}")
+        top = sorted(results, key=lambda r: (-r[1]["recall"], r[1]["prompt_tokens"]))[:5]
+        for row_params, row in top:
+            marker = "  ◀ chosen" if row_params == params else ""
+            print(f"   {row_params['alpha']:>5} {row_params['limit']:>5} {row_params['vector_text_boost']:>5} "
+                  f"{row['recall']:>7.3f} {row[f'recall@{args.k}']:>7.3f} {row['prompt_tokens']:>7.0f} "
+                  f"{row['latency_ms']:>7.2f} {row['recall_per_1k_tokens']:>9.4f} {row['recall_per_100ms']:>8.2f}"
+                  f"{marker}")
+        print(f"   Current defaults: recall {baseline['recall']:.3f}, {baseline['prompt_tokens']:.0f} tokens "
+              f"-> chosen: recall {metrics['recall']:.3f}, {metrics['prompt_tokens']:.0f} tokens")
+
+    target.close()
+
+    if args.write:
+        existing = {}
+        if os.path.exists(SEARCH_PARAMS_FILE):
+            with open(SEARCH_PARAMS_FILE, 'r') as f:
+                existing = json.load(f)
+        classes = existing.get("classes", {})
+        for query_class, (params, metrics) in chosen.items():
+            if not target.has_vectors:
+                # A keyword-only run says nothing about alpha - keep the current value
+                params = {key: value for key, value in params.items() if key != "alpha"}
+            classes[query_class] = {**classes.get(query_class, {}), **params}
+        config = {
+            "default": existing.get("default", DEFAULT_SEARCH_PARAMS),
+            "classes": classes,
+            "tuned": {
+                "at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "backend": args.backend,
+                "queries": len(eval_set),
+                "metrics": {query_class: metrics for query_class, (_, metrics) in chosen.items()},
+            },
+        }
+        tmp_path = SEARCH_PARAMS_FILE + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(config, f, indent=2)
+        os.replace(tmp_path, SEARCH_PARAMS_FILE)
+        print(f"\n✅ Saved parameters for {len(chosen)} query classes to {SEARCH_PARAMS_FILE}")
+    print()
+
+
+if __name__ == "__main__":
+    main()
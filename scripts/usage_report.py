@@ -0,0 +1,162 @@
+"""
+DealZen Usage Report
+Token and cost breakdown for both OpenAI paths:
+
+- Extraction: logs/extraction_usage.jsonl (written by process_flyers.py),
+  per store, per extraction mode (single vs packed pages) and for the most
+  expensive flyers.
+- Chat: backend query logs (backend/data/query_logs), per query class and
+  per model route (cascade escalation rate, which model answered).
+
+Usage:
+    python scripts/usage_report.py [--since-hours 24] [--top 10] [--json]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+
+# Add project root to Python path
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(script_dir)
+sys.path.insert(0, project_root)
+
+from backend.app.query_log import query_log_files, read_query_log
+from extraction_budget import EXTRACTION_USAGE_LOG
+
+TOKEN_FIELDS = ("prompt_tokens", "completion_tokens", "cached_tokens", "image_tokens")
+
+
+def new_bucket():
+    return {"calls": 0, "cost_usd": 0.0, "latency_ms": 0.0, **{field: 0 for field in TOKEN_FIELDS}}
+
+
+def add(bucket: dict, tokens: dict, cost: float, latency_ms: float):
+    bucket["calls"] += 1
+    bucket["cost_usd"] += cost or 0.0
+    bucket["latency_ms"] += latency_ms or 0.0
+    for field in TOKEN_FIELDS:
+        bucket[field] += (tokens or {}).get(field, 0) or 0
+
+
+def finish(buckets: dict):
+    return {
+        key: {**bucket, "cost_usd": round(bucket["cost_usd"], 4),
+              "avg_latency_ms": round(bucket["latency_ms"] / bucket["calls"], 1) if bucket["calls"] else None}
+        for key, bucket in buckets.items()
+    }
+
+
+def extraction_usage(path: str, since: float):
+    per_store, per_flyer, per_mode = defaultdict(new_bucket), defaultdict(new_bucket), defaultdict(new_bucket)
+    if not os.path.exists(path):
+        return {}, {}, {}
+    with open(path, 'r') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record.get("ts", 0) < since:
+                continue
+            for bucket in (per_store[record.get("store", "?")], per_flyer[record.get("flyer", "?")]):
+                add(bucket, record, record.get("cost_usd"), record.get("latency_ms"))
+            # Ledger lines are per page, so a packed call shows up once per page it covered
+            bucket = per_mode[record.get("mode", "single")]
+            add(bucket, record, record.get("cost_usd"), record.get("latency_ms"))
+            bucket["deals"] = bucket.get("deals", 0) + (record.get("deals") or 0)
+    return finish(per_store), finish(per_flyer), finish_modes(per_mode)
+
+
+def finish_modes(per_mode: dict):
+    """Adds the per-deal figures that make single and packed extraction comparable."""
+    rows = finish(per_mode)
+    for row in rows.values():
+        deals = row.get("deals", 0)
+        tokens = row["prompt_tokens"] + row["completion_tokens"]
+        row["tokens_per_deal"] = round(tokens / deals, 1) if deals else None
+        row["ms_per_deal"] = round(row["latency_ms"] / deals, 1) if deals else None
+    return rows
+
+
+def chat_usage(paths: list[str], since: float):
+    per_class, per_route = defaultdict(new_bucket), defaultdict(new_bucket)
+    for record in read_query_log(p for p in paths if os.path.exists(p)):
+        if record.get("ts", 0) < since:
+            continue
+        bucket = per_class[record.get("query_class") or "unknown"]
+        add(bucket, record.get("tokens"), record.get("cost_usd"), record.get("total_ms"))
+        # Requests answered without an LLM call of their own (cache hits, coalesced, degraded)
+        bucket["no_llm_calls"] = bucket.get("no_llm_calls", 0) + (0 if record.get("tokens") else 1)
+
+        route = record.get("route")
+        if route and record.get("tokens"):
+            bucket = per_route[route["route"]]
+            add(bucket, record["tokens"], record.get("cost_usd"), (record.get("timings") or {}).get("generation_ms"))
+            bucket["escalations"] = bucket.get("escalations", 0) + bool(route.get("escalated"))
+            answered_by = bucket.setdefault("answered_by", {})
+            answered_by[route["model"]] = answered_by.get(route["model"], 0) + 1
+    per_route = finish(per_route)
+    for row in per_route.values():
+        row["escalation_rate"] = round(row["escalations"] / row["calls"], 3)
+    return finish(per_class), per_route
+
+
+def print_table(title: str, rows: dict, label: str, limit: int = None):
+    print(f"\n{title}")
+    if not rows:
+        print("   (no data)")
+        return
+    ordered = sorted(rows.items(), key=lambda kv: kv[1]["cost_usd"], reverse=True)[:limit]
+    print(f"   {label:<28} {'calls':>6} {'prompt':>10} {'cached':>8} {'image':>8} {'completion':>11} "
+          f"{'cost $':>9} {'avg ms':>8}")
+    for key, row in ordered:
+        print(f"   {key[:28]:<28} {row['calls']:>6} {row['prompt_tokens']:>10} {row['cached_tokens']:>8} "
+              f"{row['image_tokens']:>8} {row['completion_tokens']:>11} {row['cost_usd']:>9.4f} "
+              f"{row['avg_latency_ms'] or 0:>8.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Token and cost report for extraction and chat")
+    parser.add_argument("--since-hours", type=float, default=None, help="only include the last N hours")
+    parser.add_argument("--top", type=int, default=10, help="number of flyers to list")
+    parser.add_argument("--extraction-log", default=EXTRACTION_USAGE_LOG)
+    parser.add_argument("--query-log", action="append", default=[], help="query log file(s) (default: all)")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    since = time.time() - args.since_hours * 3600 if args.since_hours else 0
+    per_store, per_flyer, per_mode = extraction_usage(args.extraction_log, since)
+    per_class, per_route = chat_usage(args.query_log or query_log_files(), since)
+
+    if args.json:
+        print(json.dumps({"extraction": {"stores": per_store, "modes": per_mode, "flyers": per_flyer},
+                          "chat": {"query_classes": per_class, "routes": per_route}}, indent=2))
+        return
+
+    print("\n" + "="*70)
+    print("💰 DEALZEN TOKEN & COST REPORT")
+    print("="*70)
+    print_table("📸 Extraction by store", per_store, "store")
+    print_table("📦 Extraction by mode (one row per page)", per_mode, "mode")
+    for mode, row in sorted(per_mode.items()):
+        print(f"   {mode}: {row['deals']} deals, {row['tokens_per_deal']} tokens/deal, "
+              f"{row['ms_per_deal']} ms/deal, ${row['cost_usd'] / row['deals'] if row['deals'] else 0:.5f}/deal")
+    print_table(f"🧾 Most expensive flyers (top {args.top})", per_flyer, "flyer", args.top)
+    print_table("💬 Chat by query class", per_class, "query class")
+    print_table("🔀 Chat by model route (avg ms = generation)", per_route, "route")
+    for route, row in sorted(per_route.items()):
+        answered_by = ", ".join(f"{model} {count}" for model, count in sorted(row["answered_by"].items()))
+        print(f"   {route}: escalation rate {row['escalation_rate']:.1%}, answered by {answered_by}")
+
+    extraction_total = sum(row["cost_usd"] for row in per_store.values())
+    chat_total = sum(row["cost_usd"] for row in per_class.values())
+    print(f"\n📊 Total: extraction ${extraction_total:.4f} | chat ${chat_total:.4f}")
+    print("="*70 + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,9 +4,16 @@ Industry-standard quality scoring with automated decision-making.
 """
 
 import json
+import os
+import sys
 from collections import Counter
 from datetime import datetime
 from pathlib import Path
+
+# Add project root to Python path (the Deal model is shared with the backend)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.app.deal_model import coerce_deals
 from validation_config import (
     QUALITY_THRESHOLDS, SCORING_WEIGHTS, VALIDATION_RULES, 
     CRITICAL_FIELDS, LOGGING
@@ -19,8 +26,14 @@ class QualityValidator:
     No manual intervention required for most cases.
     """
     
-    def __init__(self, deals_file='scripts/deals.json'):
+    def __init__(self, deals_file='scripts/deals.json', deals=None, per_page=False):
+        """
+        Validates a deals file, or an in-memory list of deals (e.g. one flyer page).
+        per_page: a single page is usually themed, so category concentration is a warning, not an error.
+        """
         self.deals_file = deals_file
+        self.preloaded_deals = deals
+        self.per_page = per_page
         self.deals = []
         self.score = 0
         self.score_breakdown = {}
@@ -30,9 +43,12 @@ class QualityValidator:
         
     def load_deals(self):
         """Load and parse deals JSON"""
+        if self.preloaded_deals is not None:
+            self.deals = coerce_deals(self.preloaded_deals)
+            return True
         try:
             with open(self.deals_file, 'r') as f:
-                self.deals = json.load(f)
+                self.deals = coerce_deals(json.load(f))
             return True
         except FileNotFoundError:
             self.errors.append(f"Deals file not found: {self.deals_file}")
@@ -132,7 +148,7 @@ class QualityValidator:
         
         missing_count = 0
         for i, deal in enumerate(self.deals):
-            missing = [f for f in CRITICAL_FIELDS if not deal.get(f)]
+            missing = [f for f in CRITICAL_FIELDS if not getattr(deal, f, None)]
             if missing:
                 missing_count += len(missing)
                 if len(self.errors) < 5:  # Cap error messages
@@ -148,23 +164,23 @@ class QualityValidator:
         weight = SCORING_WEIGHTS['price_quality']['weight']
         deduction_per = SCORING_WEIGHTS['price_quality']['deduction_per_outlier']
         
-        prices = [d.get('price') for d in self.deals if isinstance(d.get('price'), (int, float))]
+        prices = [d.price for d in self.deals if d.price is not None]
         if not prices:
             return weight  # No prices to check
         
         outlier_count = 0
         for i, deal in enumerate(self.deals):
-            price = deal.get('price', 0)
-            if isinstance(price, (int, float)):
+            price = deal.price
+            if price is not None:
                 if price < QUALITY_THRESHOLDS['min_price']:
                     outlier_count += 1
                     if outlier_count <= 3:  # Limit warning messages
-                        self.warnings.append(f"Deal #{i+1} ({deal.get('product_name', 'Unknown')}): Very low price ${price}")
+                        self.warnings.append(f"Deal #{i+1} ({deal.product_name or 'Unknown'}): Very low price ${price}")
                 
                 if price > QUALITY_THRESHOLDS['max_price']:
                     outlier_count += 1
                     if outlier_count <= 3:
-                        self.warnings.append(f"Deal #{i+1} ({deal.get('product_name', 'Unknown')}): Very high price ${price}")
+                        self.warnings.append(f"Deal #{i+1} ({deal.product_name or 'Unknown'}): Very high price ${price}")
         
         outlier_rate = outlier_count / len(prices)
         if outlier_rate > QUALITY_THRESHOLDS['max_price_outliers']:
@@ -178,7 +194,7 @@ class QualityValidator:
         weight = SCORING_WEIGHTS['category_diversity']['weight']
         deduction = SCORING_WEIGHTS['category_diversity']['deduction_for_bias']
         
-        categories = [d.get('product_category', 'Unknown').split(' > ')[0] for d in self.deals]
+        categories = [(d.product_category or 'Unknown').split(' > ')[0] for d in self.deals]
         category_counts = Counter(categories)
         
         if not category_counts:
@@ -188,6 +204,9 @@ class QualityValidator:
         concentration = top_count / len(self.deals)
         
         if concentration > QUALITY_THRESHOLDS['max_category_concentration']:
+            if self.per_page:
+                self.warnings.append(f"{concentration*100:.0f}% of deals in '{top_category}' (single themed page?)")
+                return weight - 5
             self.errors.append(f"Extraction bias: {concentration*100:.0f}% of deals in '{top_category}' (likely missed other categories)")
             return max(0, weight - deduction)
         
@@ -199,7 +218,7 @@ class QualityValidator:
         """Score based on optional field completeness (10 points max)"""
         weight = SCORING_WEIGHTS['data_completeness']['weight']
         
-        sku_count = sum(1 for d in self.deals if d.get('sku'))
+        sku_count = sum(1 for d in self.deals if d.sku)
         sku_coverage = (sku_count / len(self.deals)) * 100
         
         self.info['sku_coverage'] = f"{sku_coverage:.1f}%"
@@ -215,7 +234,7 @@ class QualityValidator:
         weight = SCORING_WEIGHTS['duplicate_check']['weight']
         deduction_per = SCORING_WEIGHTS['duplicate_check']['deduction_per_duplicate']
         
-        product_names = [d.get('product_name', '').lower().strip() for d in self.deals if d.get('product_name')]
+        product_names = [d.product_name.lower().strip() for d in self.deals if d.product_name]
         name_counts = Counter(product_names)
         duplicates = [name for name, count in name_counts.items() if count > 1]
         
@@ -273,7 +292,7 @@ class QualityValidator:
         
         # Collect info stats
         if self.deals:
-            prices = [d.get('price') for d in self.deals if isinstance(d.get('price'), (int, float))]
+            prices = [d.price for d in self.deals if d.price is not None]
             if prices:
                 self.info['price_stats'] = {
                     'average': round(sum(prices) / len(prices), 2),
@@ -281,7 +300,7 @@ class QualityValidator:
                     'max': max(prices)
                 }
             
-            categories = [d.get('product_category', 'Unknown').split(' > ')[0] for d in self.deals]
+            categories = [(d.product_category or 'Unknown').split(' > ')[0] for d in self.deals]
             self.info['top_categories'] = dict(Counter(categories).most_common(5))
             self.info['total_deals'] = len(self.deals)
         
@@ -0,0 +1,198 @@
+"""
+DealZen Answer Cache Warm-up
+Precomputes answers for the most popular questions right after ingestion, so
+the first users after new deals go live hit the shared answer cache instead of
+a full retrieval + LLM round-trip.
+
+Queries are the top N normalized queries of the recent query log (follow-ups
+excluded), topped up from the seed list (seed_queries.txt) and from store /
+category seeds built from the freshly ingested deals ("combo kits deals",
+"combo kits at homedepot", ...). Each query runs through the backend pipeline
+(retrieval, model cascade) and is written to the shared cache under the new
+corpus version. Calls run concurrently under a rate budget: at most
+WARM_CONCURRENCY at once, WARM_MAX_QPM started per minute and WARM_BUDGET_USD
+in total.
+
+Runs automatically at the end of ingest_data.py (WARM_CACHE_AFTER_INGEST=0 to
+disable), or by hand:
+    python scripts/warm_answer_cache.py [--top 50] [--since-hours 72] [--dry-run]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from collections import Counter
+from dotenv import load_dotenv
+
+# Add project root to Python path
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(script_dir)
+sys.path.insert(0, project_root)
+
+load_dotenv(dotenv_path=os.path.join(project_root, 'backend', '.env'))
+
+from backend.app.query_log import query_log_files, read_query_log
+from backend.app.query_utils import normalize_query
+
+DEFAULT_SEED_FILE = os.path.join(script_dir, 'seed_queries.txt')
+
+WARM_TOP_N = int(os.getenv("WARM_TOP_N", "50"))
+WARM_LOG_HOURS = float(os.getenv("WARM_LOG_HOURS", "72"))
+WARM_CONCURRENCY = int(os.getenv("WARM_CONCURRENCY", "4"))
+WARM_MAX_QPM = float(os.getenv("WARM_MAX_QPM", "60"))
+WARM_BUDGET_USD = float(os.getenv("WARM_BUDGET_USD", "1.0"))
+# Warmed answers stay until the next ingestion replaces the corpus version (or this TTL)
+WARM_ANSWER_TTL_S = float(os.getenv("WARM_ANSWER_TTL_S", "3600"))
+# Categories (leaf level) seeded per store when the log is short
+WARM_CATEGORIES_PER_STORE = int(os.getenv("WARM_CATEGORIES_PER_STORE", "5"))
+
+
+def logged_queries(paths, since: float):
+    """Normalized query counts from the query log (follow-ups depend on a session, so they are skipped)."""
+    counts = Counter()
+    for record in read_query_log(p for p in paths if os.path.exists(p)):
+        if record.get("ts", 0) < since or record.get("query_class") == "follow_up":
+            continue
+        counts[record.get("normalized") or normalize_query(record.get("query") or "")] += 1
+    counts.pop("", None)
+    return counts
+
+
+def seed_queries(path: str):
+    if not path or not os.path.exists(path):
+        return []
+    with open(path, 'r') as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
+
+def catalog_queries(deals: list[dict], per_store: int = WARM_CATEGORIES_PER_STORE):
+    """Store and category questions for the current deals, most common categories first."""
+    by_store = {}
+    for deal in deals:
+        category = (deal.get("product_category") or "").split(">")[-1].strip().lower()
+        store = (deal.get("store") or "").strip().lower()
+        if category:
+            by_store.setdefault(store, Counter())[category] += 1
+    queries = []
+    for store, categories in sorted(by_store.items(), key=lambda kv: -sum(kv[1].values())):
+        if store:
+            queries.append(f"{store} deals")
+        for category, _ in categories.most_common(per_store):
+            queries.append(f"{category} deals")
+            if store:
+                queries.append(f"{category} at {store}")
+    return queries
+
+
+def trending_queries(top: int, log_paths=None, since: float = 0, seed_file: str = DEFAULT_SEED_FILE, deals=None):
+    """
+    The top `top` distinct normalized queries: query-log favourites first, then the
+    seed list, then store / category seeds for `deals`.
+    """
+    counts = logged_queries(query_log_files() if log_paths is None else log_paths, since)
+    queries = [query for query, _ in counts.most_common(top)]
+    seen = set(queries)
+    for query in seed_queries(seed_file) + catalog_queries(deals or []):
+        if len(queries) >= top:
+            break
+        normalized = normalize_query(query)
+        if normalized and normalized not in seen:
+            seen.add(normalized)
+            queries.append(normalized)
+    return queries, len(counts)
+
+
+async def warm(pipeline, queries: list[str], concurrency: int = WARM_CONCURRENCY, max_qpm: float = WARM_MAX_QPM,
+               budget_usd: float = WARM_BUDGET_USD, ttl_s: float = WARM_ANSWER_TTL_S):
+    """Answers and caches `queries` within the rate budget. Returns per-outcome counts and the spend."""
+    results = Counter()
+    semaphore = asyncio.Semaphore(concurrency)
+    interval = 60 / max_qpm if max_qpm > 0 else 0
+    next_start = time.monotonic()
+
+    def spent():
+        return sum(row["cost_usd"] for row in pipeline.usage_meter.snapshot().values())
+
+    async def warm_one(query):
+        nonlocal next_start
+        if await pipeline.cache.aget("answer", query) is not None:
+            results["already_cached"] += 1  # no call, so it doesn't count against the rate
+            return
+        async with semaphore:
+            # Starts are spaced `interval` apart; the budget is checked before every call
+            delay = next_start - time.monotonic()
+            next_start = max(next_start, time.monotonic()) + interval
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if spent() >= budget_usd:
+                results["over_budget"] += 1
+                return
+            try:
+                response = await pipeline.warm_answer(query, ttl_s=ttl_s)
+            except Exception as e:
+                print(f"   ⚠️  {query}: {e}")
+                results["failed"] += 1
+                return
+            if response is None:
+                results["already_cached"] += 1
+            elif response.get("mode") == "full":
+                results["warmed"] += 1
+            else:
+                results[response.get("mode") or "failed"] += 1  # degraded / unavailable are not cached
+
+    await asyncio.gather(*(warm_one(query) for query in queries))
+    return results, spent()
+
+
+def warm_answer_cache(deals=None, top: int = WARM_TOP_N, since_hours: float = WARM_LOG_HOURS,
+                      seed_file: str = DEFAULT_SEED_FILE, dry_run: bool = False):
+    """Builds the query list and warms the shared answer cache for the current corpus version."""
+    since = time.time() - since_hours * 3600 if since_hours else 0
+    queries, logged = trending_queries(top, since=since, seed_file=seed_file, deals=deals)
+    print(f"\n🔥 Warming answer cache: {len(queries)} queries ({min(logged, len(queries))} from the query log)")
+    if dry_run or not queries:
+        for query in queries:
+            print(f"   - {query}")
+        return None
+
+    from backend.app.rag_pipeline import RAGPipeline
+    from backend.app.shared_cache import SQLiteCache
+    pipeline = RAGPipeline()
+    try:
+        if not isinstance(pipeline.cache, SQLiteCache):
+            # A memory cache would die with this process - nothing for the backend workers to read
+            print("⚠️  CACHE_BACKEND is not the shared SQLite cache - skipping warm-up")
+            return None
+        start = time.time()
+        results, cost = asyncio.run(warm(pipeline, queries))
+    finally:
+        pipeline.close()
+
+    print(f"✅ Warmed {results['warmed']} answers in {time.time() - start:.1f}s (${cost:.4f})")
+    skipped = {outcome: count for outcome, count in results.items() if outcome != "warmed"}
+    if skipped:
+        print("   " + ", ".join(f"{outcome}: {count}" for outcome, count in sorted(skipped.items())))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute answers for popular queries into the shared cache")
+    parser.add_argument("--top", type=int, default=WARM_TOP_N, help="number of queries to warm")
+    parser.add_argument("--since-hours", type=float, default=WARM_LOG_HOURS, help="query log window (0 = all)")
+    parser.add_argument("--seed", default=DEFAULT_SEED_FILE, help="seed query list (one per line)")
+    parser.add_argument("--deals", default=None, help="deals file for store / category seeds (default: deals.json)")
+    parser.add_argument("--dry-run", action="store_true", help="only list the queries")
+    args = parser.parse_args()
+
+    from backend.app.deal_model import deals_to_dicts, read_deals_file
+    deals_file = args.deals or os.path.join(script_dir, 'deals.json')
+    if not os.path.exists(deals_file):
+        deals_file = os.path.join(script_dir, 'deals.example.json')
+    deals = deals_to_dicts(read_deals_file(deals_file))
+    warm_answer_cache(deals, args.top, args.since_hours, args.seed, args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
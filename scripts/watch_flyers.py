@@ -0,0 +1,318 @@
+"""
+DealZen Flyer Watcher
+Long-running daemon for continuous deal updates: watches flyer-images/ and,
+for every new or changed flyer, extracts it, validates each page and upserts
+only that flyer's deals into Weaviate - no full extract / drop-and-reload cycle.
+
+- File events come from watchdog (inotify / FSEvents) when it is installed,
+  otherwise (or with --poll) from scanning the folder every WATCH_POLL_INTERVAL_S.
+- Events are debounced: a file is picked up once it has been quiet for
+  WATCH_DEBOUNCE_S, so half-copied files and bursts of writes are read once.
+  Files whose content hash is unchanged (touched, re-saved) are skipped.
+- Pages stream into Weaviate as soon as they pass the per-page gate, keyed by
+  deterministic ids, so a re-extracted page overwrites its own deals and drops
+  the ones that disappeared. Rejected pages keep their previous deals.
+- When a flyer is done, deals.json / deals.pages.json are updated in place,
+  the corpus version is bumped (backend caches stop matching), the snapshot
+  is rewritten and the flyer's deals are matched against saved searches.
+
+Files already present on the first start are recorded as the baseline
+(use --process-existing to extract them). Content hashes are kept in
+logs/watch_state.json, so changes made while the daemon was down are picked up
+on the next start.
+
+Usage:
+    python scripts/watch_flyers.py [--poll] [--process-existing]
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Add project root to Python path
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(script_dir))
+
+import process_flyers as flyers
+from backend.app.local_search import file_sha256
+from backend.app.usage import UsageMeter
+from extraction_budget import ExtractionBudget, ExtractionLedger
+from ingest_data import StreamingIngester, finalize_ingestion
+from page_gate import PageGate
+from rasterize_pdf import PdfRasterizer, pdf_page_count
+
+WATCH_DEBOUNCE_S = float(os.getenv("WATCH_DEBOUNCE_S", "2.0"))
+WATCH_POLL_INTERVAL_S = float(os.getenv("WATCH_POLL_INTERVAL_S", "2.0"))
+WATCH_STATE_FILE = os.getenv("WATCH_STATE_FILE", 'logs/watch_state.json')
+
+FLYER_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp', '.pdf')
+
+
+def is_flyer(path):
+    name = os.path.basename(path)
+    return name.lower().endswith(FLYER_EXTENSIONS) and not name.startswith('.')
+
+
+class Debouncer:
+    """Collects changed paths; a path is ready once no event has touched it for `delay` seconds."""
+
+    def __init__(self, delay=WATCH_DEBOUNCE_S):
+        self.delay = delay
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def touch(self, path):
+        with self._lock:
+            self._pending[path] = time.monotonic()
+
+    def ready(self):
+        now = time.monotonic()
+        with self._lock:
+            paths = [path for path, last in self._pending.items() if now - last >= self.delay]
+            for path in paths:
+                del self._pending[path]
+        return sorted(paths)
+
+
+class PollingWatcher:
+    """Fallback watcher: compares (mtime, size) of the folder's flyers on every scan."""
+
+    def __init__(self, folder, debouncer, interval=WATCH_POLL_INTERVAL_S):
+        self.folder = folder
+        self.debouncer = debouncer
+        self.interval = interval
+        self._seen = self._scan()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="flyer-poller", daemon=True)
+
+    def _scan(self):
+        state = {}
+        with os.scandir(self.folder) as entries:
+            for entry in entries:
+                if entry.is_file() and is_flyer(entry.name):
+                    stat = entry.stat()
+                    state[entry.path] = (stat.st_mtime_ns, stat.st_size)
+        return state
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            current = self._scan()
+            for path, signature in current.items():
+                if self._seen.get(path) != signature:
+                    self.debouncer.touch(path)
+            self._seen = current
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def join(self):
+        self._thread.join()
+
+
+def create_event_watcher(folder, debouncer):
+    """watchdog observer feeding the debouncer, or None if watchdog isn't installed."""
+    try:
+        from watchdog.events import FileSystemEventHandler
+        from watchdog.observers import Observer
+    except ImportError:
+        return None
+
+    class Handler(FileSystemEventHandler):
+        def on_any_event(self, event):
+            if event.is_directory or event.event_type not in ("created", "modified", "moved", "closed"):
+                return
+            path = getattr(event, "dest_path", None) or event.src_path
+            if is_flyer(path):
+                debouncer.touch(path)
+
+    observer = Observer()
+    observer.schedule(Handler(), folder, recursive=False)
+    return observer
+
+
+def load_watch_state():
+    if not os.path.exists(WATCH_STATE_FILE):
+        return None
+    with open(WATCH_STATE_FILE, 'r') as f:
+        return json.load(f)
+
+
+def save_watch_state(state):
+    os.makedirs(os.path.dirname(WATCH_STATE_FILE) or '.', exist_ok=True)
+    tmp_path = WATCH_STATE_FILE + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, WATCH_STATE_FILE)
+
+
+def flyer_sources(filename):
+    """Matches the source_image / manifest names that belong to one flyer file."""
+    if filename.lower().endswith('.pdf'):
+        prefix = os.path.splitext(filename)[0] + "_page_"
+        return lambda name: name.startswith(prefix) or name.startswith(filename + "#page=")
+    return lambda name: name == filename
+
+
+class FlyerJob:
+    """One new or changed flyer file and the extraction futures of its pages."""
+
+    def __init__(self, path, sha256):
+        self.path = path
+        self.filename = os.path.basename(path)
+        self.sha256 = sha256
+        self.started = time.time()
+        self.page_names = set()
+        self.futures = []
+
+    def done(self):
+        return all(future.done() for future in self.futures)
+
+
+class FlyerDaemon:
+    def __init__(self, process_existing=False):
+        self.budget = ExtractionBudget(flyers.EXTRACTION_MAX_CONCURRENCY, flyers.EXTRACTION_BUDGET_USD,
+                                       flyers.EXTRACTION_TPM_LIMIT)
+        self.ledger = ExtractionLedger()
+        self.meter = UsageMeter()
+        self.ingester = StreamingIngester(upsert=True)
+        self.gate = PageGate(ingester=self.ingester)
+        self.executor = ThreadPoolExecutor(max_workers=flyers.EXTRACTION_MAX_CONCURRENCY)
+        self.rasterizer = None
+        self.jobs = []
+        self.state = load_watch_state()
+        if self.state is None:
+            # First start: everything already in the folder is assumed to be ingested
+            self.state = {} if process_existing else {
+                name: file_sha256(os.path.join(flyers.INPUT_FOLDER, name))
+                for name in os.listdir(flyers.INPUT_FOLDER) if is_flyer(name)}
+            save_watch_state(self.state)
+
+    def pending_at_startup(self):
+        """Flyers added or changed while the daemon was not running."""
+        return sorted(os.path.join(flyers.INPUT_FOLDER, name) for name in os.listdir(flyers.INPUT_FOLDER)
+                      if is_flyer(name) and self.state.get(name) != file_sha256(os.path.join(flyers.INPUT_FOLDER, name)))
+
+    def start_job(self, path):
+        if not os.path.isfile(path):
+            return
+        filename = os.path.basename(path)
+        sha256 = file_sha256(path)
+        if self.state.get(filename) == sha256 or any(job.filename == filename for job in self.jobs):
+            # Unchanged content, or already in flight (a later event re-queues it once this job is done)
+            return
+
+        job = FlyerJob(path, sha256)
+        print(f"\n🆕 {filename} changed - extracting...")
+        def submit(page, index, total):
+            job.page_names.add(page.name)
+            job.futures.append(self.executor.submit(
+                flyers.process_image, page, index, total, self.budget, self.ledger, self.meter, self.gate))
+
+        if filename.lower().endswith('.pdf'):
+            if self.rasterizer is None:
+                self.rasterizer = PdfRasterizer()
+            total = pdf_page_count(path)
+            for index, page in enumerate(self.rasterizer.pages(path), 1):
+                submit(page, index, total)
+        else:
+            submit(flyers.image_file_page(filename), 1, 1)
+        self.jobs.append(job)
+
+    def finish_job(self, job):
+        """Folds a finished flyer into deals.json and publishes a new corpus version."""
+        new_deals = [deal for deals in (future.result() for future in job.futures) if deals for deal in deals]
+        replaced = {deal["source_image"] for deal in new_deals}
+        belongs = flyer_sources(job.filename)
+
+        deals_file = flyers.OUTPUT_FILE
+        deals = []
+        if os.path.exists(deals_file):
+            with open(deals_file, 'r', encoding='utf-8') as f:
+                deals = json.load(f)
+        # Pages a PDF no longer has (it got shorter) lose their deals too; rejected pages keep theirs
+        removed = {deal.get("source_image") for deal in deals
+                   if deal.get("source_image") and belongs(deal["source_image"])} - job.page_names
+        for source_image in sorted(removed):
+            self.ingester.submit(source_image, [])
+        kept = [deal for deal in deals if deal.get("source_image") not in replaced | removed]
+        all_deals = kept + new_deals
+
+        # Weaviate must have the new objects before caches are invalidated
+        self.ingester.flush()
+        with open(deals_file, 'w', encoding='utf-8') as f:
+            json.dump(all_deals, f, indent=2, ensure_ascii=False)
+
+        previous_pages = []
+        manifest = None
+        if os.path.exists(flyers.PAGE_MANIFEST_FILE):
+            with open(flyers.PAGE_MANIFEST_FILE, 'r') as f:
+                manifest = json.load(f)
+        if manifest:
+            previous_pages = [page for page in manifest.get("pages", []) if not belongs(page["image"])]
+        self.gate.write_manifest(flyers.PAGE_MANIFEST_FILE, file_sha256(deals_file), previous_pages)
+        corpus_version = finalize_ingestion(all_deals, deals_file, changed=new_deals)
+
+        # Pages skipped for budget are retried on the next start instead of being marked done
+        if not self.budget.exhausted:
+            self.state[job.filename] = job.sha256
+            save_watch_state(self.state)
+        print(f"✅ {job.filename}: {len(new_deals)} deals live ({len(all_deals)} total) "
+              f"{time.time() - job.started:.1f}s after pickup - corpus version {corpus_version}")
+
+    def run(self, watcher, debouncer):
+        self.ingester.start()
+        for path in self.pending_at_startup():
+            self.start_job(path)
+        watcher.start()
+        print(f"👀 Watching {flyers.INPUT_FOLDER} (debounce {debouncer.delay:.1f}s) - Ctrl+C to stop\n")
+        try:
+            while True:
+                for path in debouncer.ready():
+                    self.start_job(path)
+                for job in [job for job in self.jobs if job.done()]:
+                    self.jobs.remove(job)
+                    self.finish_job(job)
+                    if not os.path.exists(job.path) or file_sha256(job.path) != job.sha256:
+                        debouncer.touch(job.path)  # changed again while it was being extracted
+                time.sleep(0.2)
+        except KeyboardInterrupt:
+            print("\n🛑 Stopping watcher...")
+        finally:
+            watcher.stop()
+            watcher.join()
+            self.executor.shutdown(wait=True)
+            for job in self.jobs:
+                self.finish_job(job)
+            self.ingester.close()
+            if self.rasterizer is not None:
+                self.rasterizer.close()
+            print(f"💰 Tokens this session: {self.budget.total_tokens} (≈ ${self.budget.spent_usd:.2f})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Watch flyer-images/ and upsert deals from new or changed flyers")
+    parser.add_argument("--poll", action="store_true", help="scan the folder instead of using file system events")
+    parser.add_argument("--process-existing", action="store_true",
+                        help="on the first start, extract the flyers already in the folder")
+    args = parser.parse_args()
+
+    os.makedirs(flyers.INPUT_FOLDER, exist_ok=True)
+    debouncer = Debouncer()
+    watcher = None if args.poll else create_event_watcher(flyers.INPUT_FOLDER, debouncer)
+    if watcher is None:
+        if not args.poll:
+            print("ℹ️  watchdog not installed - polling the folder instead (pip install watchdog)")
+        watcher = PollingWatcher(flyers.INPUT_FOLDER, debouncer)
+
+    FlyerDaemon(args.process_existing).run(watcher, debouncer)
+
+
+if __name__ == "__main__":
+    main()